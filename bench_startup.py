@@ -0,0 +1,93 @@
+"""
+Startup benchmark for invoice8.py.
+
+Measures, in fresh interpreters:
+  * module import time, broken down with `python -X importtime`
+  * time until the InvoiceApp window has been drawn (needs a display)
+
+Usage: python bench_startup.py [--runs N] [--window] [--history bench_startup.csv]
+"""
+import csv
+import datetime
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+WINDOW_SNIPPET = """
+import tkinter as tk
+import invoice8
+root = tk.Tk()
+app = invoice8.InvoiceApp(root)
+root.update()
+"""
+
+
+def run_python(args):
+    """Runs a fresh interpreter in the repo directory and returns (seconds, stderr)."""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, *args], cwd=HERE, capture_output=True, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "failed")
+    return elapsed, result.stderr
+
+
+def parse_importtime(stderr):
+    """Returns [(module, self_us, cumulative_us)] from -X importtime output."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        entries.append((module.strip(), int(self_us), int(cumulative_us)))
+    return entries
+
+
+def measure_imports(runs):
+    """Median cumulative import time of invoice8 plus the slowest modules of the last run."""
+    totals = []
+    entries = []
+    for _ in range(runs):
+        _, stderr = run_python(["-X", "importtime", "-c", "import invoice8"])
+        entries = parse_importtime(stderr)
+        totals.append(next(c for m, _, c in entries if m == "invoice8"))
+    slowest = sorted(entries, key=lambda e: e[1], reverse=True)[:10]
+    return statistics.median(totals) / 1e6, slowest
+
+
+def measure_window(runs):
+    """Median wall time from interpreter start until the first frame is drawn."""
+    return statistics.median(run_python(["-c", WINDOW_SNIPPET])[0] for _ in range(runs))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    runs = int(args[args.index("--runs") + 1]) if "--runs" in args else 5
+    history = args[args.index("--history") + 1] if "--history" in args else None
+
+    import_s, slowest = measure_imports(runs)
+    print(f"import invoice8: {import_s * 1000:.1f} ms (median of {runs})")
+    print("Slowest modules (self time):")
+    for module, self_us, cumulative_us in slowest:
+        print(f"  {module:<40} {self_us / 1000:8.1f} ms  (cumulative {cumulative_us / 1000:.1f} ms)")
+
+    window_s = None
+    if "--window" in args:
+        window_s = measure_window(runs)
+        print(f"window shown:    {window_s * 1000:.1f} ms (median of {runs}, includes interpreter start)")
+
+    if history:
+        new_file = not os.path.exists(history)
+        with open(history, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(["timestamp", "import_ms", "window_ms"])
+            writer.writerow([
+                datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+                f"{import_s * 1000:.1f}",
+                f"{window_s * 1000:.1f}" if window_s is not None else ""
+            ])
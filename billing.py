@@ -0,0 +1,193 @@
+import csv
+import datetime
+import sys
+from collections import defaultdict
+
+from change_log import ensure_change_log, record_changes
+from customers import CUSTOMER_FIELDS, CUSTOMERS_TABLE
+from invoice8 import INVOICE_TABLE_COLUMNS, NUMBERS_TABLE, SERVICE_PRICES, TABLE_NAME, connect_db, ensure_invoice_numbers
+from clinic_calendar import BILLED_TABLE, CALENDAR, booking_key, ensure_billed_table, session_key, slot_of
+
+BATCH_SIZE = 200 # Invoices written per transaction
+DUE_DAYS = 7 # Due date offset for generated invoices
+
+
+# ========== Booking Sources ==========
+def load_bookings_csv(file_path):
+    """Loads bookings from a CSV written by SchedulerApp.export_csv into the scheduler's dict shape."""
+    bookings = {}
+    with open(file_path, newline='', encoding='utf-8') as csvfile:
+        for row in csv.DictReader(csvfile):
+            key = session_key(f"{row['Date']}_{row['Time']}", row['Therapy Type'])
+            bookings[key] = {'phone': row['Customer Mobile'], 'therapy': row['Therapy Type']}
+            if row.get('No-Show'): # Older exports have no No-Show column
+                bookings[key]['no_show'] = True
+    return bookings
+
+
+def completed_bookings(bookings, start_date, end_date, now=None):
+    """
+    Yields (slot_key, info) for bookings inside [start_date, end_date] that have already finished.
+    Sessions marked as no-shows were not attended and are not billed.
+    """
+    now = now or datetime.datetime.now()
+    for key, info in bookings.items():
+        if info.get('no_show'):
+            continue
+        slot_key = slot_of(key) # The session's therapy is in info, so booking keys stay as they were
+        date_str, time_str = slot_key.split("_")
+        slot_start = datetime.datetime.strptime(f"{date_str} {time_str}", "%Y-%m-%d %H:%M")
+        if start_date <= slot_start.date() <= end_date and slot_start + CALENDAR.slot_duration(slot_start.date()) <= now:
+            yield slot_key, info
+
+
+def group_sessions(bookings):
+    """Groups (slot_key, info) pairs into {(phone, therapy): [booking keys]}."""
+    groups = defaultdict(list)
+    for slot_key, info in bookings:
+        groups[(info['phone'], info['therapy'])].append(booking_key(slot_key, info))
+    return groups
+
+
+def billable_groups(groups, billed, customers):
+    """
+    Splits grouped sessions into what can be invoiced now. Returns (pending, unknown_phones,
+    unpriced): pending is [(phone, therapy, unbilled keys)]; groups whose phone has no customer
+    or whose therapy has no price in SERVICE_PRICES are left unbilled, so a rerun picks them up.
+    """
+    pending = []
+    unknown_phones = set()
+    unpriced = set()
+    for (phone, therapy), keys in sorted(groups.items()):
+        keys = [k for k in keys if k not in billed]
+        if not keys:
+            continue
+        if phone not in customers:
+            unknown_phones.add(phone)
+            continue
+        if therapy not in SERVICE_PRICES:
+            unpriced.add((phone, therapy))
+            continue
+        pending.append((phone, therapy, keys))
+    return pending, sorted(unknown_phones), sorted(unpriced)
+
+
+# ========== Database Helpers ==========
+def fetch_billed_keys(cur, keys):
+    """Returns the subset of keys that have already been billed."""
+    billed = set()
+    keys = list(keys)
+    for i in range(0, len(keys), 1000):
+        chunk = keys[i:i + 1000]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cur.execute(f"SELECT booking_key FROM {BILLED_TABLE} WHERE booking_key IN ({placeholders})", chunk)
+        billed.update(row[0] for row in cur.fetchall())
+    return billed
+
+
+def fetch_customers_by_mobile(cur, phones):
+    """Maps mobile numbers to (c_id, c_name_first, c_name_last) from the customers table."""
+    customers = {}
+    phones = list(phones)
+    for i in range(0, len(phones), 1000):
+        chunk = phones[i:i + 1000]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cur.execute(
+            f"SELECT customer_mobile_number, c_id, c_name_first, c_name_last FROM {CUSTOMERS_TABLE} "
+            f"WHERE customer_mobile_number IN ({placeholders}) ORDER BY c_id",
+            chunk
+        )
+        for mobile, c_id, first, last in cur.fetchall():
+            customers[mobile] = (c_id, first, last) # A shared number bills the newest customer record
+    return customers
+
+
+# ========== Billing Pipeline ==========
+def bill_period(bookings, start_date, end_date, now=None):
+    """
+    Bills every completed booking in the period that has not been billed before.
+    One invoice is written per (customer, therapy) with no_of_sessions set to the
+    number of unbilled sessions. Returns (invoice_nos, unknown_phones, unpriced), the last
+    two listing what was skipped (see billable_groups).
+    """
+    now = now or datetime.datetime.now()
+    groups = group_sessions(completed_bookings(bookings, start_date, end_date, now))
+    if not groups:
+        return [], [], []
+
+    con = connect_db()
+    try:
+        cur = con.cursor()
+        ensure_billed_table(cur)
+        ensure_change_log(cur)
+        ensure_invoice_numbers(cur)
+        con.commit()
+
+        billed = fetch_billed_keys(cur, [k for keys in groups.values() for k in keys])
+        customers = fetch_customers_by_mobile(cur, {phone for phone, _ in groups})
+
+        date_time = now.strftime('%Y-%m-%d %H:%M:%S')
+        due_date_time = (now + datetime.timedelta(days=DUE_DAYS)).strftime('%Y-%m-%d %H:%M:%S')
+        pending, unknown_phones, unpriced = billable_groups(groups, billed, customers)
+
+        invoice_nos = []
+        for i in range(0, len(pending), BATCH_SIZE):
+            batch = pending[i:i + BATCH_SIZE]
+            # Lock the highest number ever used so two concurrent runs cannot hand out the same numbers
+            cur.execute(f"SELECT MAX(invoice_no) FROM {NUMBERS_TABLE} FOR UPDATE")
+            result = cur.fetchone()
+            next_no = int(result[0]) + 1 if result and result[0] is not None else 1
+
+            invoice_rows = []
+            key_rows = []
+            changes = []
+            for phone, therapy, keys in batch:
+                c_id, first, last = customers[phone]
+                per_session = SERVICE_PRICES[therapy]
+                no_of_sessions = len(keys)
+                invoice_rows.append((
+                    next_no, date_time, due_date_time, c_id,
+                    therapy, no_of_sessions, per_session, no_of_sessions * per_session
+                ))
+                key_rows.extend((k, next_no, date_time) for k in keys)
+                change = dict(zip(INVOICE_TABLE_COLUMNS, invoice_rows[-1]))
+                change.update(zip(CUSTOMER_FIELDS, (first, last or "", phone)))
+                changes.append(("insert", next_no, change))
+                changes.append(("billed", next_no, {"booking_keys": keys})) # Links the sessions to the invoice
+                next_no += 1
+
+            try:
+                cur.executemany(f"""
+                INSERT INTO {TABLE_NAME} (
+                    invoice_no, date_time, due_date_time, c_id,
+                    service_name, no_of_sessions, per_session, total
+                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+                """, invoice_rows)
+                # The primary key on booking_key rejects the whole batch if another run billed it first
+                cur.executemany(f"INSERT INTO {BILLED_TABLE} (booking_key, invoice_no, billed_at) VALUES (%s, %s, %s)", key_rows)
+                record_changes(cur, changes)
+                con.commit()
+            except Exception:
+                con.rollback()
+                raise
+            invoice_nos.extend(row[0] for row in invoice_rows)
+
+        return invoice_nos, unknown_phones, unpriced
+    finally:
+        con.close()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4:
+        print("Usage: python billing.py <schedule.csv> <start YYYY-MM-DD> <end YYYY-MM-DD>")
+        sys.exit(1)
+    csv_path, start, end = sys.argv[1:]
+    start_date = datetime.datetime.strptime(start, "%Y-%m-%d").date()
+    end_date = datetime.datetime.strptime(end, "%Y-%m-%d").date()
+
+    invoice_nos, unknown_phones, unpriced = bill_period(load_bookings_csv(csv_path), start_date, end_date)
+    print(f"Created {len(invoice_nos)} invoice(s).")
+    for phone in unknown_phones:
+        print(f"Skipped {phone}: no customer with this mobile number in {CUSTOMERS_TABLE}.")
+    for phone, therapy in unpriced:
+        print(f"Skipped {phone}: no price for '{therapy}' in SERVICE_PRICES.")
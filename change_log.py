@@ -0,0 +1,111 @@
+import json
+import queue
+import threading
+import time
+
+CHANGE_LOG_TABLE = 'invoice_changes'
+TAIL_BATCH = 1000 # Changes read per poll
+GAP_TIMEOUT = 10.0 # Seconds before a missing sequence number is treated as a rolled-back write
+POLL_INTERVAL = 2.0
+
+
+def ensure_change_log(cur):
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {CHANGE_LOG_TABLE} (
+        seq BIGINT AUTO_INCREMENT PRIMARY KEY,
+        op VARCHAR(8) NOT NULL,
+        invoice_no INT NOT NULL,
+        row_json TEXT,
+        changed_at TIMESTAMP(6) NOT NULL DEFAULT CURRENT_TIMESTAMP(6)
+    )
+    """)
+
+
+def record_changes(cur, changes):
+    """
+    Appends [(op, invoice_no, row)] to the change log. Call it inside the transaction that
+    makes the changes, so the log and the invoice table always commit (or roll back) together.
+    op is 'insert', 'update', 'delete', 'archive', 'paid' or 'billed'; row is the full row dict
+    for inserts and updates, {'booking_keys': [...]} for 'billed' and None otherwise.
+    """
+    cur.executemany(
+        f"INSERT INTO {CHANGE_LOG_TABLE} (op, invoice_no, row_json) VALUES (%s, %s, %s)",
+        [(op, invoice_no, json.dumps(row) if row is not None else None) for op, invoice_no, row in changes]
+    )
+
+
+def latest_seq(cur):
+    cur.execute(f"SELECT MAX(seq) FROM {CHANGE_LOG_TABLE}")
+    result = cur.fetchone()
+    return int(result[0]) if result and result[0] is not None else 0
+
+
+class ChangeFeed:
+    """
+    Tails the change log from a sequence number and hands new changes to the UI thread.
+
+    AUTO_INCREMENT numbers are handed out at insert time but become visible at commit
+    time, so a lower number can show up after a higher one. The feed never reads past
+    a missing number until it appears or GAP_TIMEOUT passes (a rolled-back write leaves
+    a permanent gap), so no committed change is skipped.
+    """
+
+    def __init__(self, connect, after_seq):
+        self.connect = connect
+        self.last_seq = after_seq
+        self.gap_since = None
+        self.changes = queue.Queue()
+        self.con = None
+        self.stopped = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    def poll(self):
+        """Returns [(seq, op, invoice_no, row)] received since the last call (UI thread)."""
+        received = []
+        while True:
+            try:
+                received.append(self.changes.get_nowait())
+            except queue.Empty:
+                return received
+
+    def run(self):
+        while not self.stopped.wait(POLL_INTERVAL):
+            try:
+                for change in self.read():
+                    self.changes.put(change)
+            except Exception as e:
+                print(f"Change feed error: {e}") # Retried on the next interval with a fresh connection
+                try:
+                    if self.con is not None:
+                        self.con.close()
+                except Exception:
+                    pass
+                self.con = None
+
+    def read(self):
+        """Reads the next contiguous run of changes after last_seq."""
+        if self.con is None:
+            self.con = self.connect()
+            self.con.autocommit(True) # Each poll must see newly committed rows
+        cur = self.con.cursor()
+        cur.execute(
+            f"SELECT seq, op, invoice_no, row_json FROM {CHANGE_LOG_TABLE} WHERE seq > %s ORDER BY seq LIMIT %s",
+            (self.last_seq, TAIL_BATCH)
+        )
+        changes = []
+        for seq, op, invoice_no, row_json in cur.fetchall():
+            if seq != self.last_seq + 1:
+                if self.gap_since is None:
+                    self.gap_since = time.monotonic()
+                if time.monotonic() - self.gap_since < GAP_TIMEOUT:
+                    break # Wait for the missing change to commit
+            self.gap_since = None
+            self.last_seq = seq
+            changes.append((seq, op, invoice_no, json.loads(row_json) if row_json else None))
+        return changes
@@ -0,0 +1,134 @@
+"""
+The clinic's calendar (opening hours per weekday, holidays, slot templates) and how booked
+sessions are keyed and identified once billed. No GUI code, so the billing job and the reports
+can import it without loading the scheduler.
+"""
+import json
+import os
+from datetime import datetime, timedelta
+
+from resources import DEFAULT_RESOURCES
+
+# Constants (defaults for any weekday not set in calendar_config.json)
+APPOINTMENT_DURATION = timedelta(minutes=20)
+BREAK_DURATION = timedelta(minutes=5)
+START_TIME = datetime.strptime("09:00", "%H:%M").time()
+END_TIME = datetime.strptime("17:00", "%H:%M").time()
+LUNCH_START = datetime.strptime("12:30", "%H:%M").time()
+LUNCH_END = datetime.strptime("13:00", "%H:%M").time()
+HORIZON_DAYS = 365
+CALENDAR_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "calendar_config.json")
+WEEKDAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+# Table that remembers which bookings have already been billed, so a rerun
+# over the same (or an overlapping) period never bills a session twice.
+BILLED_TABLE = 'billed_bookings'
+
+
+# ========== Calendar ==========
+def compile_template(hours):
+    """
+    Turns one weekday's opening hours into its slot template: a tuple of ("HH:MM", "HH:MM")
+    (start, end) pairs. Templates are computed once per weekday and shared by every day.
+    """
+    parse = lambda t: datetime.strptime(t, "%H:%M")
+    duration = timedelta(minutes=hours["slot_minutes"])
+    gap = timedelta(minutes=hours["break_minutes"])
+    current_time, end_of_day = parse(hours["start"]), parse(hours["end"])
+    lunch_start, lunch_end = parse(hours["lunch_start"]), parse(hours["lunch_end"])
+
+    slots = []
+    while current_time + duration <= end_of_day:
+        if lunch_start <= current_time < lunch_end:
+            current_time = lunch_end
+            continue
+        slots.append((current_time.strftime("%H:%M"), (current_time + duration).strftime("%H:%M")))
+        current_time += duration + gap
+    return tuple(slots)
+
+class CalendarConfig:
+    """Opening hours per weekday, holidays and the booking horizon, compiled into slot templates."""
+
+    def __init__(self, weekday_hours, holidays=(), horizon_days=HORIZON_DAYS, resources=None):
+        # weekday_hours: weekday (0=Mon) -> hours dict, or None when closed that weekday
+        self.weekday_hours = weekday_hours
+        self.resources = resources or DEFAULT_RESOURCES # resource name -> {"therapies", "closed", "turnaround_slots"}
+        self.holidays = set(holidays)
+        self.horizon_days = horizon_days
+        self.templates = {wd: compile_template(h) if h else None for wd, h in weekday_hours.items()}
+        self.starts = {wd: tuple(s for s, _ in t) if t else None for wd, t in self.templates.items()}
+
+    @classmethod
+    def load(cls, path=CALENDAR_CONFIG_PATH):
+        """
+        Reads calendar_config.json if present, e.g.
+        {"horizon_days": 180, "holidays": ["2026-12-25"],
+         "weekdays": {"Sat": {"start": "09:00", "end": "13:00"}, "Sun": null},
+         "resources": {"Pool": {"therapies": ["AQUATIC THERAPY"], "turnaround_slots": 1,
+                                "closed": {"Tue": [["09:00", "11:00"]]}}}}
+        Weekdays and fields that are left out fall back to the module constants.
+        """
+        config = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                config = json.load(f)
+        defaults = {
+            "start": START_TIME.strftime("%H:%M"), "end": END_TIME.strftime("%H:%M"),
+            "lunch_start": LUNCH_START.strftime("%H:%M"), "lunch_end": LUNCH_END.strftime("%H:%M"),
+            "slot_minutes": int(APPOINTMENT_DURATION.total_seconds() // 60),
+            "break_minutes": int(BREAK_DURATION.total_seconds() // 60)
+        }
+        weekdays = config.get("weekdays", {})
+        weekday_hours = {}
+        for wd, name in enumerate(WEEKDAY_NAMES):
+            hours = weekdays.get(name, None if name == "Sun" else {}) # Closed on Sundays unless configured
+            weekday_hours[wd] = {**defaults, **hours} if hours is not None else None
+        holidays = [datetime.strptime(d, "%Y-%m-%d").date() for d in config.get("holidays", [])]
+        return cls(weekday_hours, holidays, config.get("horizon_days", HORIZON_DAYS), config.get("resources"))
+
+    def template(self, day):
+        """The day's slot template, or None when the clinic is closed."""
+        if day in self.holidays:
+            return None
+        return self.templates[day.weekday()]
+
+    def slot_starts(self, day):
+        if day in self.holidays:
+            return None
+        return self.starts[day.weekday()]
+
+    def slot_duration(self, day):
+        hours = self.weekday_hours[day.weekday()]
+        return timedelta(minutes=hours["slot_minutes"]) if hours else APPOINTMENT_DURATION
+
+CALENDAR = CalendarConfig.load()
+
+
+# ========== Sessions ==========
+def session_key(slot_key, therapy):
+    """
+    Key of one booked session, "YYYY-MM-DD_HH:MM@THERAPY". Each department runs one session per
+    slot; the keys still sort chronologically, with the sessions of a slot next to each other.
+    """
+    return f"{slot_key}@{therapy}"
+
+
+def slot_of(key):
+    """The "YYYY-MM-DD_HH:MM" slot of a session key."""
+    return key[:16]
+
+
+# ========== Billed Sessions ==========
+def booking_key(slot_key, info):
+    """Idempotency key for a single booked session."""
+    return f"{slot_key}|{info['phone']}|{info['therapy']}"
+
+
+def ensure_billed_table(cur):
+    """Creates the idempotency table if it does not exist yet."""
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {BILLED_TABLE} (
+        booking_key VARCHAR(128) PRIMARY KEY,
+        invoice_no INT NOT NULL,
+        billed_at DATETIME NOT NULL
+    )
+    """)
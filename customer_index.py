@@ -0,0 +1,243 @@
+import heapq
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from itertools import chain, islice
+
+PREFIX_LENGTH = 3 # Query words shorter than this match token prefixes instead of trigrams
+MAX_POSTINGS = 2500 # Posting entries counted in full per search, rarest trigrams first
+COMMON_SAMPLE = 100 # New customers taken from each trigram past that
+MAX_CANDIDATES = 100 # Customers with the most hits that get an exact similarity score
+CHUNK_SIZE = 500 # Sorted tokens are kept in chunks of about this size
+
+
+def trigrams(token):
+    """Returns the padded trigrams of a lower-cased token ('ram' -> '$ra', 'ram', 'am$')."""
+    padded = f"${token.lower()}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TokenList:
+    """
+    Sorted (token, c_id) pairs, kept in chunks so adding or removing one only bisects the chunk
+    maxima and shifts a single chunk instead of the whole list.
+    """
+
+    def __init__(self, pairs=()):
+        pairs = sorted(pairs)
+        self.chunks = [pairs[i:i + CHUNK_SIZE] for i in range(0, len(pairs), CHUNK_SIZE)]
+        self.maxes = [chunk[-1] for chunk in self.chunks]
+
+    def __iter__(self):
+        return chain.from_iterable(self.chunks)
+
+    def add(self, pair):
+        if not self.chunks:
+            self.chunks.append([pair])
+            self.maxes.append(pair)
+            return
+        i = min(bisect_left(self.maxes, pair), len(self.chunks) - 1)
+        chunk = self.chunks[i]
+        insort(chunk, pair)
+        self.maxes[i] = chunk[-1]
+        if len(chunk) > 2 * CHUNK_SIZE:
+            self.chunks[i:i + 1] = [chunk[:CHUNK_SIZE], chunk[CHUNK_SIZE:]]
+            self.maxes[i:i + 1] = [chunk[CHUNK_SIZE - 1], chunk[-1]]
+
+    def remove(self, pair):
+        i = bisect_left(self.maxes, pair)
+        chunk = self.chunks[i]
+        del chunk[bisect_left(chunk, pair)]
+        if chunk:
+            self.maxes[i] = chunk[-1]
+        else:
+            del self.chunks[i], self.maxes[i]
+
+    def _position(self, token):
+        """(chunk, offset) of the first pair whose token is >= token."""
+        i = bisect_left(self.maxes, (token,))
+        return i, bisect_left(self.chunks[i], (token,)) if i < len(self.chunks) else 0
+
+    def count(self, lo, hi):
+        """Number of pairs with lo <= token < hi."""
+        (i, start), (j, end) = self._position(lo), self._position(hi)
+        return sum(len(chunk) for chunk in self.chunks[i:j]) - start + end
+
+    def irange(self, lo, hi):
+        """Yields the c_ids of the pairs with lo <= token < hi, in token order."""
+        i, start = self._position(lo)
+        for chunk in islice(self.chunks, i, None):
+            for token, c_id in islice(chunk, start, None):
+                if token >= hi:
+                    return
+                yield c_id
+            start = 0
+
+
+class CustomerIndex:
+    """
+    In-memory trigram index over distinct customers (c_id, first name, last name, mobile).
+    Answers ranked, typo-tolerant typeahead queries without going to the database.
+
+    Words of three or more characters are matched on trigrams, counting the rarest posting lists
+    first; short words like 'ra' or '98' would hit most customers that way, so they are looked up
+    in a sorted token list instead and match as prefixes. Short words are not typo-tolerant: a
+    customer only matches if one of its tokens starts with the word exactly.
+    """
+
+    def __init__(self):
+        self.customers = {} # c_id -> (c_name_first, c_name_last, customer_mobile_number)
+        self.invoices = {} # invoice_no -> c_id of every invoice indexed
+        self.invoice_counts = {} # c_id -> number of invoices referencing the customer
+        self.postings = defaultdict(set) # trigram -> set of c_ids
+        self.grams = {} # c_id -> trigrams currently indexed for that customer
+        self.tokens = TokenList() # (lower-cased token, c_id) for every token of every customer
+
+    def build(self, rows):
+        """Builds the index in one pass over (invoice_no, c_id, first, last, mobile) rows."""
+        self.tokens = None # Sorted once at the end instead of on every insert
+        try:
+            for invoice_no, c_id, first, last, mobile in rows:
+                self.add_invoice(invoice_no, c_id, first, last, mobile)
+        finally:
+            self.tokens = TokenList((token, c_id) for c_id, customer in self.customers.items()
+                                    for token in self._words(c_id, *customer))
+
+    def _tokens(self, c_id, first, last, mobile):
+        return [str(c_id), first or "", last or "", mobile or ""]
+
+    def _words(self, c_id, first, last, mobile):
+        return {token.lower() for token in self._tokens(c_id, first, last, mobile) if token}
+
+    def _index(self, c_id, first, last, mobile):
+        grams = set()
+        for token in self._tokens(c_id, first, last, mobile):
+            if token:
+                grams |= trigrams(token)
+        old = self.grams.get(c_id, set())
+        for gram in old - grams:
+            self.postings[gram].discard(c_id)
+            if not self.postings[gram]:
+                del self.postings[gram]
+        for gram in grams - old:
+            self.postings[gram].add(c_id)
+        self.grams[c_id] = grams
+        old_words = self._words(c_id, *self.customers[c_id]) if c_id in self.customers else set()
+        self._sort_words(c_id, old_words, self._words(c_id, first, last, mobile))
+        self.customers[c_id] = (first, last, mobile)
+
+    def _sort_words(self, c_id, old_words, words):
+        """Keeps the sorted token list in step with a customer's changed tokens."""
+        if self.tokens is None:
+            return
+        for word in old_words - words:
+            self.tokens.remove((word, c_id))
+        for word in words - old_words:
+            self.tokens.add((word, c_id))
+
+    def add_invoice(self, invoice_no, c_id, first, last, mobile):
+        """
+        Registers an invoice for a customer, or moves it to c_id if it is indexed already, so replaying
+        an insert or update twice counts it once. The latest name/mobile seen wins.
+        """
+        old_c_id = self.invoices.get(invoice_no)
+        if old_c_id != c_id:
+            if old_c_id is not None:
+                self._release(old_c_id)
+            self.invoices[invoice_no] = c_id
+            self.invoice_counts[c_id] = self.invoice_counts.get(c_id, 0) + 1
+        if self.customers.get(c_id) != (first, last, mobile):
+            self._index(c_id, first, last, mobile)
+
+    def remove_invoice(self, invoice_no):
+        """Drops an invoice, removing its customer when none are left; unknown invoices are ignored."""
+        c_id = self.invoices.pop(invoice_no, None)
+        if c_id is not None:
+            self._release(c_id)
+
+    def _release(self, c_id):
+        """Drops one invoice for a customer, removing the customer when none are left."""
+        count = self.invoice_counts.get(c_id, 0) - 1
+        if count > 0:
+            self.invoice_counts[c_id] = count
+            return
+        self.invoice_counts.pop(c_id, None)
+        customer = self.customers.pop(c_id, None)
+        if customer is not None:
+            self._sort_words(c_id, self._words(c_id, *customer), set())
+        for gram in self.grams.pop(c_id, set()):
+            self.postings[gram].discard(c_id)
+            if not self.postings[gram]:
+                del self.postings[gram]
+
+    def _prefix_range(self, word):
+        """(lo, hi) token bounds of the tokens that start with word."""
+        return word, word + "\U0010ffff"
+
+    def search(self, text, limit=10):
+        """
+        Returns up to `limit` (c_id, first, last, mobile) tuples. Customers must have a token starting
+        with every short query word; the longer words rank them by trigram similarity, with a bonus
+        for a token that starts with the word. Short words alone list matches in token order.
+        """
+        words = [w.lower() for w in text.split() if w]
+        if not words:
+            return []
+        short = [self._prefix_range(w) for w in words if len(w) < PREFIX_LENGTH]
+        words = [w for w in words if len(w) >= PREFIX_LENGTH]
+        short.sort(key=lambda r: self.tokens.count(*r)) # Rarest prefix first
+        allowed = None # c_ids matching every short word, None if there are none
+        for lo, hi in short[1:] if not words else short:
+            matches = set(self.tokens.irange(lo, hi))
+            allowed = matches if allowed is None else allowed & matches
+
+        if not words:
+            listed = []
+            for c_id in self.tokens.irange(*short[0]):
+                if c_id not in listed and (allowed is None or c_id in allowed):
+                    listed.append(c_id)
+                    if len(listed) == limit:
+                        break
+            return [(c_id, *self.customers[c_id]) for c_id in listed]
+
+        grams = set()
+        for word in words:
+            grams |= trigrams(word)
+        # Count hits from the rarest trigrams up. Past the budget, a common trigram like '984' is
+        # intersected with the customers that matched so far, plus a sample of new ones so a typo
+        # in a rare trigram still finds the common names
+        postings = [self.postings.get(gram, set()) for gram in grams]
+        if allowed is not None:
+            postings = [posting & allowed for posting in postings]
+        hits = Counter()
+        found = set()
+        leaders = None # Best matches so far, narrowed by each common trigram past the budget
+        budget = MAX_POSTINGS
+        for posting in sorted(postings, key=len):
+            if leaders is None and (len(posting) <= budget or not found):
+                hits.update(posting)
+                found |= posting
+                budget -= len(posting)
+                continue
+            matched = posting & (found if leaders is None else leaders)
+            sample = [c_id for c_id in islice(posting, COMMON_SAMPLE) if c_id not in found]
+            hits.update(matched)
+            hits.update(sample)
+            found.update(sample)
+            if leaders is None or len(matched) >= limit:
+                leaders = matched
+        if not hits:
+            return []
+
+        # Dice coefficient on trigram sets; typos only cost the few grams they touch
+        n = len(grams)
+        candidates = sorted(hits, key=hits.get, reverse=True)[:MAX_CANDIDATES]
+        dice = {c_id: 2 * len(grams & self.grams[c_id]) / (n + len(self.grams[c_id])) for c_id in candidates}
+        shortlist = heapq.nlargest(limit * 4, dice, key=dice.get)
+
+        def score(c_id):
+            tokens = [t.lower() for t in self._tokens(c_id, *self.customers[c_id]) if t]
+            prefix_bonus = sum(1 for w in words if any(t.startswith(w) for t in tokens))
+            return (prefix_bonus, dice[c_id])
+
+        best = sorted(shortlist, key=score, reverse=True)[:limit]
+        return [(c_id, *self.customers[c_id]) for c_id in best]
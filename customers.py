@@ -0,0 +1,237 @@
+"""
+Customer records, normalized out of the invoice table.
+
+  python customers.py migrate [--latest-wins]
+
+`migrate` creates the customers table (one row per c_id) and fills it from the
+invoice table, keeping the name and mobile number of each customer's latest
+invoice. Before anything is dropped it copies every invoice's customer columns
+into a backup table, checks that every invoiced c_id made it into the customers
+table, and looks for customers whose invoices disagree about their details.
+Only then are the duplicated columns dropped from the invoice table.
+
+When invoices disagree, the columns are kept and the conflicting c_ids are
+listed; rerun with --latest-wins once the latest invoice's details are the
+right ones. The backup table stays until it is dropped by hand.
+"""
+import sys
+import threading
+from collections import OrderedDict
+
+CUSTOMERS_TABLE = 'customers'
+CUSTOMER_FIELDS = ("c_name_first", "c_name_last", "customer_mobile_number")
+BACKUP_SUFFIX = '_customer_backup' # <invoice table>_customer_backup keeps the columns the migration drops
+CONFLICTS_SHOWN = 20 # Conflicting c_ids listed in a migration error
+CACHE_SIZE = 5000 # Customer records kept in memory
+LOOKUP_BATCH = 1000 # c_ids per IN (...) lookup
+
+
+# ========== Migration ==========
+class MigrationError(Exception):
+    """The migration stopped before dropping anything from the invoice table."""
+
+
+def table_columns(cur, table):
+    cur.execute(
+        "SELECT COLUMN_NAME FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (table,)
+    )
+    return {row[0] for row in cur.fetchall()}
+
+
+def is_partitioned(cur, table):
+    cur.execute(
+        "SELECT 1 FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL LIMIT 1",
+        (table,)
+    )
+    return cur.fetchone() is not None
+
+
+def customer_conflicts(cur, invoice_table):
+    """c_ids whose invoices disagree about the customer's name or mobile number."""
+    cur.execute(f"""
+    SELECT c_id FROM {invoice_table} GROUP BY c_id
+    HAVING COUNT(DISTINCT c_name_first, IFNULL(c_name_last, ''), IFNULL(customer_mobile_number, '')) > 1
+    ORDER BY c_id
+    """)
+    return [row[0] for row in cur.fetchall()]
+
+
+def migrate_customers(con, invoice_table, latest_wins=False):
+    """
+    One-off migration: moves customer details out of the invoice table. Returns the number of customers.
+    Raises MigrationError, with the invoice table left as it was, when the copy is incomplete or
+    (unless latest_wins) when invoices disagree about a customer.
+    """
+    cur = con.cursor()
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {CUSTOMERS_TABLE} (
+        c_id INT PRIMARY KEY,
+        c_name_first VARCHAR(100) NOT NULL,
+        c_name_last VARCHAR(100),
+        customer_mobile_number VARCHAR(20),
+        KEY idx_customers_mobile (customer_mobile_number)
+    )
+    """)
+    if "c_name_first" not in table_columns(cur, invoice_table):
+        cur.execute(f"SELECT COUNT(*) FROM {CUSTOMERS_TABLE}")
+        return cur.fetchone()[0] # Already migrated
+
+    # Every invoice's customer columns as they are now, so nothing the migration drops is lost
+    backup = f"{invoice_table}{BACKUP_SUFFIX}"
+    cur.execute(f"DROP TABLE IF EXISTS {backup}") # Left by an earlier run that stopped; the columns are still here
+    cur.execute(f"CREATE TABLE {backup} AS SELECT invoice_no, c_id, {', '.join(CUSTOMER_FIELDS)} FROM {invoice_table}")
+    cur.execute(f"SELECT (SELECT COUNT(*) FROM {backup}), (SELECT COUNT(*) FROM {invoice_table})")
+    backed_up, invoices = cur.fetchone()
+    if backed_up != invoices:
+        raise MigrationError(f"Backed up {backed_up} of {invoice_table}'s {invoices} rows; nothing was dropped")
+
+    # Invoices could disagree about a customer's name; the latest invoice wins
+    cur.execute(f"""
+    INSERT INTO {CUSTOMERS_TABLE} (c_id, c_name_first, c_name_last, customer_mobile_number)
+    SELECT i.c_id, i.c_name_first, i.c_name_last, i.customer_mobile_number
+    FROM {invoice_table} i
+    JOIN (SELECT c_id, MAX(invoice_no) AS invoice_no FROM {invoice_table} GROUP BY c_id) latest
+      ON latest.invoice_no = i.invoice_no
+    ON DUPLICATE KEY UPDATE
+        c_name_first = VALUES(c_name_first),
+        c_name_last = VALUES(c_name_last),
+        customer_mobile_number = VALUES(customer_mobile_number)
+    """)
+    cur.execute(f"""
+    SELECT COUNT(DISTINCT i.c_id), COUNT(DISTINCT c.c_id)
+    FROM {invoice_table} i LEFT JOIN {CUSTOMERS_TABLE} c ON c.c_id = i.c_id
+    """)
+    invoiced, copied = cur.fetchone()
+    if copied != invoiced:
+        con.rollback()
+        raise MigrationError(f"Only {copied} of {invoiced} invoiced customers were copied; nothing was dropped")
+    con.commit() # The copy and the backup stay, whatever happens to the columns
+    conflicts = customer_conflicts(cur, invoice_table)
+    if conflicts and not latest_wins:
+        shown = ", ".join(str(c_id) for c_id in conflicts[:CONFLICTS_SHOWN])
+        raise MigrationError(
+            f"{len(conflicts)} customer(s) have different details on different invoices (c_id {shown}"
+            f"{', ...' if len(conflicts) > CONFLICTS_SHOWN else ''}). The customers table holds each one's "
+            f"latest invoice; check them and rerun with --latest-wins. Nothing was dropped."
+        )
+
+    alterations = [f"DROP COLUMN {col}" for col in CUSTOMER_FIELDS]
+    if is_partitioned(cur, invoice_table):
+        # Partitioned InnoDB tables cannot have foreign keys; the app keeps customers in step instead
+        alterations.append(f"ADD INDEX idx_{invoice_table}_c_id (c_id)")
+    else:
+        alterations.append(
+            f"ADD CONSTRAINT fk_{invoice_table}_customer FOREIGN KEY (c_id) REFERENCES {CUSTOMERS_TABLE} (c_id)"
+        )
+    cur.execute(f"ALTER TABLE {invoice_table} {', '.join(alterations)}")
+    con.commit()
+    cur.execute(f"SELECT COUNT(*) FROM {CUSTOMERS_TABLE}")
+    return cur.fetchone()[0]
+
+
+def upsert_customer(cur, c_id, c_name_first, c_name_last, customer_mobile_number):
+    """Inserts or renames a customer; callers commit."""
+    cur.execute(
+        f"INSERT INTO {CUSTOMERS_TABLE} (c_id, c_name_first, c_name_last, customer_mobile_number) "
+        f"VALUES (%s, %s, %s, %s) ON DUPLICATE KEY UPDATE "
+        f"c_name_first = VALUES(c_name_first), c_name_last = VALUES(c_name_last), "
+        f"customer_mobile_number = VALUES(customer_mobile_number)",
+        (c_id, c_name_first, c_name_last, customer_mobile_number)
+    )
+
+
+# ========== Record Cache ==========
+class CustomerCache:
+    """
+    LRU of customer records (c_id -> (c_name_first, c_name_last, customer_mobile_number)).
+
+    Misses are loaded with one IN (...) query per batch instead of one query per row.
+    Lookups are locked so the startup loader thread can share the cache with the UI.
+    """
+
+    def __init__(self, connect, capacity=CACHE_SIZE):
+        self.connect = connect
+        self.capacity = capacity
+        self.records = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def put(self, c_id, record):
+        with self.lock:
+            self.records[c_id] = tuple(record)
+            self.records.move_to_end(c_id)
+            while len(self.records) > self.capacity:
+                self.records.popitem(last=False)
+
+    def invalidate(self, c_id=None):
+        """Forgets one customer, or everything when c_id is None."""
+        with self.lock:
+            if c_id is None:
+                self.records.clear()
+            else:
+                self.records.pop(c_id, None)
+
+    def get(self, c_id, con=None):
+        return self.get_many([c_id], con).get(c_id)
+
+    def get_many(self, c_ids, con=None):
+        """Returns {c_id: record} for the given ids, loading misses through con (or a new connection)."""
+        found = {}
+        missing = []
+        with self.lock:
+            for c_id in set(c_ids):
+                record = self.records.get(c_id)
+                if record is None:
+                    missing.append(c_id)
+                else:
+                    self.records.move_to_end(c_id)
+                    found[c_id] = record
+            self.hits += len(found)
+            self.misses += len(missing)
+        if missing:
+            loaded = self.load(missing, con)
+            for c_id, record in loaded.items():
+                self.put(c_id, record)
+            found.update(loaded)
+        return found
+
+    def load(self, c_ids, con=None):
+        own_connection = con is None
+        if own_connection:
+            con = self.connect()
+        try:
+            cur = con.cursor()
+            loaded = {}
+            for i in range(0, len(c_ids), LOOKUP_BATCH):
+                chunk = c_ids[i:i + LOOKUP_BATCH]
+                placeholders = ", ".join(["%s"] * len(chunk))
+                cur.execute(
+                    f"SELECT c_id, {', '.join(CUSTOMER_FIELDS)} FROM {CUSTOMERS_TABLE} WHERE c_id IN ({placeholders})",
+                    chunk
+                )
+                for c_id, *record in cur.fetchall():
+                    loaded[c_id] = tuple(record)
+            return loaded
+        finally:
+            if own_connection:
+                con.close()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] not in (["migrate"], ["migrate", "--latest-wins"]):
+        print(__doc__)
+        sys.exit(1)
+    from invoice8 import TABLE_NAME, connect_db
+    con = connect_db()
+    try:
+        count = migrate_customers(con, TABLE_NAME, latest_wins="--latest-wins" in sys.argv)
+    except MigrationError as e:
+        print(e)
+        sys.exit(1)
+    finally:
+        con.close()
+    print(f"{count} customer(s) in {CUSTOMERS_TABLE}; {TABLE_NAME} now references them by c_id. "
+          f"The old columns are in {TABLE_NAME}{BACKUP_SUFFIX}.")
@@ -0,0 +1,94 @@
+import datetime
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+def as_datetime(value):
+    """Accepts a datetime or a 'YYYY-MM-DD HH:MM:SS' string."""
+    if isinstance(value, datetime.datetime):
+        return value
+    return datetime.datetime.strptime(str(value), DATETIME_FORMAT)
+
+
+class DueScanner:
+    """
+    Unpaid invoices indexed by due date (a sorted list of (due, invoice_no)).
+
+    Views are range queries on the index; tick() only looks at the slices between the
+    previous tick and now, so it reports newly overdue / newly due-soon invoices in
+    O(log n + k) instead of scanning everything.
+    """
+
+    def __init__(self, soon_days=3):
+        self.soon = datetime.timedelta(days=soon_days)
+        self.index = [] # sorted (due_date_time, invoice_no) of unpaid invoices
+        self.invoices = {} # invoice_no -> (due_date_time, c_id, total)
+        self.outstanding = defaultdict(float) # c_id -> unpaid total
+        self.last_tick = None
+        self.late_arrivals = set() # added after the tick that would have reported them
+
+    # ========== Maintenance ==========
+    def upsert(self, invoice_no, due_date_time, c_id, total):
+        """Adds or updates an unpaid invoice."""
+        self.remove(invoice_no)
+        due = as_datetime(due_date_time)
+        self.invoices[invoice_no] = (due, c_id, total)
+        insort(self.index, (due, invoice_no))
+        self.outstanding[c_id] += total
+        if self.last_tick and due <= self.last_tick + self.soon:
+            self.late_arrivals.add(invoice_no)
+
+    def remove(self, invoice_no):
+        """Drops an invoice that was paid or deleted."""
+        entry = self.invoices.pop(invoice_no, None)
+        if entry is None:
+            return
+        due, c_id, total = entry
+        del self.index[bisect_left(self.index, (due, invoice_no))]
+        self.outstanding[c_id] -= total
+        if abs(self.outstanding[c_id]) < 0.005:
+            del self.outstanding[c_id]
+
+    # ========== Views ==========
+    def _between(self, start, end):
+        """invoice_nos with start < due <= end (either bound may be None), in due order."""
+        lo = bisect_right(self.index, (start, float("inf"))) if start else 0
+        hi = bisect_right(self.index, (end, float("inf"))) if end else len(self.index)
+        return [invoice_no for _, invoice_no in self.index[lo:hi]]
+
+    def overdue(self, now=None):
+        """Unpaid invoices whose due date has passed, oldest first."""
+        return self._between(None, now or datetime.datetime.now())
+
+    def due_within(self, days, now=None):
+        """Unpaid invoices that fall due in the next `days` days."""
+        now = now or datetime.datetime.now()
+        return self._between(now, now + datetime.timedelta(days=days))
+
+    def customer_outstanding(self):
+        """[(c_id, unpaid_total)], largest first."""
+        return sorted(self.outstanding.items(), key=lambda item: -item[1])
+
+    # ========== Threshold Crossing ==========
+    def tick(self, now=None):
+        """
+        Returns (newly_overdue, newly_due_soon) since the previous tick. The first tick
+        reports everything already past each threshold.
+        """
+        now = now or datetime.datetime.now()
+        last = self.last_tick
+        self.last_tick = now
+        newly_overdue = self._between(last, now)
+        newly_due_soon = self._between(last + self.soon if last else now, now + self.soon)
+        for invoice_no in self.late_arrivals:
+            if invoice_no not in self.invoices:
+                continue # Paid or deleted in the meantime
+            due = self.invoices[invoice_no][0]
+            if due <= now and (not last or due <= last):
+                newly_overdue.append(invoice_no)
+            elif now < due and (not last or due <= last + self.soon):
+                newly_due_soon.append(invoice_no)
+        self.late_arrivals = set()
+        return newly_overdue, newly_due_soon
@@ -3,14 +3,22 @@ from tkinter import ttk, messagebox, filedialog
 import pymysql
 import datetime
 import csv # Import the csv module for CSV download
-
-# Import ReportLab modules for PDF generation
-from reportlab.lib.pagesizes import A4
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER # For centering text
+import heapq
+import os
+import queue
+import sys
+import threading
+
+# ReportLab is imported inside print_invoice_pdf: it is only needed when printing
+# and importing it at module load noticeably slows down startup.
+
+from customer_index import CustomerIndex
+from write_queue import InvoiceWriter
+from due_scanner import DueScanner
+from customers import CUSTOMER_FIELDS, CUSTOMERS_TABLE, CustomerCache
+from query_cache import QueryBuilder, StatementPool, connect_prepared
+from change_log import ChangeFeed, ensure_change_log, latest_seq, record_changes
+from tk_watchdog import EventLoopWatchdog, watchdog_threshold
 
 # MySQL DB connection details
 DB_HOST = 'localhost'
@@ -30,6 +38,204 @@ SERVICE_PRICES = {
 }
 # --- End Fixed Service Prices ---
 
+# Filters that get typeahead suggestions from the in-memory customer index
+TYPEAHEAD_COLUMNS = ("c_name_first", "c_name_last", "customer_mobile_number")
+# Filter entry -> WHERE fragment; name/mobile filters go through a customers subquery instead
+FILTER_CONDITIONS = {
+    "date_time": "CAST(date_time AS CHAR) LIKE ?",
+    "c_id": "c_id LIKE ?"
+}
+FILTER_DEBOUNCE_MS = 300 # Wait this long after the last keystroke before querying MySQL
+STARTUP_POLL_MS = 20
+# Local journal of queued invoice writes, replayed on the next start if the app exits first
+JOURNAL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'invoice_journal.jsonl')
+WRITE_POLL_MS = 100
+PAYMENTS_TABLE = 'invoice_payments' # invoice_no -> paid_date_time; invoices without a row here are unpaid
+NUMBERS_TABLE = 'invoice_numbers' # Every invoice number ever inserted; the next number is its MAX + 1
+DUE_SOON_DAYS = 3
+DUE_SCAN_MS = 60 * 1000
+CHANGE_POLL_MS = 1000 # How often changes from other desks are applied to the view
+# Satellite desks on a slow link: serve reads from a local SQLite copy kept in sync with MySQL
+USE_LOCAL_REPLICA = False
+REPLICA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'invoice_replica.sqlite3')
+REPLICA_STALE_SECONDS = 30 # Older than this, the replica status turns red
+REPLICA_STATUS_MS = 1000
+# Headings that sort in MySQL; each has a (column, invoice_no) index, so a sorted page is an index range scan
+SORT_COLUMNS = ("invoice_no", "date_time", "c_id", "service_name", "total")
+DEFAULT_SORT = ("invoice_no", True) # (column, descending)
+PAGE_ROWS = 500 # Rows fetched per page; the next page loads when the Treeview is scrolled to the bottom
+
+def connect_db():
+    """Establishes a connection to the MySQL database."""
+    return pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
+
+def connect_reader():
+    """Connection for the interactive read pool; uses mysql-connector's prepared statements when installed."""
+    return connect_prepared(connect_db, host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
+
+def ensure_payments_table(cur):
+    cur.execute(f"""
+    CREATE TABLE IF NOT EXISTS {PAYMENTS_TABLE} (
+        invoice_no INT PRIMARY KEY,
+        paid_date_time DATETIME NOT NULL
+    )
+    """)
+
+def ensure_invoice_numbers(cur):
+    """
+    Creates the invoice number registry and the trigger that claims each inserted number in it.
+    Numbers are never released, so those of deleted or archived invoices are not handed out again.
+    """
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {NUMBERS_TABLE} (invoice_no INT PRIMARY KEY)")
+    cur.execute(
+        "SELECT 1 FROM information_schema.TRIGGERS WHERE TRIGGER_SCHEMA = DATABASE() AND TRIGGER_NAME = %s",
+        (f"{TABLE_NAME}_claim_invoice_no",)
+    )
+    if cur.fetchone():
+        return
+    cur.execute(f"""
+    CREATE TRIGGER {TABLE_NAME}_claim_invoice_no BEFORE INSERT ON {TABLE_NAME}
+    FOR EACH ROW INSERT INTO {NUMBERS_TABLE} (invoice_no) VALUES (NEW.invoice_no)
+    """)
+    # Claimed after the trigger exists, so no insert can slip in between unclaimed
+    cur.execute(f"INSERT IGNORE INTO {NUMBERS_TABLE} (invoice_no) SELECT invoice_no FROM {TABLE_NAME}")
+
+def ensure_sort_indexes(cur):
+    """Adds the (column, invoice_no) indexes behind the sortable headings; a no-op once they exist."""
+    cur.execute(
+        "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+        (TABLE_NAME,)
+    )
+    existing = {row[0] for row in cur.fetchall()}
+    missing = [f"ADD INDEX idx_sort_{col} ({col}, invoice_no)" for col in SORT_COLUMNS
+               if col != "invoice_no" and f"idx_sort_{col}" not in existing] # invoice_no is the primary key
+    if missing:
+        # Built online, so other desks keep reading and writing while it runs
+        cur.execute(f"ALTER TABLE {TABLE_NAME} {', '.join(missing)}, ALGORITHM=INPLACE, LOCK=NONE")
+
+# ========== Invoice Row Model ==========
+INVOICE_COLUMNS = (
+    "invoice_no", "date_time", "due_date_time", "c_id", "c_name_first", "c_name_last",
+    "service_name", "no_of_sessions", "per_session", "total", "customer_mobile_number"
+)
+# Customer details live in the customers table; invoice3 only keeps c_id
+INVOICE_TABLE_COLUMNS = tuple(col for col in INVOICE_COLUMNS if col not in CUSTOMER_FIELDS)
+DATETIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def format_datetime(value):
+    """Formats a datetime for display; strings (or None) are passed through."""
+    if isinstance(value, datetime.datetime):
+        return value.strftime(DATETIME_FORMAT)
+    return value if value is not None else ""
+
+class InvoiceRow:
+    """One invoice3 row with typed fields. The Treeview only renders these; all logic reads them."""
+    __slots__ = INVOICE_COLUMNS
+
+    def __init__(self, invoice_no, date_time, due_date_time, c_id, c_name_first, c_name_last,
+                 service_name, no_of_sessions, per_session, total, customer_mobile_number):
+        self.invoice_no = int(invoice_no)
+        self.date_time = date_time
+        self.due_date_time = due_date_time
+        self.c_id = int(c_id)
+        self.c_name_first = c_name_first
+        self.c_name_last = c_name_last or ""
+        self.service_name = service_name
+        self.no_of_sessions = int(no_of_sessions)
+        self.per_session = float(per_session)
+        self.total = float(total)
+        self.customer_mobile_number = customer_mobile_number or ""
+
+    @classmethod
+    def from_table(cls, db_row, customer):
+        """Joins an invoice3 row (INVOICE_TABLE_COLUMNS order) with its cached customer record."""
+        values = dict(zip(INVOICE_TABLE_COLUMNS, db_row))
+        values.update(zip(CUSTOMER_FIELDS, customer or ("", "", "")))
+        return cls(**values)
+
+    def set_customer(self, customer):
+        self.c_name_first, self.c_name_last, self.customer_mobile_number = customer
+
+    @property
+    def full_name(self):
+        return f"{self.c_name_first} {self.c_name_last}".strip()
+
+    def display_values(self):
+        """Values in Treeview column order, formatted for display and CSV export."""
+        return (
+            self.invoice_no, format_datetime(self.date_time), format_datetime(self.due_date_time),
+            self.c_id, self.c_name_first, self.c_name_last, self.service_name, self.no_of_sessions,
+            f"{self.per_session:.2f}", f"{self.total:.2f}", self.customer_mobile_number
+        )
+
+# ========== Invoice Queries ==========
+def invoice_page_query(queries, sort, c_id=None, invoice_no=None, filters=None, after=None, nulls=False):
+    """
+    Returns (CompiledQuery, params) for one page of a search in sort order (column, descending). Explicit
+    c_id/invoice_no searches take precedence over the filters (column -> text); after is the
+    (sort value, invoice_no) of the previous page's last row. Each combination compiles only once.
+
+    NULL sort values come last in both directions. They are read as a separate part (nulls=True),
+    ordered by invoice_no alone, so both parts stay range scans on the (column, invoice_no) index.
+    """
+    filters = filters or {}
+    where = []
+    params = []
+    if invoice_no is not None:
+        where.append("invoice_no = ?")
+        params.append(invoice_no)
+    elif c_id is not None:
+        where.append("c_id = ?")
+        params.append(c_id)
+    else:
+        for col, condition in FILTER_CONDITIONS.items():
+            text = filters.get(col)
+            if text:
+                where.append(condition)
+                params.append(f"%{text}%")
+        customer_where = []
+        for col in CUSTOMER_FIELDS:
+            text = filters.get(col)
+            if text:
+                customer_where.append(f"{col} LIKE ?")
+                params.append(f"%{text}%")
+        if customer_where:
+            where.append(f"c_id IN (SELECT c_id FROM {CUSTOMERS_TABLE} WHERE {' AND '.join(customer_where)})")
+    column, descending = sort
+    direction = "DESC" if descending else "ASC"
+    by_invoice_no = column == "invoice_no" or nulls
+    if column != "invoice_no":
+        where.append(f"{column} IS NULL" if nulls else f"{column} IS NOT NULL")
+    if after is not None:
+        # Keyset paging: continue from the last row shown instead of an OFFSET that rescans skipped rows
+        comparison = "<" if descending else ">"
+        if by_invoice_no:
+            where.append(f"invoice_no {comparison} ?")
+            params.append(after[1])
+        else:
+            where.append(f"({column}, invoice_no) {comparison} (?, ?)")
+            params.extend(after)
+    order_by = f"invoice_no {direction}" if by_invoice_no else f"{column} {direction}, invoice_no {direction}"
+    # The Treeview's name and mobile columns are joined from the customer cache, so only invoice columns are read
+    query = queries.select(TABLE_NAME, INVOICE_TABLE_COLUMNS, tuple(where), order_by, PAGE_ROWS)
+    return query, params
+
+def fetch_invoice_page(reader, queries, sort, request, after=None):
+    """
+    Reads the next PAGE_ROWS invoices of a search, request being (c_id, invoice_no, filters), through
+    reader (a StatementPool or the local replica). InvoiceApp and the load test both page through this.
+    """
+    c_id, invoice_no, filters = request
+    column = sort[0]
+    nulls = column != "invoice_no" and after is not None and after[0] is None
+    query, params = invoice_page_query(queries, sort, c_id, invoice_no, filters, after, nulls)
+    rows = list(reader.execute(query, params))
+    if column != "invoice_no" and not nulls and len(rows) < PAGE_ROWS:
+        # The non-NULL values ran out; the page is filled up from the NULLs, which come last
+        query, params = invoice_page_query(queries, sort, c_id, invoice_no, filters, None, nulls=True)
+        rows.extend(reader.execute(query, params)[:PAGE_ROWS - len(rows)])
+    return rows
+
 class AddRecordForm:
     def __init__(self, parent, app_instance):
         self.app = app_instance
@@ -167,7 +373,7 @@ class AddRecordForm:
             )
             
             if success:
-                messagebox.showinfo("Success", f"Record added successfully! New Invoice No: {invoice_no}")
+                messagebox.showinfo("Saved", f"Invoice No. {invoice_no} saved locally, syncing...")
                 self.top.destroy()
             # No else needed, as errors are handled by add_record_to_db messagebox
 
@@ -175,33 +381,30 @@ class AddRecordForm:
             messagebox.showerror("Error", f"An unexpected error occurred: {e}")
 
 class UpdateRecordForm:
-    def __init__(self, parent, app_instance, current_values):
+    def __init__(self, parent, app_instance, row):
         self.app = app_instance
         self.top = tk.Toplevel(parent)
         self.top.title("Update Invoice Record")
         self.top.grab_set() # Make this window modal
 
-        self.invoice_no = current_values[0] # Get invoice_no from selected row
-
-        # Mapping of column indices to field names for current_values
-        # invoice_no(0), date_time(1), due_date_time(2), c_id(3), c_name_first(4), c_name_last(5),
-        # service_name(6), no_of_sessions(7), per_session(8), total(9), customer_mobile_number(10)
+        self.row = row
+        self.invoice_no = row.invoice_no # Get invoice_no from selected row
 
         self.field_configs = [
-            ("Invoice No:", "invoice_no", "entry", True, 0), # Read-only
-            ("Date & Time (YYYY-MM-DD HH:MM:SS)", "date_time", "entry", False, 1),
-            ("Due Date & Time (YYYY-MM-DD HH:MM:SS)", "due_date_time", "entry", False, 2),
-            ("Customer ID", "c_id", "entry", False, 3),
-            ("First Name", "c_name_first", "entry", False, 4),
-            ("Last Name", "c_name_last", "entry", False, 5),
-            ("Number of Sessions", "no_of_sessions", "entry", False, 7),
-            ("Current Total (Calculated)", "total", "entry", True, 9), # Read-only, new total calculated
-            ("Customer Mobile", "customer_mobile_number", "entry", False, 10)
+            ("Invoice No:", "invoice_no", "entry", True), # Read-only
+            ("Date & Time (YYYY-MM-DD HH:MM:SS)", "date_time", "entry", False),
+            ("Due Date & Time (YYYY-MM-DD HH:MM:SS)", "due_date_time", "entry", False),
+            ("Customer ID", "c_id", "entry", False),
+            ("First Name", "c_name_first", "entry", False),
+            ("Last Name", "c_name_last", "entry", False),
+            ("Number of Sessions", "no_of_sessions", "entry", False),
+            ("Current Total (Calculated)", "total", "entry", True), # Read-only, new total calculated
+            ("Customer Mobile", "customer_mobile_number", "entry", False)
         ]
         self.entries = {}
 
         row_num = 0
-        for label_text, field_name, widget_type_str, read_only, value_index in self.field_configs:
+        for label_text, field_name, widget_type_str, read_only in self.field_configs:
             tk.Label(self.top, text=label_text + ":").grid(row=row_num, column=0, padx=5, pady=2, sticky="w")
             
             entry = tk.Entry(self.top, width=40) # Default to Entry
@@ -213,13 +416,11 @@ class UpdateRecordForm:
             
             # Populate with current value
             entry.config(state="normal") # Temporarily enable to insert
-            val = current_values[value_index]
-            if field_name == "c_name_last" or field_name == "customer_mobile_number":
-                 entry.insert(0, val if val is not None else "")
-            elif field_name == "total" or field_name == "per_session":
-                 entry.insert(0, f"{float(val):.2f}")
+            val = getattr(row, field_name)
+            if field_name == "total" or field_name == "per_session":
+                 entry.insert(0, f"{val:.2f}")
             else:
-                 entry.insert(0, val)
+                 entry.insert(0, format_datetime(val))
             if read_only:
                 entry.config(state="readonly")
             row_num += 1
@@ -232,8 +433,8 @@ class UpdateRecordForm:
         self.service_combobox.bind("<<ComboboxSelected>>", self.update_per_session_cost)
         self.entries["service_name"] = self.service_combobox # Store combobox in entries dict
         
-        # Set initial value for combobox based on current_values[6]
-        initial_service = current_values[6]
+        # Set initial value for combobox based on the row's service
+        initial_service = row.service_name
         if initial_service in SERVICE_PRICES:
             self.service_combobox.set(initial_service)
         else:
@@ -399,10 +600,8 @@ class InvoiceApp:
 
 
         # ========== Treeview ==========
-        self.tree = ttk.Treeview(mid_frame, columns=(
-            "invoice_no", "date_time", "due_date_time", "c_id", "c_name_first", "c_name_last",
-            "service_name", "no_of_sessions", "per_session", "total", "customer_mobile_number"
-        ), show='headings')
+        self.tree = ttk.Treeview(mid_frame, columns=INVOICE_COLUMNS, show='headings')
+        self.rows = {} # invoice_no -> InvoiceRow for everything currently shown
 
         # Define column headings and widths
         self.columns_config = {
@@ -424,8 +623,15 @@ class InvoiceApp:
 
         # Configure columns and add filter entries with specific labels
         self.filter_entries = {}
+        self.sort = DEFAULT_SORT
+        self.page_request = None # (c_id, invoice_no, filters) of the search being paged through
+        self.page_after = None # (sort value, invoice_no) of the last row shown; None when there are no more pages
+        self.page_job = None
+        self.archived_rows = [] # Archive matches, shown once the MySQL pages run out
         for col, config in self.columns_config.items():
             self.tree.heading(col, text=config["text"])
+            if col in SORT_COLUMNS:
+                self.tree.heading(col, command=lambda c=col: self.sort_by(c))
             self.tree.column(col, width=config["width"], anchor="center")
 
             if config["filter"]:
@@ -435,18 +641,35 @@ class InvoiceApp:
                 filter_var = tk.StringVar()
                 filter_entry = ttk.Entry(self.filter_frame, textvariable=filter_var, width=int(config["width"] / 9)) # Approximate width
                 filter_entry.pack(side="left", padx=2, pady=2)
-                filter_entry.bind("<KeyRelease>", self.apply_filters)
+                filter_entry.bind("<KeyRelease>", lambda e, c=col: self.on_filter_key(e, c))
+                filter_entry.bind("<Escape>", lambda e: self.hide_suggestions())
                 self.filter_entries[col] = {"var": filter_var, "entry": filter_entry}
             else:
                 # Add a placeholder label for non-filterable columns to maintain alignment
                 pass # No label/entry for non-filterable columns, the layout is handled implicitly by previous elements.
 
+        # Archived (closed) periods live in local files and are only searched on request
+        self.archive = None
+        self.archived_invoice_nos = set()
+        self.include_archive = tk.BooleanVar(value=False)
+        tk.Checkbutton(self.filter_frame, text="Include archive", variable=self.include_archive,
+                       command=self.fetch_data).pack(side="left", padx=(10, 2), pady=2)
+
         self.tree.pack(fill="both", expand=True)
 
+        # ========== Typeahead Suggestions ==========
+        self.customer_index = CustomerIndex()
+        self.suggestions = []
+        self.filter_job = None
+        self.suggestion_list = tk.Listbox(root, height=8, width=60)
+        self.suggestion_list.bind("<ButtonRelease-1>", self.select_suggestion)
+        self.suggestion_list.bind("<Return>", self.select_suggestion)
+        self.suggestion_list.bind("<Escape>", lambda e: self.hide_suggestions())
+
         # Add scrollbars to Treeview
         vsb = ttk.Scrollbar(mid_frame, orient="vertical", command=self.tree.yview)
         vsb.pack(side="right", fill="y")
-        self.tree.configure(yscrollcommand=vsb.set)
+        self.tree.configure(yscrollcommand=lambda first, last: self.on_tree_scroll(vsb, first, last))
 
         hsb = ttk.Scrollbar(mid_frame, orient="horizontal", command=self.tree.xview)
         hsb.pack(side="bottom", fill="x")
@@ -461,6 +684,8 @@ class InvoiceApp:
         # --- Print Button near Selected Invoice Frame ---
         self.print_preview_button = tk.Button(preview_frame, text="Print Invoice (PDF)", command=self.print_invoice_pdf)
         self.print_preview_button.pack(pady=5)
+        self.statement_button = tk.Button(preview_frame, text="Customer Statement (PDF)", command=self.print_customer_statement)
+        self.statement_button.pack(pady=5)
         # --- End Print Button ---
 
         # ========== Total Amount for Selected Customer ==========
@@ -481,29 +706,59 @@ class InvoiceApp:
         tk.Button(btn_frame, text="Clear Filters", command=self.clear_filters).pack(side="left", padx=5, pady=5) # Renamed from Find to Clear Filters
         tk.Button(btn_frame, text="Refresh All", command=self.fetch_data).pack(side="left", padx=5, pady=5)
         tk.Button(btn_frame, text="Download CSV", command=self.download_csv).pack(side="left", padx=5, pady=5)
-
-
-        # Initial data fetch
-        self.fetch_data()
+        tk.Button(btn_frame, text="Mark Paid", command=self.mark_selected_paid).pack(side="left", padx=5, pady=5)
+        tk.Button(btn_frame, text="Due Invoices", command=self.open_due_window).pack(side="left", padx=5, pady=5)
+
+        self.due_scanner = DueScanner(DUE_SOON_DAYS)
+        self.due_status_label = tk.Label(btn_frame, text="", fg="firebrick")
+        self.due_status_label.pack(side="left", padx=10, pady=5)
+
+        self.write_status_label = tk.Label(btn_frame, text="", fg="gray")
+        self.write_status_label.pack(side="left", padx=10, pady=5)
+        self.last_saved = "" # The last change MySQL confirmed, shown with the pending count
+
+        # ========== Background Writer ==========
+        # Rows written through the queue show up immediately and stay gray until MySQL confirms them
+        self.tree.tag_configure("pending", foreground="gray")
+        self.tree.tag_configure("archived", foreground="steelblue")
+        self.undo = {} # mutation id -> index entries to put back if MySQL rejects the write
+        self.writer = InvoiceWriter(connect_db, TABLE_NAME, INVOICE_TABLE_COLUMNS, JOURNAL_PATH,
+                                    upsert_customers=True, log_changes=True)
+        self.customers = CustomerCache(connect_db) # Names are joined in memory, not selected per invoice
+        self.queries = QueryBuilder()
+        self.statements = StatementPool(connect_reader) # Interactive reads share two long-lived connections
+        self.replica = None
+        self.reader = self.statements # Runs the CompiledQuery reads: MySQL, or the local replica
+        if USE_LOCAL_REPLICA:
+            from replica import InvoiceReplica, ReplicaCustomerCache
+            self.replica = InvoiceReplica(REPLICA_PATH, connect_db).start()
+            self.reader = self.replica
+            self.customers = ReplicaCustomerCache(self.replica)
+            self.replica_status_label = tk.Label(btn_frame, text="")
+            self.replica_status_label.pack(side="left", padx=10, pady=5)
+            self.root.after(REPLICA_STATUS_MS, self.update_replica_status)
+        self.root.after(WRITE_POLL_MS, self.poll_write_results)
+
+
+        # Initial data load runs in the background so the window shows up immediately
+        self.initial_load_cancelled = threading.Event() # Set by fetch_data once it replaces the startup page
+        self.load_edits = {} # kind -> local edits to replay onto the loader's copies, while it builds them
+        self.clear_preview()
         self.update_customer_total_amount(None) # Initialize total to 0
+        self.start_initial_load()
 
 
     # ========== MySQL Connection ==========
     def connect_db(self):
         """Establishes a connection to the MySQL database."""
-        return pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=DB_NAME)
+        return connect_db()
 
     def get_latest_invoice_no(self):
-        """Fetches the highest existing invoice number from the database."""
+        """Fetches the highest invoice number ever used, including deleted and archived ones."""
         try:
-            con = self.connect_db()
-            cur = con.cursor()
-            cur.execute(f"SELECT MAX(invoice_no) FROM {TABLE_NAME}")
-            result = cur.fetchone()
-            con.close()
-            if result and result[0] is not None:
-                return int(result[0])
-            return 0 # No invoices yet, start from 1
+            result = self.reader.execute(self.queries.select(NUMBERS_TABLE, ["MAX(invoice_no)"]))[0]
+            latest = int(result[0]) if result and result[0] is not None else 0 # 0: no invoices yet, start from 1
+            return max(latest, self.writer.max_pending_invoice_no()) # Queued inserts are not in MySQL yet
         except Exception as e:
             messagebox.showerror("Database Error", f"Failed to fetch latest invoice number: {e}")
             return 0 # Default to 0 on error
@@ -514,67 +769,515 @@ class InvoiceApp:
         Fetches invoice data from the database and populates the Treeview.
         Applies filters based on the text in the filter entry fields.
         """
+        self.initial_load_cancelled.set() # An explicit fetch replaces the startup page if it has not arrived yet
         try:
-            con = self.connect_db()
-            cur = con.cursor()
-            query = f"SELECT invoice_no, date_time, due_date_time, c_id, c_name_first, c_name_last, service_name, no_of_sessions, per_session, total, customer_mobile_number FROM {TABLE_NAME}"
-            params = []
-            
-            # Build WHERE clause from filters, prioritizing explicit c_id/invoice_no if provided
-            where_clauses = []
-
-            if invoice_no is not None: # Explicit invoice_no search takes precedence
-                where_clauses.append("invoice_no = %s")
-                params.append(invoice_no)
-            elif c_id is not None: # Explicit c_id search
-                where_clauses.append("c_id = %s")
-                params.append(c_id)
-            else: # Apply general filters
-                if self.filter_entries["date_time"]["var"].get():
-                    where_clauses.append("CAST(date_time AS CHAR) LIKE %s")
-                    params.append(f"%{self.filter_entries['date_time']['var'].get()}%")
-                if self.filter_entries["c_id"]["var"].get():
-                    where_clauses.append("c_id LIKE %s")
-                    params.append(f"%{self.filter_entries['c_id']['var'].get()}%")
-                if self.filter_entries["c_name_first"]["var"].get():
-                    where_clauses.append("c_name_first LIKE %s")
-                    params.append(f"%{self.filter_entries['c_name_first']['var'].get()}%")
-                if self.filter_entries["c_name_last"]["var"].get():
-                    where_clauses.append("c_name_last LIKE %s")
-                    params.append(f"%{self.filter_entries['c_name_last']['var'].get()}%")
-                if self.filter_entries["customer_mobile_number"]["var"].get():
-                    where_clauses.append("customer_mobile_number LIKE %s")
-                    params.append(f"%{self.filter_entries['customer_mobile_number']['var'].get()}%")
-
-            if where_clauses:
-                query += " WHERE " + " AND ".join(where_clauses)
-            
-            query += " ORDER BY invoice_no DESC" # Order by invoice number descending
-            
-            cur.execute(query, tuple(params))
-            rows = cur.fetchall()
-            self.tree.delete(*self.tree.get_children())
-            
-            if not rows and (c_id is not None or invoice_no is not None or any(filter_entry["var"].get() for filter_entry in self.filter_entries.values())):
-                 messagebox.showinfo("No Records Found", "No records found matching your filter/search criteria.")
-            
-            for row in rows:
-                # Format datetime objects for display if they come as objects
-                formatted_row = list(row)
-                for i in [1, 2]: # indices for date_time and due_date_time
-                    if isinstance(formatted_row[i], datetime.datetime):
-                        formatted_row[i] = formatted_row[i].strftime('%Y-%m-%d %H:%M:%S')
-                self.tree.insert('', 'end', values=formatted_row)
-            con.close()
-            self.clear_preview()
-            self.update_customer_total_amount(None) # Clear total when new data is fetched
+            filters = {col: filter_entry["var"].get() for col, filter_entry in self.filter_entries.items()}
+            self.page_request = (c_id, invoice_no, filters)
+            self.show_first_page(self.fetch_page())
         except Exception as e:
             messagebox.showerror("Database Error", f"Failed to fetch data: {e}")
 
+    def show_first_page(self, rows):
+        """Replaces the Treeview with the first page of the search in self.page_request."""
+        c_id, invoice_no, filters = self.page_request
+        archived_rows = self.search_archive(c_id, invoice_no) if self.include_archive.get() else []
+        self.tree.delete(*self.tree.get_children())
+        self.rows = {}
+        # Only an unfiltered view in the default order takes new invoices from the change feed
+        self.showing_all = c_id is None and invoice_no is None and not any(filters.values()) and self.sort == DEFAULT_SORT
+        self.archived_invoice_nos = set()
+        column, descending = self.sort
+        # Merged into the pages in the same order as the MySQL rows (see show_page); kept back to
+        # front, so the next one to show is popped off the end
+        position = INVOICE_COLUMNS.index(column)
+        self.archived_rows = sorted(archived_rows, reverse=not descending,
+                                    key=lambda archived: self.order_key(archived[position], archived[0]))
+
+        if not rows and not archived_rows and (c_id is not None or invoice_no is not None or any(filters.values())):
+             messagebox.showinfo("No Records Found", "No records found matching your filter/search criteria.")
+
+        self.show_page(rows)
+        self.tree.yview_moveto(0)
+        self.clear_preview()
+        self.update_customer_total_amount(None) # Clear total when new data is fetched
+
+    # ========== Sorting and Paging ==========
+    def sort_by(self, column):
+        """Heading click: sorts by the column in MySQL, toggling the direction on a second click."""
+        old_column, descending = self.sort
+        self.sort = (column, not descending if column == old_column else True)
+        for col in SORT_COLUMNS:
+            arrow = (" ▼" if self.sort[1] else " ▲") if col == column else ""
+            self.tree.heading(col, text=self.columns_config[col]["text"] + arrow)
+        c_id, invoice_no, _ = self.page_request or (None, None, None)
+        self.fetch_data(c_id, invoice_no)
+
+    def fetch_page(self, after=None):
+        """Reads the next PAGE_ROWS invoices of the current search."""
+        return fetch_invoice_page(self.reader, self.queries, self.sort, self.page_request, after)
+
+    def order_key(self, value, invoice_no):
+        """A row's position in the current order as a sort key (reversed when descending), NULLs last."""
+        descending = self.sort[1]
+        if isinstance(value, datetime.datetime):
+            value = format_datetime(value) # Archived rows hold the formatted string
+        elif isinstance(value, str):
+            value = value.casefold() # MySQL's default collation ignores case
+        return ((value is None) != descending, value, invoice_no)
+
+    def show_page(self, rows):
+        """
+        Appends one page of invoice-table rows to the Treeview and remembers where the next page starts.
+        Archived rows that sort before the end of the page are merged in, so every order covers both.
+        """
+        column, descending = self.sort
+        position = INVOICE_TABLE_COLUMNS.index(column)
+        customers = self.customers.get_many([db_row[3] for db_row in rows]) # db_row[3] is c_id
+        live = [(self.order_key(db_row[position], db_row[0]), InvoiceRow.from_table(db_row, customers.get(db_row[3])), ())
+                for db_row in rows]
+        if len(rows) == PAGE_ROWS:
+            self.page_after = (rows[-1][position], rows[-1][0])
+            end = live[-1][0]
+        else:
+            self.page_after = None
+            end = None # Last page: everything left in the archive goes in
+        archived_position = INVOICE_COLUMNS.index(column)
+        archived = []
+        while self.archived_rows:
+            key = self.order_key(self.archived_rows[-1][archived_position], self.archived_rows[-1][0])
+            if end is not None and (key < end if descending else key > end):
+                break # Belongs on a later page
+            archived.append((key, InvoiceRow(*self.archived_rows.pop()), ("archived",)))
+
+        for _, row, tags in heapq.merge(live, archived, key=lambda entry: entry[0], reverse=descending):
+            item = str(row.invoice_no)
+            if row.invoice_no in self.rows:
+                if tags or row.invoice_no not in self.archived_invoice_nos:
+                    continue
+                # An interrupted archive run left the invoice in both places; the MySQL copy wins
+                self.archived_invoice_nos.discard(row.invoice_no)
+                self.tree.delete(item)
+            self.rows[row.invoice_no] = row
+            if tags:
+                self.archived_invoice_nos.add(row.invoice_no)
+            # The item id is the invoice number, so selections map straight back to self.rows
+            self.tree.insert('', 'end', iid=item, values=row.display_values(), tags=tags)
+
+    def on_tree_scroll(self, scrollbar, first, last):
+        """Treeview yscrollcommand: moves the scrollbar and loads the next page once the bottom is in view."""
+        scrollbar.set(first, last)
+        if float(last) >= 1.0 and self.page_after is not None and self.page_job is None:
+            self.page_job = self.root.after_idle(self.load_next_page)
+
+    def load_next_page(self):
+        self.page_job = None
+        if self.page_after is None:
+            return
+        try:
+            self.show_page(self.fetch_page(self.page_after))
+        except Exception as e:
+            self.page_after = None # Stop paging; Refresh All starts over
+            messagebox.showerror("Database Error", f"Failed to fetch more invoices: {e}")
+
+    def search_archive(self, c_id=None, invoice_no=None):
+        """Searches the cold archive files with the same criteria as the MySQL query."""
+        if self.archive is None:
+            from invoice_archive import InvoiceArchive # Only needed when the archive is included
+            self.archive = InvoiceArchive()
+        like_filters = {col: entry["var"].get() for col, entry in self.filter_entries.items()}
+        return self.archive.search(c_id=c_id, invoice_no=invoice_no, like_filters=like_filters)
+
+    def selected_row(self):
+        """Returns the InvoiceRow for the focused Treeview item, or None."""
+        selected_item = self.tree.focus()
+        if not selected_item:
+            return None
+        return self.rows.get(int(selected_item))
+
     def apply_filters(self, event=None):
         """Applies filters based on the current text in the filter entry fields."""
+        self.filter_job = None
         self.fetch_data()
 
+    # ========== Background Startup Load ==========
+    def start_initial_load(self):
+        """Loads the first page of invoices (and then the customer index) from a background thread."""
+        self.load_queue = queue.Queue()
+        self.rows = {}
+        self.showing_all = True
+        self.load_edits = {"index": [], "due": []} # Local edits to replay onto the loader's copies
+        threading.Thread(target=self.initial_load_worker, daemon=True).start()
+        self.root.after(STARTUP_POLL_MS, self.drain_initial_load)
+        if self.replica is not None:
+            self.fetch_data() # First page from the local copy, whatever the link is doing
+
+    def initial_load_worker(self):
+        """Runs on the loader thread; only talks to MySQL and the queue, never to Tk."""
+        feed_seq = None # With a local replica, rows come from fetch_data and changes from the replica
+        try:
+            if self.replica is None:
+                feed_seq, rows = self.load_first_page()
+                self.load_queue.put(("page", rows))
+        except Exception as e:
+            self.load_queue.put(("error", e))
+            return
+        try:
+            self.load_queue.put(("index", self.load_copy("index", self.build_customer_index)))
+        except Exception as e:
+            print(f"Error building customer search index: {e}") # Typeahead is optional, filters still work
+        try:
+            self.load_queue.put(("due", self.load_copy("due", self.build_due_scanner)))
+        except Exception as e:
+            print(f"Error loading unpaid invoices: {e}")
+        self.load_queue.put(("feed", feed_seq))
+        self.load_queue.put(("done", None))
+        try:
+            con = self.connect_db()
+            try:
+                ensure_sort_indexes(con.cursor()) # Only slow the first time, on a large table
+            finally:
+                con.close()
+        except Exception as e:
+            print(f"Error creating sort indexes: {e}") # Sorting still works, just without index range scans
+
+    def load_first_page(self):
+        """
+        Reads the first page of the default view; returns (feed_seq, rows), feed_seq being the
+        change-log position the page corresponds to. Later pages load as the Treeview is scrolled.
+        """
+        con = self.connect_db()
+        try:
+            cur = con.cursor()
+            ensure_change_log(cur)
+            ensure_invoice_numbers(cur)
+            con.commit()
+            # Changes logged after this point are replayed by the change feed once loading is done
+            feed_seq = latest_seq(cur)
+        finally:
+            con.close()
+        rows = fetch_invoice_page(self.reader, self.queries, DEFAULT_SORT, (None, None, {}))
+        self.customers.get_many([db_row[3] for db_row in rows]) # Warms the cache, so showing the page needs no lookups
+        return feed_seq, rows
+
+    def load_copy(self, kind, build):
+        """
+        Runs build() on the loader thread. Returns (copy, edits_seen, outstanding): how many local
+        edits had been made before it started reading and which writes were still uncommitted then.
+        """
+        edits_seen = len(self.load_edits[kind])
+        with self.writer.journal_lock:
+            outstanding = set(self.writer.outstanding)
+        return build(), edits_seen, outstanding
+
+    def adopt_copy(self, kind, copy, edits_seen, outstanding):
+        """
+        Swaps in the loader's copy of the customer or due-date index, first replaying the local
+        edits it cannot contain: those made after it started reading and those not committed by then.
+        """
+        for i, (mutation_id, edit) in enumerate(self.load_edits.pop(kind)):
+            if i >= edits_seen or mutation_id in outstanding:
+                edit(copy)
+        if kind == "index":
+            self.customer_index = copy
+        else:
+            self.due_scanner = copy
+
+    def edit_index(self, kind, edit, mutation_id=None):
+        """
+        Applies edit to the customer index ('index') or the due-date index ('due'). Until the loader
+        has delivered its own copy, the edit is kept too, to be replayed onto that copy.
+        """
+        edit(self.customer_index if kind == "index" else self.due_scanner)
+        if kind in self.load_edits:
+            self.load_edits[kind].append((mutation_id, edit))
+
+    def drain_initial_load(self):
+        """Applies one result of the background load per tick so the window stays responsive."""
+        try:
+            kind, payload = self.load_queue.get_nowait()
+        except queue.Empty:
+            self.root.after(STARTUP_POLL_MS, self.drain_initial_load)
+            return
+
+        if kind == "page" and not self.initial_load_cancelled.is_set():
+            self.page_request = (None, None, {col: "" for col in self.filter_entries})
+            self.show_first_page(payload)
+        elif kind == "index":
+            self.adopt_copy(kind, *payload)
+        elif kind == "due":
+            self.adopt_copy(kind, *payload)
+            self.update_due_status()
+            self.scan_due_invoices()
+        elif kind == "feed":
+            self.load_edits.clear() # Copies that failed to load are not coming; keep the local ones
+            self.change_feed = self.replica if payload is None else ChangeFeed(connect_db, payload).start()
+            self.root.after(CHANGE_POLL_MS, self.poll_changes)
+        elif kind == "error":
+            messagebox.showerror("Database Error", f"Failed to fetch data: {payload}")
+            return
+        elif kind == "done":
+            return
+        self.root.after(1, self.drain_initial_load)
+
+    # ========== Change Feed ==========
+    def poll_changes(self):
+        """Applies invoice changes committed by other desks (and echoes of our own) since the last poll."""
+        for seq, op, invoice_no, data in self.change_feed.poll():
+            if op == "reload":
+                self.fetch_data() # The replica finished its first full copy
+                continue
+            self.apply_change(op, invoice_no, data)
+        self.root.after(CHANGE_POLL_MS, self.poll_changes)
+
+    def apply_change(self, op, invoice_no, data):
+        """
+        Applies one change-log entry. The customer and due-date indexes cover every invoice, so they are
+        updated whether or not the invoice is loaded; the rows and the Treeview only for what is shown.
+        """
+        item = str(invoice_no)
+        if self.tree.exists(item) and "pending" in self.tree.item(item, "tags"):
+            return # Our own queued write is newer than anything the log can tell us
+        if op in ("delete", "archive"):
+            self.customer_index.remove_invoice(invoice_no)
+            if invoice_no in self.due_scanner.invoices:
+                self.due_scanner.remove(invoice_no)
+                self.update_due_status()
+            self.rows.pop(invoice_no, None)
+            if self.tree.exists(item):
+                self.tree.delete(item)
+            return
+        if op == "paid":
+            if invoice_no in self.due_scanner.invoices:
+                self.due_scanner.remove(invoice_no)
+                self.update_due_status()
+            return
+        if op not in ("insert", "update"):
+            return # e.g. 'billed', which only links bookings to the invoice
+
+        row = InvoiceRow(**data)
+        # Keyed by invoice_no: the index knows the previous c_id, and a replayed insert counts once
+        self.customer_index.add_invoice(invoice_no, row.c_id, row.c_name_first, row.c_name_last, row.customer_mobile_number)
+        if op == "insert" or invoice_no in self.due_scanner.invoices: # New invoices start out unpaid
+            self.track_due(row)
+        self.apply_customer(row.c_id, (row.c_name_first, row.c_name_last, row.customer_mobile_number))
+        if invoice_no not in self.rows and not (op == "insert" and self.showing_all):
+            return # Not part of the current (filtered) view
+        self.rows[invoice_no] = row
+        if self.tree.exists(item):
+            self.tree.item(item, values=row.display_values())
+        else:
+            self.tree.insert('', 0, iid=item, values=row.display_values())
+
+    # ========== Due Dates ==========
+    def build_due_scanner(self):
+        """Loads every unpaid invoice into a due-date index (runs on the loader thread)."""
+        scanner = DueScanner(DUE_SOON_DAYS)
+        con = self.connect_db()
+        try:
+            cur = con.cursor()
+            ensure_payments_table(cur)
+            con.commit()
+            cur = con.cursor(pymysql.cursors.SSCursor)
+            cur.execute(f"""
+            SELECT i.invoice_no, i.due_date_time, i.c_id, i.total FROM {TABLE_NAME} i
+            LEFT JOIN {PAYMENTS_TABLE} p ON p.invoice_no = i.invoice_no
+            WHERE p.invoice_no IS NULL
+            """)
+            for invoice_no, due_date_time, c_id, total in cur:
+                if due_date_time is not None:
+                    scanner.upsert(invoice_no, due_date_time, c_id, float(total))
+        finally:
+            con.close()
+        return scanner
+
+    def scan_due_invoices(self):
+        """Periodic tick: only invoices that crossed a threshold since the last tick are looked at."""
+        newly_overdue, newly_due_soon = self.due_scanner.tick()
+        if newly_overdue or newly_due_soon:
+            self.update_due_status()
+        if not getattr(self, "due_scan_scheduled", False):
+            self.due_scan_scheduled = True
+            self.root.after(DUE_SCAN_MS, self.due_scan_loop)
+
+    def due_scan_loop(self):
+        self.due_scan_scheduled = False
+        self.scan_due_invoices()
+
+    def track_due(self, row, mutation_id=None, unpaid_only=False):
+        """
+        Puts an unpaid invoice into the due-date index (ignoring unparseable due dates). With
+        unpaid_only, invoices not already in the index (paid ones) are left out.
+        """
+        def edit(scanner):
+            if unpaid_only and row.invoice_no not in scanner.invoices:
+                return
+            try:
+                scanner.upsert(row.invoice_no, row.due_date_time, row.c_id, row.total)
+            except ValueError:
+                scanner.remove(row.invoice_no)
+
+        self.edit_index("due", edit, mutation_id)
+        self.update_due_status()
+
+    def update_due_status(self):
+        overdue = len(self.due_scanner.overdue())
+        due_soon = len(self.due_scanner.due_within(DUE_SOON_DAYS))
+        self.due_status_label.config(text=f"⚠ {overdue} overdue, {due_soon} due within {DUE_SOON_DAYS} days" if overdue or due_soon else "")
+
+    def mark_paid(self, invoice_no):
+        """Records a payment for an invoice and drops it from the due-date index."""
+        try:
+            con = self.connect_db()
+            try:
+                cur = con.cursor()
+                cur.execute(
+                    f"INSERT INTO {PAYMENTS_TABLE} (invoice_no, paid_date_time) VALUES (%s, %s) "
+                    f"ON DUPLICATE KEY UPDATE paid_date_time = paid_date_time",
+                    (invoice_no, datetime.datetime.now().strftime(DATETIME_FORMAT))
+                )
+                record_changes(cur, [("paid", invoice_no, None)]) # Other desks drop it from their due lists too
+                con.commit()
+            finally:
+                con.close()
+        except Exception as e:
+            messagebox.showerror("Database Error", f"Failed to mark Invoice No. {invoice_no} as paid: {e}")
+            return False
+        self.edit_index("due", lambda scanner: scanner.remove(invoice_no)) # Committed already, no mutation id
+        self.update_due_status()
+        return True
+
+    def mark_selected_paid(self):
+        """Marks the invoice selected in the table as paid."""
+        row = self.selected_row()
+        if not row:
+            messagebox.showwarning("Warning", "No record selected to mark as paid.")
+            return
+        if row.invoice_no not in self.due_scanner.invoices:
+            messagebox.showinfo("Already Paid", f"Invoice No. {row.invoice_no} is already marked as paid.")
+            return
+        if self.mark_paid(row.invoice_no):
+            messagebox.showinfo("Success", f"Invoice No. {row.invoice_no} marked as paid.")
+
+    def open_due_window(self):
+        """Overdue, due-soon and per-customer outstanding views over the due-date index."""
+        top = tk.Toplevel(self.root)
+        top.title("Due Invoices")
+
+        controls = tk.Frame(top)
+        controls.pack(fill="x", padx=5, pady=5)
+        view = tk.StringVar(value="overdue")
+        days = tk.StringVar(value=str(DUE_SOON_DAYS))
+        tk.Radiobutton(controls, text="Overdue", variable=view, value="overdue", command=lambda: refresh()).pack(side="left")
+        tk.Radiobutton(controls, text="Due in", variable=view, value="due", command=lambda: refresh()).pack(side="left")
+        tk.Spinbox(controls, from_=1, to=365, width=4, textvariable=days, command=lambda: refresh()).pack(side="left")
+        tk.Label(controls, text="days").pack(side="left", padx=(2, 10))
+        tk.Radiobutton(controls, text="Outstanding by Customer", variable=view, value="customers", command=lambda: refresh()).pack(side="left")
+
+        listbox = tk.Listbox(top, width=90, height=20)
+        listbox.pack(fill="both", expand=True, padx=5, pady=5)
+        shown = []
+
+        def customer_name(c_id):
+            customer = self.customer_index.customers.get(c_id)
+            return f"{customer[0]} {customer[1] or ''}".strip() if customer else ""
+
+        def refresh():
+            shown.clear()
+            listbox.delete(0, tk.END)
+            if view.get() == "customers":
+                for c_id, outstanding in self.due_scanner.customer_outstanding():
+                    shown.append(c_id)
+                    listbox.insert(tk.END, f"Customer {c_id} {customer_name(c_id)}: ₹ {outstanding:,.2f} outstanding")
+                return
+            try:
+                invoice_nos = self.due_scanner.overdue() if view.get() == "overdue" else self.due_scanner.due_within(int(days.get()))
+            except ValueError:
+                return
+            for invoice_no in invoice_nos:
+                due, c_id, total = self.due_scanner.invoices[invoice_no]
+                shown.append(invoice_no)
+                listbox.insert(tk.END, f"Invoice {invoice_no} | due {due.strftime(DATETIME_FORMAT)} | "
+                                       f"customer {c_id} {customer_name(c_id)} | ₹ {total:,.2f}")
+
+        def mark_paid():
+            selection = listbox.curselection()
+            if not selection or view.get() == "customers":
+                messagebox.showwarning("Warning", "Select an invoice to mark as paid.", parent=top)
+                return
+            if self.mark_paid(shown[selection[0]]):
+                refresh()
+
+        def show_customer(event=None):
+            selection = listbox.curselection()
+            if selection and view.get() == "customers":
+                self.fetch_data(c_id=shown[selection[0]])
+
+        listbox.bind("<Double-Button-1>", show_customer)
+        tk.Button(top, text="Mark Paid", command=mark_paid).pack(pady=5)
+        refresh()
+
+    # ========== Customer Typeahead ==========
+    def build_customer_index(self):
+        """Builds a customer search index in one streaming pass over the invoices and their customers."""
+        index = CustomerIndex()
+        con = self.connect_db()
+        try:
+            cur = con.cursor(pymysql.cursors.SSCursor) # Unbuffered: rows are indexed as they arrive
+            cur.execute(
+                f"SELECT i.invoice_no, i.c_id, c.c_name_first, c.c_name_last, c.customer_mobile_number FROM {TABLE_NAME} i "
+                f"JOIN {CUSTOMERS_TABLE} c ON c.c_id = i.c_id ORDER BY i.invoice_no"
+            )
+            index.build(cur)
+        finally:
+            con.close()
+        return index
+
+    def on_filter_key(self, event, col):
+        """Updates typeahead suggestions and schedules the (debounced) database filter."""
+        if event.keysym == "Escape":
+            return
+        if event.keysym == "Down" and self.suggestions:
+            self.suggestion_list.focus_set()
+            self.suggestion_list.selection_set(0)
+            return
+        if col in TYPEAHEAD_COLUMNS:
+            self.show_suggestions(col)
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+        self.filter_job = self.root.after(FILTER_DEBOUNCE_MS, self.apply_filters)
+
+    def show_suggestions(self, col):
+        """Shows matching customers from the in-memory index below the given filter entry."""
+        text = self.filter_entries[col]["var"].get()
+        self.suggestions = self.customer_index.search(text) if text else []
+        if not self.suggestions:
+            self.hide_suggestions()
+            return
+        self.suggestion_list.delete(0, tk.END)
+        for c_id, first, last, mobile in self.suggestions:
+            self.suggestion_list.insert(tk.END, f"{c_id} - {first} {last or ''} ({mobile or 'N/A'})")
+        self.suggestion_list.place(in_=self.filter_entries[col]["entry"], x=0, rely=1.0)
+        self.suggestion_list.lift()
+
+    def hide_suggestions(self):
+        """Hides the typeahead dropdown."""
+        self.suggestions = []
+        self.suggestion_list.place_forget()
+
+    def select_suggestion(self, event=None):
+        """Shows the invoices of the chosen customer."""
+        selection = self.suggestion_list.curselection()
+        if not selection:
+            return
+        c_id = self.suggestions[selection[0]][0]
+        self.hide_suggestions()
+        if self.filter_job is not None:
+            self.root.after_cancel(self.filter_job)
+            self.filter_job = None
+        for col_name in self.filter_entries:
+            self.filter_entries[col_name]["var"].set("")
+        self.fetch_data(c_id=c_id)
+
     def clear_filters(self):
         """Clears all filter entry fields and refreshes the data."""
         for col_name in self.filter_entries:
@@ -586,7 +1289,7 @@ class InvoiceApp:
         Downloads the currently displayed (filtered) data in the Treeview
         to a CSV file.
         """
-        if not self.tree.get_children():
+        if not self.rows:
             messagebox.showwarning("No Data", "No data to download to CSV.")
             return
 
@@ -605,9 +1308,8 @@ class InvoiceApp:
                 csv_writer.writerow(headers)
 
                 # Write data rows
-                for item_id in self.tree.get_children():
-                    row_values = self.tree.item(item_id, 'values')
-                    csv_writer.writerow(row_values)
+                for row in self.rows.values():
+                    csv_writer.writerow(row.display_values())
             
             messagebox.showinfo("Download Complete", f"Data successfully saved to {file_path}")
 
@@ -618,67 +1320,144 @@ class InvoiceApp:
     # ========== Add Record to DB ==========
     def add_record_to_db(self, invoice_no, date_time, due_date_time, c_id, c_name_first, c_name_last, service_name, no_of_sessions, per_session, total, customer_mobile_number):
         """
-        Inserts a new invoice record into the database using the provided invoice_no.
-        Handles duplicate invoice number errors.
+        Queues a new invoice record for the background writer and shows it right away.
+        Duplicate invoice numbers already on screen are rejected immediately; others are
+        reported when the writer gets the error back from MySQL.
         """
+        if invoice_no in self.rows:
+            messagebox.showerror("Database Error", f"Invoice Number {invoice_no} already exists. Please choose a different one.")
+            return False # Indicate failure
         try:
-            con = self.connect_db()
-            cur = con.cursor()
-            sql = f"""
-            INSERT INTO {TABLE_NAME} (
+            row = InvoiceRow(
                 invoice_no, date_time, due_date_time, c_id, c_name_first, c_name_last,
                 service_name, no_of_sessions, per_session, total, customer_mobile_number
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            cur.execute(sql, (
-                invoice_no, date_time, due_date_time, c_id, c_name_first, c_name_last,
-                service_name, no_of_sessions, per_session, total, customer_mobile_number
-            ))
-            con.commit()
-            con.close()
-            self.fetch_data() # Refresh Treeview
-            return True # Indicate success
-        except pymysql.err.IntegrityError as e:
-            if "Duplicate entry" in str(e) and "for key 'PRIMARY'" in str(e):
-                messagebox.showerror("Database Error", f"Invoice Number {invoice_no} already exists. Please choose a different one.")
-            else:
-                messagebox.showerror("Database Error", f"Failed to add record due to data integrity issue: {e}")
-            return False # Indicate failure
+            )
+            mutation_id = self.writer.submit("insert", self.row_to_dict(row))
         except Exception as e:
             messagebox.showerror("Database Error", f"Failed to add record: {e}")
             return False # Indicate failure
 
+        self.rows[row.invoice_no] = row
+        self.tree.insert('', 0, iid=str(row.invoice_no), values=row.display_values(), tags=("pending",))
+        self.apply_customer(c_id, (c_name_first, c_name_last, customer_mobile_number))
+        self.remember_undo(mutation_id, row.invoice_no)
+        self.edit_index("index", lambda index: index.add_invoice(invoice_no, c_id, c_name_first, c_name_last, customer_mobile_number), mutation_id)
+        self.track_due(row, mutation_id)
+        self.update_write_status()
+        return True # Indicate success
+
     # ========== Update Record in DB ==========
     def update_record_in_db(self, invoice_no, date_time, due_date_time, c_id, c_name_first, c_name_last, service_name, no_of_sessions, per_session, total, customer_mobile_number):
-        """Updates an existing invoice record in the database."""
+        """Queues an update of an existing invoice record and applies it to the view right away."""
         try:
-            con = self.connect_db()
-            cur = con.cursor()
-            sql = f"""
-            UPDATE {TABLE_NAME} SET
-                date_time = %s,
-                due_date_time = %s,
-                c_id = %s,
-                c_name_first = %s,
-                c_name_last = %s,
-                service_name = %s,
-                no_of_sessions = %s,
-                per_session = %s,
-                total = %s,
-                customer_mobile_number = %s
-            WHERE invoice_no = %s
-            """
-            cur.execute(sql, (
-                date_time, due_date_time, c_id, c_name_first, c_name_last,
-                service_name, no_of_sessions, per_session, total, customer_mobile_number,
-                invoice_no
-            ))
-            con.commit()
-            con.close()
-            messagebox.showinfo("Success", "Record updated successfully!")
-            self.fetch_data() # Refresh Treeview
+            row = InvoiceRow(
+                invoice_no, date_time, due_date_time, c_id, c_name_first, c_name_last,
+                service_name, no_of_sessions, per_session, total, customer_mobile_number
+            )
+            old_row = self.rows.get(row.invoice_no)
+            # The version on screen is the base: the update is rejected if another desk changed it since
+            mutation_id = self.writer.submit("update", self.row_to_dict(row), base=self.row_to_dict(old_row) if old_row else None)
         except Exception as e:
             messagebox.showerror("Database Error", f"Failed to update record: {e}")
+            return
+
+        self.remember_undo(mutation_id, row.invoice_no)
+        self.edit_index("index", lambda index: index.add_invoice(invoice_no, c_id, c_name_first, c_name_last, customer_mobile_number), mutation_id)
+        self.track_due(row, mutation_id, unpaid_only=True) # Paid invoices stay out of the due-date index
+        self.rows[row.invoice_no] = row
+        if self.tree.exists(str(row.invoice_no)):
+            self.tree.item(str(row.invoice_no), values=row.display_values(), tags=("pending",))
+        self.apply_customer(c_id, (c_name_first, c_name_last, customer_mobile_number))
+        self.update_preview()
+        self.update_write_status()
+        messagebox.showinfo("Saved", f"Invoice No. {row.invoice_no} saved locally, syncing...")
+
+    def apply_customer(self, c_id, customer):
+        """Writes a customer record through to the cache and to every loaded invoice of that customer."""
+        self.customers.put(c_id, customer)
+        for row in self.rows.values():
+            if row.c_id == c_id and row.invoice_no not in self.archived_invoice_nos:
+                row.set_customer(customer)
+                if self.tree.exists(str(row.invoice_no)):
+                    self.tree.item(str(row.invoice_no), values=row.display_values())
+
+    # ========== Background Write Results ==========
+    def row_to_dict(self, row):
+        """Converts an InvoiceRow to the JSON-safe dict the write journal stores."""
+        return {col: format_datetime(getattr(row, col)) for col in INVOICE_COLUMNS}
+
+    def update_replica_status(self):
+        """Shows how old the local replica's data is, in red once it is stale or the link is down."""
+        age = self.replica.staleness()
+        if age is None:
+            text = "Replica: copying from MySQL..." if self.replica.error is None else "Replica: offline, no local copy yet"
+        else:
+            text = f"Replica: synced {int(age)} s ago" if age < 120 else f"Replica: synced {int(age // 60)} min ago"
+            if self.replica.error is not None:
+                text += " (offline)"
+        stale = age is None or age > REPLICA_STALE_SECONDS or self.replica.error is not None
+        self.replica_status_label.config(text=text, fg="firebrick" if stale else "gray")
+        self.root.after(REPLICA_STATUS_MS, self.update_replica_status)
+
+    def update_write_status(self):
+        """Shows how many changes are still waiting for MySQL, after the last one it confirmed."""
+        pending = self.writer.pending_count()
+        status = f"Saving {pending} change(s)..." if pending else "All changes saved"
+        self.write_status_label.config(text=f"{self.last_saved}. {status}" if self.last_saved else status)
+
+    def remember_undo(self, mutation_id, invoice_no):
+        """Keeps what the customer and due-date indexes hold for invoice_no before a queued write edits them."""
+        c_id = self.customer_index.invoices.get(invoice_no)
+        self.undo[mutation_id] = (invoice_no, c_id, self.customer_index.customers.get(c_id),
+                                  self.due_scanner.invoices.get(invoice_no))
+
+    def undo_write(self, invoice_no, c_id, customer, due):
+        """Puts back the index entries remember_undo kept, taking a rejected write's edits out again."""
+        def restore_customer(index):
+            if c_id is None:
+                index.remove_invoice(invoice_no)
+            else:
+                index.add_invoice(invoice_no, c_id, *customer)
+
+        def restore_due(scanner):
+            if due is None:
+                scanner.remove(invoice_no)
+            else:
+                scanner.upsert(invoice_no, *due)
+
+        self.edit_index("index", restore_customer)
+        self.edit_index("due", restore_due)
+        self.update_due_status()
+
+    def poll_write_results(self):
+        """Applies results reported by the background writer (runs on the Tk thread)."""
+        refresh = False
+        for mutation, error in self.writer.poll_results():
+            invoice_no = int(mutation.row["invoice_no"])
+            undo = self.undo.pop(mutation.id, None) # None for writes replayed from the journal at startup
+            if error is None:
+                if mutation.op != "delete" and self.tree.exists(str(invoice_no)):
+                    self.tree.item(str(invoice_no), tags=())
+                done = {"insert": "added", "update": "updated", "delete": "deleted"}.get(mutation.op, "saved")
+                self.last_saved = f"Invoice No. {invoice_no} {done}"
+                continue
+
+            if undo is not None:
+                self.undo_write(*undo)
+            if mutation.op == "insert" and "Duplicate entry" in str(error) and "PRIMARY'" in str(error):
+                # Numbers of deleted and archived invoices stay claimed too
+                messagebox.showerror("Database Error", f"Invoice Number {invoice_no} already exists or was used before. Please choose a different one.")
+            else:
+                action = {"insert": "add", "update": "update", "delete": "delete"}.get(mutation.op, mutation.op)
+                messagebox.showerror("Database Error", f"Failed to {action} Invoice No. {invoice_no}: {error}")
+            refresh = True
+
+        if refresh:
+            # Throw away the optimistic rows by reloading what MySQL actually has
+            self.customers.invalidate()
+            self.fetch_data()
+        self.update_write_status()
+        self.root.after(WRITE_POLL_MS, self.poll_write_results)
 
     # ========== Calculate and Display Total Amount for a Customer ==========
     def update_customer_total_amount(self, c_id):
@@ -686,13 +1465,12 @@ class InvoiceApp:
         total_sum = 0.0
         if c_id is not None:
             try:
-                con = self.connect_db()
-                cur = con.cursor()
-                cur.execute(f"SELECT SUM(total) FROM {TABLE_NAME} WHERE c_id = %s", (c_id,))
-                result = cur.fetchone()
+                query = self.queries.select(TABLE_NAME, ["SUM(total)"], ("c_id = ?",))
+                result = self.reader.execute(query, (c_id,))[0]
                 if result and result[0] is not None:
                     total_sum = float(result[0])
-                con.close()
+                if self.include_archive.get() and self.archive is not None:
+                    total_sum += self.archive.sum_total(c_id)
             except Exception as e:
                 print(f"Error fetching total sum for customer ID {c_id}: {e}") # Print to console for debugging
                 total_sum = 0.0 # Reset on error
@@ -703,14 +1481,9 @@ class InvoiceApp:
     def on_tree_select(self, event=None):
         """Handles selection event in the Treeview to update preview and customer total."""
         self.update_preview() # Update the invoice details preview
-        selected_item = self.tree.focus()
-        if selected_item:
-            values = self.tree.item(selected_item)['values']
-            if len(values) > 3: # Ensure c_id column exists
-                customer_id = values[3] # c_id is the 4th element (index 3)
-                self.update_customer_total_amount(customer_id)
-            else:
-                self.update_customer_total_amount(None) # Clear total if no valid c_id
+        row = self.selected_row()
+        if row:
+            self.update_customer_total_amount(row.c_id)
         else:
             self.update_customer_total_amount(None) # Clear total if nothing selected
 
@@ -722,35 +1495,44 @@ class InvoiceApp:
 
     def remove_record(self):
         """Removes the selected invoice record from the database."""
-        selected = self.tree.focus()
-        if not selected:
+        row = self.selected_row()
+        if not row:
             messagebox.showwarning("Warning", "No record selected to remove.")
             return
 
-        values = self.tree.item(selected)['values']
-        invoice_no = values[0]
+        invoice_no = row.invoice_no
+        if invoice_no in self.archived_invoice_nos:
+            messagebox.showwarning("Warning", "Archived invoices are read-only.")
+            return
         
         if messagebox.askyesno("Confirm Deletion", f"Are you sure you want to delete Invoice No. {invoice_no}?"):
             try:
-                con = self.connect_db()
-                cur = con.cursor()
-                cur.execute(f"DELETE FROM {TABLE_NAME} WHERE invoice_no=%s", (invoice_no,))
-                con.commit()
-                con.close()
-                self.fetch_data()
-                messagebox.showinfo("Success", "Record deleted successfully!")
+                mutation_id = self.writer.submit("delete", self.row_to_dict(row), base=self.row_to_dict(row))
             except Exception as e:
                 messagebox.showerror("Database Error", f"Failed to delete record: {e}")
+                return
+            self.remember_undo(mutation_id, invoice_no)
+            self.edit_index("index", lambda index: index.remove_invoice(invoice_no), mutation_id)
+            self.edit_index("due", lambda scanner: scanner.remove(invoice_no), mutation_id)
+            self.update_due_status()
+            del self.rows[invoice_no]
+            self.tree.delete(str(invoice_no))
+            self.clear_preview()
+            self.update_customer_total_amount(None)
+            self.update_write_status()
+            messagebox.showinfo("Deleted", f"Invoice No. {invoice_no} deleted locally, syncing...")
 
     def update_record(self):
         """Opens the form to update the selected invoice record."""
-        selected = self.tree.focus()
-        if not selected:
+        row = self.selected_row()
+        if not row:
             messagebox.showwarning("Warning", "No record selected to update.")
             return
+        if row.invoice_no in self.archived_invoice_nos:
+            messagebox.showwarning("Warning", "Archived invoices are read-only.")
+            return
         
-        current_values = self.tree.item(selected)['values']
-        UpdateRecordForm(self.root, self, current_values)
+        UpdateRecordForm(self.root, self, row)
 
     def find_record(self):
         """Opens the form to find records by Customer ID or Invoice Number. (This was replaced by clear_filters button)"""
@@ -760,25 +1542,22 @@ class InvoiceApp:
         
     def update_preview(self):
         """Updates the text area with details of the currently selected invoice."""
-        selected_item = self.tree.focus()
-        if not selected_item:
+        row = self.selected_row()
+        if not row:
             self.clear_preview()
             return
         
-        values = self.tree.item(selected_item)['values']
-        # invoice_no, date_time, due_date_time, c_id, c_name_first, c_name_last,
-        # service_name, no_of_sessions, per_session, total, customer_mobile_number
         invoice_details = f"""
-Invoice No: {values[0]}
-Invoice Date: {values[1]}
-Due Date: {values[2]}
-Customer ID: {values[3]}
-Customer Name: {values[4]} {values[5] if values[5] else ''}
-Service: {values[6]}
-Sessions: {values[7]}
-Cost Per Session: ₹ {float(values[8]):.2f}
-Total Amount: ₹ {float(values[9]):.2f}
-Customer Mobile: {values[10] if values[10] else 'N/A'}
+Invoice No: {row.invoice_no}
+Invoice Date: {format_datetime(row.date_time)}
+Due Date: {format_datetime(row.due_date_time)}
+Customer ID: {row.c_id}
+Customer Name: {row.full_name}
+Service: {row.service_name}
+Sessions: {row.no_of_sessions}
+Cost Per Session: ₹ {row.per_session:.2f}
+Total Amount: ₹ {row.total:.2f}
+Customer Mobile: {row.customer_mobile_number or 'N/A'}
         """.strip()
         self.preview.config(state="normal")
         self.preview.delete(1.0, tk.END)
@@ -792,28 +1571,53 @@ Customer Mobile: {values[10] if values[10] else 'N/A'}
         self.preview.insert(tk.END, "Select an invoice from the table to see details here.")
         self.preview.config(state="disabled")
 
+    def print_customer_statement(self):
+        """Generates a multi-page statement of every invoice of the selected invoice's customer."""
+        row = self.selected_row()
+        if not row:
+            messagebox.showwarning("Print Error", "Select an invoice of the customer to print a statement for.")
+            return
+
+        file_path = filedialog.asksaveasfilename(
+            defaultextension=".pdf",
+            filetypes=[("PDF files", "*.pdf")],
+            initialfile=f"Statement_{row.c_id}_{row.c_name_first}.pdf"
+        )
+        if not file_path:
+            return # User cancelled
+
+        try:
+            from statements import write_statement # Pulls in ReportLab, so only on first use
+            con = self.connect_db()
+            try:
+                count, invoiced, outstanding = write_statement(con, row.c_id, file_path)
+            finally:
+                con.close()
+            messagebox.showinfo("PDF Generated", f"Statement of {count} invoice(s) saved to:\n{file_path}\n\n"
+                                                 f"Invoiced: ₹ {invoiced:,.2f}\nOutstanding: ₹ {outstanding:,.2f}")
+        except Exception as e:
+            messagebox.showerror("PDF Error", f"Failed to generate statement: {e}")
+
     def print_invoice_pdf(self):
         """Generates a PDF invoice for the selected record."""
-        selected_item = self.tree.focus()
-        if not selected_item:
+        row = self.selected_row()
+        if not row:
             messagebox.showwarning("Print Error", "No invoice selected to print.")
             return
 
-        values = self.tree.item(selected_item)['values']
-        
-        # Ensure values are converted to string safely and correctly formatted for PDF
+        # Format the typed row as strings for the PDF
         invoice_data = {
-            "invoice_no": str(values[0]),
-            "date_time": str(values[1]),
-            "due_date_time": str(values[2]),
-            "c_id": str(values[3]),
-            "c_name_first": str(values[4]),
-            "c_name_last": str(values[5]) if values[5] else '',
-            "service_name": str(values[6]),
-            "no_of_sessions": str(values[7]),
-            "per_session": f"₹{float(values[8]):,.2f}",
-            "total": f"₹{float(values[9]):,.2f}",
-            "customer_mobile_number": str(values[10]) if values[10] else 'N/A'
+            "invoice_no": str(row.invoice_no),
+            "date_time": format_datetime(row.date_time),
+            "due_date_time": format_datetime(row.due_date_time),
+            "c_id": str(row.c_id),
+            "c_name_first": row.c_name_first,
+            "c_name_last": row.c_name_last,
+            "service_name": row.service_name,
+            "no_of_sessions": str(row.no_of_sessions),
+            "per_session": f"₹{row.per_session:,.2f}",
+            "total": f"₹{row.total:,.2f}",
+            "customer_mobile_number": row.customer_mobile_number or 'N/A'
         }
 
         # Ask user where to save the PDF
@@ -826,6 +1630,14 @@ Customer Mobile: {values[10] if values[10] else 'N/A'}
             return # User cancelled
 
         try:
+            # Import ReportLab modules for PDF generation (first use only pays the import cost)
+            from reportlab.lib.pagesizes import A4
+            from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+            from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+            from reportlab.lib import colors
+            from reportlab.lib.units import inch
+            from reportlab.lib.enums import TA_CENTER # For centering text
+
             doc = SimpleDocTemplate(file_path, pagesize=A4)
             styles = getSampleStyleSheet()
 
@@ -908,6 +1720,9 @@ Customer Mobile: {values[10] if values[10] else 'N/A'}
 
 
 if __name__ == "__main__":
+    threshold_ms = watchdog_threshold(sys.argv[1:])
+    if threshold_ms is not None:
+        EventLoopWatchdog(threshold_ms).install() # python invoice8.py --watchdog[=MS]
     root = tk.Tk()
     app = InvoiceApp(root)
     root.mainloop()
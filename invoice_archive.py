@@ -0,0 +1,230 @@
+"""
+Time-partitioned invoice storage with a cold archive on local disk.
+
+  python invoice_archive.py partition <first_year> <last_year> [year|quarter]
+  python invoice_archive.py archive <YYYY-MM-DD>
+
+`partition` converts invoice3 to RANGE partitions on date_time. MySQL requires the
+partitioning column in every unique key, so the primary key becomes
+(invoice_no, date_time) and invoice numbers are kept unique by the BEFORE INSERT
+trigger that claims each number in the invoice_numbers table (see
+invoice8.ensure_invoice_numbers).
+
+`archive` moves every partition that ends on or before the given date into a
+gzip-compressed columnar file under archive/ and deletes the rows from MySQL.
+Archived invoice numbers stay claimed, so they are never handed out again.
+An interrupted run can simply be repeated: rows already in the file are
+replaced, not appended twice.
+"""
+import datetime
+import gzip
+import json
+import os
+import re
+import sys
+
+import pymysql
+
+from change_log import ensure_change_log, record_changes
+from customers import CUSTOMER_FIELDS, CUSTOMERS_TABLE
+from invoice8 import INVOICE_COLUMNS, TABLE_NAME, connect_db, ensure_invoice_numbers, format_datetime
+
+ARCHIVE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'archive')
+PARTITION_NAME = re.compile(r"^p(\d{4})(?:q([1-4]))?$")
+
+
+# ========== Partition Layout ==========
+def partition_bounds(first_year, last_year, granularity="quarter"):
+    """Returns [(name, exclusive_end_date)] for each period between first_year and last_year."""
+    bounds = []
+    for year in range(first_year, last_year + 1):
+        if granularity == "year":
+            bounds.append((f"p{year}", datetime.date(year + 1, 1, 1)))
+            continue
+        for quarter in range(1, 5):
+            end = datetime.date(year + 1, 1, 1) if quarter == 4 else datetime.date(year, quarter * 3 + 1, 1)
+            bounds.append((f"p{year}q{quarter}", end))
+    return bounds
+
+
+def partition_end(name):
+    """Exclusive end date of a period partition (p2024 or p2024q1), or None for p_old/p_future."""
+    match = PARTITION_NAME.match(name)
+    if not match:
+        return None
+    year, quarter = int(match.group(1)), match.group(2)
+    if quarter is None or quarter == "4":
+        return datetime.date(year + 1, 1, 1)
+    return datetime.date(year, int(quarter) * 3 + 1, 1)
+
+
+def partition_invoices(con, first_year, last_year, granularity="quarter"):
+    """One-off migration: range-partition invoice3 by date_time and keep invoice numbers unique."""
+    cur = con.cursor()
+    ensure_invoice_numbers(cur)
+    cur.execute(f"ALTER TABLE {TABLE_NAME} DROP PRIMARY KEY, ADD PRIMARY KEY (invoice_no, date_time)")
+
+    partitions = [f"PARTITION p_old VALUES LESS THAN (TO_DAYS('{first_year}-01-01'))"]
+    for name, end in partition_bounds(first_year, last_year, granularity):
+        partitions.append(f"PARTITION {name} VALUES LESS THAN (TO_DAYS('{end}'))")
+    partitions.append("PARTITION p_future VALUES LESS THAN MAXVALUE")
+    cur.execute(f"ALTER TABLE {TABLE_NAME} PARTITION BY RANGE (TO_DAYS(date_time)) ({', '.join(partitions)})")
+    con.commit()
+
+
+def closed_partitions(con, before):
+    """Names of period partitions that end on or before the given date and still hold rows."""
+    cur = con.cursor()
+    cur.execute(
+        "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL",
+        (TABLE_NAME,)
+    )
+    names = []
+    for (name,) in cur.fetchall():
+        end = partition_end(name)
+        if end is not None and end <= before:
+            cur.execute(f"SELECT 1 FROM {TABLE_NAME} PARTITION ({name}) LIMIT 1")
+            if cur.fetchone():
+                names.append(name)
+    return sorted(names)
+
+
+# ========== Archive Files ==========
+def archive_path(partition_name):
+    return os.path.join(ARCHIVE_DIR, f"{TABLE_NAME}_{partition_name}.json.gz")
+
+
+def read_archive_file(path):
+    """Returns {column: [values]} from a columnar archive file."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)["data"]
+
+
+def write_archive_file(path, data):
+    """Writes {column: [values]} atomically (temp file + rename)."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump({"columns": list(INVOICE_COLUMNS), "data": data}, f)
+    os.replace(tmp_path, path)
+
+
+def merge_archive_rows(data, rows):
+    """
+    Merges rows (tuples in INVOICE_COLUMNS order) into columnar archive data, keyed on invoice_no;
+    a row already in the file is replaced. Returns the merged {column: [values]} by invoice_no.
+    """
+    merged = {row[0]: row for row in zip(*(data[col] for col in INVOICE_COLUMNS))}
+    merged.update((row[0], row) for row in rows)
+    ordered = [merged[invoice_no] for invoice_no in sorted(merged)]
+    return {col: [row[i] for row in ordered] for i, col in enumerate(INVOICE_COLUMNS)}
+
+
+def archive_partition(con, name):
+    """Moves all rows of one closed partition into its archive file. Returns the number of rows moved."""
+    # Archive files are self-contained, so customer details are copied in as of archiving time
+    select = ", ".join(f"c.{col}" if col in CUSTOMER_FIELDS else f"i.{col}" for col in INVOICE_COLUMNS)
+    cur = con.cursor(pymysql.cursors.SSCursor)
+    cur.execute(
+        f"SELECT {select} FROM {TABLE_NAME} PARTITION ({name}) i "
+        f"LEFT JOIN {CUSTOMERS_TABLE} c ON c.c_id = i.c_id ORDER BY i.invoice_no"
+    )
+    rows = []
+    for row in cur:
+        rows.append(tuple(
+            float(value) if col in ("per_session", "total") else
+            format_datetime(value) if isinstance(value, datetime.datetime) else value
+            for col, value in zip(INVOICE_COLUMNS, row)
+        ))
+    cur.close()
+    if not rows:
+        return 0
+    moved = [row[0] for row in rows]
+
+    # The file is durable before any row leaves MySQL. After a crash in between, the rerun merges
+    # the same rows into the file again (no duplicates) and then finishes the delete.
+    path = archive_path(name)
+    data = read_archive_file(path) if os.path.exists(path) else {col: [] for col in INVOICE_COLUMNS}
+    write_archive_file(path, merge_archive_rows(data, rows))
+    cur = con.cursor()
+    ensure_change_log(cur)
+    con.commit()
+    for i in range(0, len(moved), 1000):
+        chunk = moved[i:i + 1000]
+        placeholders = ", ".join(["%s"] * len(chunk))
+        cur.execute(f"DELETE FROM {TABLE_NAME} PARTITION ({name}) WHERE invoice_no IN ({placeholders})", chunk)
+        record_changes(cur, [("archive", invoice_no, None) for invoice_no in chunk]) # Consumers drop them like deletes
+    con.commit()
+    return len(moved)
+
+
+# ========== Archive Reader ==========
+class InvoiceArchive:
+    """Read-only view over the archive files; columns are loaded on first use and cached."""
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self.files = {} # path -> (mtime, {column: [values]})
+
+    def columns(self):
+        """Yields the cached column dict of every archive file, reloading files that changed."""
+        if not os.path.isdir(self.directory):
+            return
+        for file_name in sorted(os.listdir(self.directory)):
+            if not file_name.endswith(".json.gz"):
+                continue
+            path = os.path.join(self.directory, file_name)
+            mtime = os.path.getmtime(path)
+            cached = self.files.get(path)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, read_archive_file(path))
+                self.files[path] = cached
+            yield cached[1]
+
+    def search(self, c_id=None, invoice_no=None, like_filters=None):
+        """
+        Returns archived rows (tuples in INVOICE_COLUMNS order, newest first) matching either an
+        exact c_id/invoice_no or case-insensitive substring filters, like fetch_data's LIKE '%x%'.
+        """
+        like_filters = {col: text.lower() for col, text in (like_filters or {}).items() if text}
+        rows = []
+        for data in self.columns():
+            if invoice_no is not None:
+                matches = [i for i, v in enumerate(data["invoice_no"]) if v == invoice_no]
+            elif c_id is not None:
+                matches = [i for i, v in enumerate(data["c_id"]) if v == c_id]
+            else:
+                matches = range(len(data["invoice_no"]))
+                for col, text in like_filters.items():
+                    values = data[col]
+                    matches = [i for i in matches if values[i] is not None and text in str(values[i]).lower()]
+            rows.extend(tuple(data[col][i] for col in INVOICE_COLUMNS) for i in matches)
+        rows.sort(key=lambda r: r[0], reverse=True)
+        return rows
+
+    def sum_total(self, c_id):
+        """SUM(total) over archived invoices of one customer."""
+        total = 0.0
+        for data in self.columns():
+            totals = data["total"]
+            total += sum(totals[i] for i, v in enumerate(data["c_id"]) if v == c_id)
+        return total
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if len(args) >= 3 and args[0] == "partition":
+        con = connect_db()
+        partition_invoices(con, int(args[1]), int(args[2]), args[3] if len(args) > 3 else "quarter")
+        con.close()
+        print(f"{TABLE_NAME} is now partitioned by date_time.")
+    elif len(args) == 2 and args[0] == "archive":
+        before = datetime.datetime.strptime(args[1], "%Y-%m-%d").date()
+        con = connect_db()
+        for name in closed_partitions(con, before):
+            print(f"Archived {archive_partition(con, name)} invoice(s) from {name} to {archive_path(name)}")
+        con.close()
+    else:
+        print(__doc__)
+        sys.exit(1)
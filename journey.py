@@ -0,0 +1,195 @@
+import heapq
+import re
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import datetime
+
+from clinic_calendar import BILLED_TABLE, booking_key, ensure_billed_table, slot_of
+from change_log import ensure_change_log, latest_seq
+from customers import CUSTOMERS_TABLE
+from invoice8 import PAYMENTS_TABLE, TABLE_NAME, ensure_payments_table, format_datetime
+
+PHONE_DIGITS = 10 # Numbers match on their last 10 digits, so "+91 98480 12345" and "9848012345" are one patient
+
+
+def normalize_phone(phone):
+    digits = re.sub(r"\D", "", str(phone or ""))
+    return digits[-PHONE_DIGITS:] or None
+
+
+def load_journey_data(con):
+    """
+    Reads everything the index needs from MySQL (runs on a loader thread). Returns
+    (feed_seq, customers, invoices, billed); changes after feed_seq come from the change feed.
+    """
+    cur = con.cursor()
+    ensure_change_log(cur)
+    ensure_payments_table(cur)
+    ensure_billed_table(cur)
+    con.commit()
+    feed_seq = latest_seq(cur)
+    cur.execute(f"SELECT c_id, customer_mobile_number FROM {CUSTOMERS_TABLE}")
+    customers = cur.fetchall()
+    cur.execute(f"""
+    SELECT i.invoice_no, i.c_id, i.date_time, i.service_name, i.no_of_sessions, i.total, p.invoice_no IS NOT NULL
+    FROM {TABLE_NAME} i LEFT JOIN {PAYMENTS_TABLE} p ON p.invoice_no = i.invoice_no
+    """)
+    invoices = cur.fetchall()
+    cur.execute(f"SELECT booking_key, invoice_no FROM {BILLED_TABLE}")
+    billed = cur.fetchall()
+    return feed_seq, customers, invoices, billed
+
+
+class JourneyIndex:
+    """
+    Links scheduler bookings (keyed by phone) and invoices (keyed by c_id) into one timeline per patient.
+
+    An identity map ties normalized phone numbers to c_ids. Bookings stay in the scheduler's
+    BookingStore, which already keeps each phone's slot keys sorted; invoices are kept sorted
+    per c_id here. A patient's timeline is a merge of their few sorted lists, and every change
+    (a booking, an invoice from the change feed) only touches the lists of its own patient.
+    """
+
+    def __init__(self, bookings):
+        self.bookings = bookings
+        self.c_ids_by_phone = defaultdict(set)
+        self.phone_by_c_id = {}
+        self.raw_phones = defaultdict(set) # normalized phone -> numbers as typed into bookings
+        self.invoices = {} # invoice_no -> {'c_id', 'date_time', 'service_name', 'no_of_sessions', 'total', 'paid'}
+        self.invoices_by_c_id = defaultdict(list) # c_id -> sorted [(date_time, invoice_no)]
+        self.billed = {} # billing.booking_key -> invoice_no
+        self.loaded = False # Invoices are in (bookings are there from the start)
+        self.version = 0 # bumped on every change, so open views know when to redraw
+        for info in bookings.values():
+            self.add_raw_phone(info)
+        bookings.listeners.append(self.booking_changed)
+
+    # ========== Identity Map ==========
+    def set_phone(self, c_id, phone):
+        phone = normalize_phone(phone)
+        old = self.phone_by_c_id.get(c_id)
+        if old == phone:
+            return
+        if old is not None:
+            self.c_ids_by_phone[old].discard(c_id)
+        if phone is None:
+            del self.phone_by_c_id[c_id]
+        else:
+            self.phone_by_c_id[c_id] = phone
+            self.c_ids_by_phone[phone].add(c_id)
+        self.version += 1
+
+    def resolve(self, query):
+        """(phone, c_ids) of the patient behind a mobile number or customer ID typed by the user."""
+        text = str(query).strip()
+        if text.isdigit() and len(text) < PHONE_DIGITS:
+            c_id = int(text)
+            phone = self.phone_by_c_id.get(c_id)
+            return phone, {c_id} | self.c_ids_by_phone.get(phone, set())
+        phone = normalize_phone(text)
+        return phone, set(self.c_ids_by_phone.get(phone, ()))
+
+    # ========== Updates ==========
+    def booking_changed(self, slot_key):
+        """
+        BookingStore listener. A batch of bookings notifies once per day, so the whole day of
+        slot_key is looked at; the store itself keeps the per-phone slot lists.
+        """
+        day = slot_key[:10]
+        keys, lo, hi = self.bookings.key_range(self.bookings.sorted_keys, day, day)
+        for key in keys[lo:hi]:
+            self.add_raw_phone(self.bookings[key])
+        self.version += 1
+
+    def add_raw_phone(self, info):
+        phone = normalize_phone(info['phone'])
+        if phone:
+            self.raw_phones[phone].add(info['phone'])
+
+    def load(self, customers, invoices, billed):
+        for c_id, phone in customers:
+            self.set_phone(c_id, phone)
+        for invoice_no, c_id, date_time, service_name, no_of_sessions, total, paid in invoices:
+            self.put_invoice(invoice_no, c_id, date_time, service_name, no_of_sessions, total, bool(paid))
+        self.billed.update(billed)
+        self.loaded = True
+        self.version += 1
+
+    def put_invoice(self, invoice_no, c_id, date_time, service_name, no_of_sessions, total, paid=None):
+        """Adds or replaces an invoice; paid=None keeps the known payment state."""
+        old = self.remove_invoice(invoice_no)
+        if paid is None:
+            paid = old['paid'] if old else False
+        when = format_datetime(date_time)
+        self.invoices[invoice_no] = {'c_id': c_id, 'date_time': when, 'service_name': service_name,
+                                     'no_of_sessions': no_of_sessions, 'total': float(total or 0), 'paid': paid}
+        insort(self.invoices_by_c_id[c_id], (when, invoice_no))
+        self.version += 1
+
+    def remove_invoice(self, invoice_no):
+        old = self.invoices.pop(invoice_no, None)
+        if old is not None:
+            entries = self.invoices_by_c_id[old['c_id']]
+            i = bisect_left(entries, (old['date_time'], invoice_no))
+            if i < len(entries) and entries[i][1] == invoice_no:
+                del entries[i]
+            self.version += 1
+        return old
+
+    def apply_change(self, op, invoice_no, data):
+        """Applies one change-log entry (see change_log.record_changes)."""
+        if op in ("insert", "update"):
+            if 'customer_mobile_number' in data: # Rows logged without customer details keep the known number
+                self.set_phone(data['c_id'], data['customer_mobile_number'])
+            self.put_invoice(invoice_no, data['c_id'], data['date_time'], data['service_name'],
+                             data['no_of_sessions'], data['total'], False if op == "insert" else None)
+        elif op in ("delete", "archive"):
+            self.remove_invoice(invoice_no) # Archived invoices are not loaded on the next start either
+        elif op == "paid" and invoice_no in self.invoices:
+            self.invoices[invoice_no]['paid'] = True
+            self.version += 1
+        elif op == "billed":
+            for key in data['booking_keys']:
+                self.billed[key] = invoice_no
+            self.version += 1
+
+    # ========== Queries ==========
+    def timeline(self, query, now=None):
+        """
+        [(when, kind, details)] for one patient, oldest first. kind is 'booking' (details: session key,
+        therapy, status booked/attended/no-show, billed invoice_no or None) or 'invoice' (details:
+        invoice_no plus the invoice fields).
+        """
+        phone, c_ids = self.resolve(query)
+        now_key = (now or datetime.now()).strftime("%Y-%m-%d_%H:%M")
+        sources = [((slot_of(key).replace("_", " "), "booking", key) for key in self.bookings.by_phone.get(raw, ()))
+                   for raw in self.raw_phones.get(phone, ())]
+        sources.extend(((when, "invoice", invoice_no) for when, invoice_no in self.invoices_by_c_id.get(c_id, ()))
+                       for c_id in c_ids)
+        entries = []
+        for when, kind, ref in heapq.merge(*sources):
+            if kind == "booking":
+                info = self.bookings[ref]
+                if ref >= now_key:
+                    status = "booked"
+                else:
+                    status = "no-show" if info.get('no_show') else "attended"
+                entries.append((when, kind, {'key': ref, 'therapy': info['therapy'], 'status': status,
+                                             'invoice_no': self.billed.get(booking_key(slot_of(ref), info))}))
+            else:
+                entries.append((when, kind, dict(self.invoices[ref], invoice_no=ref)))
+        return entries
+
+    def summary(self, entries):
+        """Session and money totals of a timeline."""
+        totals = {'booked': 0, 'attended': 0, 'no-show': 0, 'billed': 0, 'invoiced': 0.0, 'outstanding': 0.0}
+        for _, kind, details in entries:
+            if kind == "booking":
+                totals[details['status']] += 1
+                if details['invoice_no'] is not None:
+                    totals['billed'] += 1
+            else:
+                totals['invoiced'] += details['total']
+                if not details['paid']:
+                    totals['outstanding'] += details['total']
+        return totals
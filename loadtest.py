@@ -0,0 +1,389 @@
+"""
+Multi-desk load test for the invoice desk and the scheduler.
+
+  python loadtest.py [--desks 1,2,4,8,16] [--seconds 30] [--database sree3_loadtest]
+                     [--invoices 20000] [--customers 2000] [--csv loadtest.csv]
+
+Each simulated desk is a thread running the same queries and writes as InvoiceApp
+(filter typing, add/update/delete through its own InvoiceWriter, row select -> customer
+total) and SchedulerApp (book and cancel), with think times drawn from OPERATION_MIX.
+The run is headless and goes against a scratch database on the local MySQL server,
+which is dropped and re-seeded before every concurrency level.
+
+For every level it prints throughput, p50/p99 latency per operation, InnoDB row lock
+waits, duplicate-key conflicts (two desks picking the same next invoice number) and
+deadlocks / lock wait timeouts.
+"""
+import contextlib
+import csv
+import datetime
+import functools
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import pymysql
+
+from change_log import ensure_change_log
+from customers import CUSTOMER_FIELDS, CUSTOMERS_TABLE, CustomerCache, migrate_customers
+from invoice8 import (DB_HOST, DB_NAME, DB_PASSWORD, DB_USER, DEFAULT_SORT, INVOICE_TABLE_COLUMNS, NUMBERS_TABLE,
+                      SERVICE_PRICES, TABLE_NAME, ensure_invoice_numbers, ensure_sort_indexes, fetch_invoice_page)
+from query_cache import QueryBuilder, StatementPool, connect_prepared
+from resources import ResourceEngine
+from clinic_calendar import CALENDAR, session_key
+from sch10 import BookingStore
+from write_queue import InvoiceWriter
+
+# Relative frequency of each desk operation
+OPERATION_MIX = {
+    "filter": 40,
+    "select": 25,
+    "add": 10,
+    "update": 8,
+    "delete": 2,
+    "book": 10,
+    "cancel": 5,
+}
+THINK_TIME = (0.0, 0.05) # Seconds a desk pauses between operations (uniform)
+WRITE_TIMEOUT = 30.0 # Seconds a desk waits for its queued write to commit
+BOOKING_DAYS = 14 # Bookings are spread over this many days from today
+SEED_BATCH = 1000
+DUPLICATE_KEY = 1062
+LOCK_WAIT_TIMEOUT = 1205
+DEADLOCK = 1213
+FIRST_NAMES = ["Anil", "Bhavya", "Chandra", "Divya", "Gopal", "Hema", "Kiran", "Lakshmi", "Madhu", "Ravi"]
+LAST_NAMES = ["Rao", "Reddy", "Naidu", "Varma", "Sastry", "Murthy"]
+
+
+# ========== Scratch Database ==========
+def scratch_connect(database):
+    return functools.partial(pymysql.connect, host=DB_HOST, user=DB_USER, password=DB_PASSWORD, database=database)
+
+
+def reset_database(database, invoices, customers):
+    """Drops and re-creates the scratch database with seeded customers and invoices."""
+    if database == DB_NAME:
+        raise ValueError(f"Refusing to load-test the live database {DB_NAME!r}; pick a scratch database")
+    con = pymysql.connect(host=DB_HOST, user=DB_USER, password=DB_PASSWORD)
+    cur = con.cursor()
+    cur.execute(f"DROP DATABASE IF EXISTS {database}")
+    cur.execute(f"CREATE DATABASE {database}")
+    con.close()
+
+    con = scratch_connect(database)()
+    cur = con.cursor()
+    cur.execute(f"""
+    CREATE TABLE {TABLE_NAME} (
+        invoice_no INT PRIMARY KEY,
+        date_time DATETIME NOT NULL,
+        due_date_time DATETIME,
+        c_id INT NOT NULL,
+        service_name VARCHAR(100),
+        no_of_sessions INT,
+        per_session DECIMAL(10, 2),
+        total DECIMAL(12, 2),
+        KEY idx_invoice_c_id (c_id)
+    )
+    """)
+    ensure_sort_indexes(cur)
+    migrate_customers(con, TABLE_NAME) # Creates the customers table; nothing to move yet
+    ensure_change_log(cur)
+    ensure_invoice_numbers(cur)
+    rng = random.Random(0)
+    cur.executemany(
+        f"INSERT INTO {CUSTOMERS_TABLE} (c_id, {', '.join(CUSTOMER_FIELDS)}) VALUES (%s, %s, %s, %s)",
+        [(c_id, *customer_record(c_id)) for c_id in range(1, customers + 1)]
+    )
+    now = datetime.datetime.now()
+    placeholders = ", ".join(["%s"] * len(INVOICE_TABLE_COLUMNS))
+    for start in range(1, invoices + 1, SEED_BATCH):
+        rows = []
+        for invoice_no in range(start, min(start + SEED_BATCH, invoices + 1)):
+            row = invoice_row(rng, invoice_no, rng.randint(1, customers), now - datetime.timedelta(days=rng.randint(0, 365)))
+            rows.append([row[c] for c in INVOICE_TABLE_COLUMNS])
+        cur.executemany(f"INSERT INTO {TABLE_NAME} ({', '.join(INVOICE_TABLE_COLUMNS)}) VALUES ({placeholders})", rows)
+    con.commit()
+    con.close()
+
+
+def customer_record(c_id):
+    """(c_name_first, c_name_last, customer_mobile_number); always the same for a c_id."""
+    rng = random.Random(c_id)
+    return rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES), f"9{rng.randint(0, 999999999):09d}"
+
+
+def invoice_row(rng, invoice_no, c_id, when):
+    """A full invoice row dict (invoice and customer columns), as InvoiceApp submits it."""
+    service = rng.choice(list(SERVICE_PRICES))
+    sessions = rng.randint(1, 10)
+    first, last, mobile = customer_record(c_id)
+    return {
+        "invoice_no": invoice_no,
+        "date_time": when.strftime('%Y-%m-%d %H:%M:%S'),
+        "due_date_time": (when + datetime.timedelta(days=7)).strftime('%Y-%m-%d %H:%M:%S'),
+        "c_id": c_id,
+        "c_name_first": first,
+        "c_name_last": last,
+        "service_name": service,
+        "no_of_sessions": sessions,
+        "per_session": SERVICE_PRICES[service],
+        "total": SERVICE_PRICES[service] * sessions,
+        "customer_mobile_number": mobile,
+    }
+
+
+def lock_status(connect):
+    """(Innodb_row_lock_waits, Innodb_row_lock_time in ms); server-wide counters."""
+    con = connect()
+    cur = con.cursor()
+    cur.execute("SHOW GLOBAL STATUS WHERE Variable_name IN ('Innodb_row_lock_waits', 'Innodb_row_lock_time')")
+    status = {name: int(value) for name, value in cur.fetchall()}
+    con.close()
+    return status.get("Innodb_row_lock_waits", 0), status.get("Innodb_row_lock_time", 0)
+
+
+# ========== Shared Scheduler ==========
+class SharedSchedule:
+    """One BookingStore and ResourceEngine shared by all desks behind a lock; records time spent waiting for it."""
+
+    def __init__(self):
+        self.bookings = BookingStore()
+        self.resources = ResourceEngine(CALENDAR.resources, CALENDAR.slot_starts)
+        self.bookings.listeners.append(
+            lambda slot_key: self.resources.rebuild_day(self.bookings, datetime.date.fromisoformat(slot_key[:10])))
+        self.lock = threading.Lock()
+        self.days = [datetime.date.today() + datetime.timedelta(days=i) for i in range(BOOKING_DAYS)]
+        self.days = [day for day in self.days if CALENDAR.slot_starts(day)]
+
+    @contextlib.contextmanager
+    def locked(self, stats):
+        start = time.perf_counter()
+        with self.lock:
+            stats.lock_wait += time.perf_counter() - start
+            yield
+
+    def book(self, rng, stats):
+        day = rng.choice(self.days)
+        slot_key = f"{day}_{rng.choice(CALENDAR.slot_starts(day))}"
+        therapy = rng.choice(list(SERVICE_PRICES))
+        with self.locked(stats):
+            if session_key(slot_key, therapy) in self.bookings or not self.resources.available(therapy, slot_key):
+                stats.conflicts["booking"] += 1
+                return
+            self.bookings[session_key(slot_key, therapy)] = {'phone': f"9{rng.randint(0, 999999999):09d}",
+                                                             'therapy': therapy}
+
+    def cancel(self, rng, stats):
+        with self.locked(stats):
+            if self.bookings:
+                self.bookings.cancel(rng.choice(self.bookings.sorted_keys))
+
+
+# ========== Desks ==========
+class DeskStats:
+    def __init__(self):
+        self.latencies = defaultdict(list) # operation -> seconds
+        self.conflicts = defaultdict(int) # "duplicate_key", "deadlock", "lock_timeout", "booking"
+        self.errors = defaultdict(int) # operation -> failures other than the conflicts above
+        self.lock_wait = 0.0 # Seconds spent waiting for the shared schedule
+
+
+class Desk:
+    """One front desk: the invoice app's connections, caches and write queue, plus scheduler actions."""
+
+    def __init__(self, desk_id, connect, schedule, customers, invoices, journal_dir):
+        self.rng = random.Random(desk_id)
+        self.schedule = schedule
+        self.customer_count = customers
+        self.invoice_count = invoices # Seeded invoice numbers; updates and deletes pick among these
+        self.queries = QueryBuilder()
+        self.statements = StatementPool(functools.partial(connect_prepared, connect, **connect.keywords)) # As the app reads
+        self.customers = CustomerCache(connect)
+        self.writer = InvoiceWriter(connect, TABLE_NAME, INVOICE_TABLE_COLUMNS,
+                                    os.path.join(journal_dir, f"desk_{desk_id}.jsonl"),
+                                    upsert_customers=True, log_changes=True)
+        self.stats = DeskStats()
+        self.operations = list(OPERATION_MIX)
+        self.weights = list(OPERATION_MIX.values())
+
+    def close(self):
+        """Drains and stops the writer and closes the pooled connections, so the next level starts clean."""
+        self.writer.close(WRITE_TIMEOUT)
+        self.statements.close()
+
+    def run(self, stop):
+        while not stop.is_set():
+            operation = self.rng.choices(self.operations, self.weights)[0]
+            start = time.perf_counter()
+            try:
+                getattr(self, operation)()
+            except Exception as e:
+                self.record_error(operation, e)
+                continue
+            self.stats.latencies[operation].append(time.perf_counter() - start)
+            time.sleep(self.rng.uniform(*THINK_TIME))
+
+    def record_error(self, operation, error):
+        code = error.args[0] if isinstance(error, pymysql.err.MySQLError) and error.args else None
+        if code == DUPLICATE_KEY:
+            self.stats.conflicts["duplicate_key"] += 1
+        elif code == DEADLOCK:
+            self.stats.conflicts["deadlock"] += 1
+        elif code == LOCK_WAIT_TIMEOUT:
+            self.stats.conflicts["lock_timeout"] += 1
+        else:
+            self.stats.errors[operation] += 1
+
+    # ---------- InvoiceApp operations ----------
+    def filter(self):
+        """A settled filter keystroke on a customer name: the first page fetch_data reads, then its customers."""
+        text = self.rng.choice(FIRST_NAMES)[:self.rng.randint(1, 3)]
+        rows = fetch_invoice_page(self.statements, self.queries, DEFAULT_SORT, (None, None, {"c_name_first": text}))
+        self.customers.get_many([row[INVOICE_TABLE_COLUMNS.index("c_id")] for row in rows])
+
+    def select(self):
+        """Row select: the customer's total, as update_customer_total_amount does."""
+        query = self.queries.select(TABLE_NAME, ["SUM(total)"], ("c_id = ?",))
+        self.statements.execute(query, (self.rng.randint(1, self.customer_count),))
+
+    def latest_invoice_no(self):
+        result = self.statements.execute(self.queries.select(NUMBERS_TABLE, ["MAX(invoice_no)"]))[0]
+        return max(int(result[0] or 0), self.writer.max_pending_invoice_no())
+
+    def write(self, op, row):
+        """Submits through the desk's InvoiceWriter and waits until it is committed or rejected."""
+        self.writer.submit(op, row)
+        _, error = self.writer.results.get(timeout=WRITE_TIMEOUT)
+        if error is not None:
+            raise error
+
+    def add(self):
+        invoice_no = self.latest_invoice_no() + 1 # Same numbering as InvoiceApp.add_record
+        self.write("insert", invoice_row(self.rng, invoice_no, self.rng.randint(1, self.customer_count),
+                                         datetime.datetime.now()))
+
+    def update(self):
+        invoice_no = self.rng.randint(1, self.invoice_count)
+        self.write("update", invoice_row(self.rng, invoice_no, self.rng.randint(1, self.customer_count),
+                                         datetime.datetime.now()))
+
+    def delete(self):
+        self.write("delete", {"invoice_no": self.rng.randint(1, self.invoice_count)})
+
+    # ---------- SchedulerApp operations ----------
+    def book(self):
+        self.schedule.book(self.rng, self.stats)
+
+    def cancel(self):
+        self.schedule.cancel(self.rng, self.stats)
+
+
+# ========== Runs ==========
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[pct - 1]
+
+
+def run_level(desk_count, seconds, connect, customers, invoices):
+    """Runs desk_count desks for `seconds`; returns a result dict."""
+    journal_dir = tempfile.mkdtemp(prefix="loadtest_")
+    schedule = SharedSchedule()
+    desks = [Desk(i, connect, schedule, customers, invoices, journal_dir) for i in range(desk_count)]
+    waits_before, lock_ms_before = lock_status(connect)
+    stop = threading.Event()
+    threads = [threading.Thread(target=desk.run, args=(stop,), daemon=True) for desk in desks]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join(WRITE_TIMEOUT)
+    elapsed = time.perf_counter() - start
+    waits_after, lock_ms_after = lock_status(connect)
+    for desk in desks:
+        desk.close() # Otherwise connections and writer threads pile up into the next level
+    shutil.rmtree(journal_dir, ignore_errors=True)
+
+    latencies = defaultdict(list)
+    conflicts = defaultdict(int)
+    errors = 0
+    booking_wait = 0.0
+    for desk in desks:
+        for operation, values in desk.stats.latencies.items():
+            latencies[operation].extend(values)
+        for kind, n in desk.stats.conflicts.items():
+            conflicts[kind] += n
+        errors += sum(desk.stats.errors.values())
+        booking_wait += desk.stats.lock_wait
+    every = [v for values in latencies.values() for v in values]
+    return {
+        "desks": desk_count,
+        "ops": len(every),
+        "ops_per_s": len(every) / elapsed,
+        "p50_ms": percentile(every, 50) * 1000,
+        "p99_ms": percentile(every, 99) * 1000,
+        "row_lock_waits": waits_after - waits_before,
+        "row_lock_ms": lock_ms_after - lock_ms_before,
+        "duplicate_keys": conflicts["duplicate_key"],
+        "deadlocks": conflicts["deadlock"],
+        "lock_timeouts": conflicts["lock_timeout"],
+        "booking_conflicts": conflicts["booking"],
+        "booking_lock_wait_ms": booking_wait * 1000,
+        "errors": errors,
+        "by_operation": {op: (len(v), percentile(v, 50) * 1000, percentile(v, 99) * 1000)
+                         for op, v in sorted(latencies.items())},
+    }
+
+
+def print_result(result):
+    print(f"{result['desks']:>5} {result['ops']:>8} {result['ops_per_s']:>8.1f} {result['p50_ms']:>8.1f} "
+          f"{result['p99_ms']:>8.1f} {result['row_lock_waits']:>6} {result['row_lock_ms']:>8} "
+          f"{result['duplicate_keys']:>5} {result['deadlocks']:>5} {result['lock_timeouts']:>5} "
+          f"{result['booking_conflicts']:>6} {result['errors']:>5}")
+    for operation, (count, p50, p99) in result["by_operation"].items():
+        print(f"      {operation:<8} {count:>7} ops   p50 {p50:8.1f} ms   p99 {p99:8.1f} ms")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--help" in args or "-h" in args:
+        print(__doc__)
+        sys.exit(0)
+    levels = [int(n) for n in (args[args.index("--desks") + 1] if "--desks" in args else "1,2,4,8,16").split(",")]
+    seconds = float(args[args.index("--seconds") + 1]) if "--seconds" in args else 30.0
+    database = args[args.index("--database") + 1] if "--database" in args else "sree3_loadtest"
+    invoices = int(args[args.index("--invoices") + 1]) if "--invoices" in args else 20000
+    customers = int(args[args.index("--customers") + 1]) if "--customers" in args else 2000
+    history = args[args.index("--csv") + 1] if "--csv" in args else None
+
+    connect = scratch_connect(database)
+    print(f"{'desks':>5} {'ops':>8} {'ops/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'waits':>6} {'lock ms':>8} "
+          f"{'dupes':>5} {'dlock':>5} {'tmout':>5} {'bconf':>6} {'errs':>5}")
+    results = []
+    for desk_count in levels:
+        reset_database(database, invoices, customers) # Every level starts from the same data
+        result = run_level(desk_count, seconds, connect, customers, invoices)
+        print_result(result)
+        results.append(result)
+
+    if history:
+        new_file = not os.path.exists(history)
+        fields = [k for k in results[0] if k != "by_operation"] if results else []
+        with open(history, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(["timestamp"] + fields)
+            timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+            for result in results:
+                writer.writerow([timestamp] + [f"{result[k]:.1f}" if isinstance(result[k], float) else result[k]
+                                               for k in fields])
@@ -0,0 +1,97 @@
+import cProfile
+import functools
+import gc
+import json
+import time
+from collections import defaultdict
+
+try:
+    import resource # Not available on Windows
+except ImportError:
+    resource = None
+
+
+class PerfStats:
+    """Callback timers, per-callback counters and a cProfile toggle for a Tk app."""
+
+    def __init__(self):
+        self.timings = defaultdict(lambda: {"calls": 0, "total": 0.0, "max": 0.0})
+        self.counters = defaultdict(lambda: defaultdict(int)) # callback -> counter -> value
+        self.stack = [] # callbacks currently running (callbacks can nest through dialogs)
+        self.profiler = None
+
+    def timed(self, name):
+        """Context manager timing one callback run and attributing counters to it."""
+        stats = self
+
+        class Timer:
+            def __enter__(self):
+                stats.stack.append(name)
+                self.start = time.perf_counter()
+
+            def __exit__(self, *exc):
+                elapsed = time.perf_counter() - self.start
+                stats.stack.pop()
+                entry = stats.timings[name]
+                entry["calls"] += 1
+                entry["total"] += elapsed
+                entry["max"] = max(entry["max"], elapsed)
+                return False
+
+        return Timer()
+
+    def count(self, counter, n=1):
+        """Adds n to a counter of the innermost running callback."""
+        self.counters[self.stack[-1] if self.stack else "idle"][counter] += n
+
+    # ========== cProfile ==========
+    def profiling(self):
+        return self.profiler is not None
+
+    def start_profile(self):
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    def stop_profile(self, path):
+        """Stops profiling and writes a .prof file (open with pstats or snakeviz)."""
+        self.profiler.disable()
+        self.profiler.dump_stats(path)
+        self.profiler = None
+
+    # ========== Snapshots ==========
+    def snapshot(self, root=None):
+        """Returns timings, counters and live widget/memory counts as a plain dict."""
+        data = {
+            "timings": {
+                name: {"calls": t["calls"], "total_ms": t["total"] * 1000, "max_ms": t["max"] * 1000,
+                       "avg_ms": t["total"] * 1000 / t["calls"] if t["calls"] else 0.0}
+                for name, t in self.timings.items()
+            },
+            "counters": {name: dict(c) for name, c in self.counters.items()},
+            "gc_objects": len(gc.get_objects()),
+        }
+        if resource is not None:
+            data["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if root is not None:
+            data["widgets"] = count_widgets(root)
+        return data
+
+    def dump(self, path, root=None):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(root), f, indent=2)
+
+
+def count_widgets(widget):
+    """Number of widgets in the tree under (and including) widget."""
+    return 1 + sum(count_widgets(child) for child in widget.winfo_children())
+
+
+def instrumented(name):
+    """Method decorator timing a Tk callback with the instance's `stats` (a PerfStats)."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.stats.timed(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
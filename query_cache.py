@@ -0,0 +1,174 @@
+import contextlib
+import queue
+
+import pymysql
+
+try:
+    import mysql.connector # Optional: server-side prepared statements over the binary protocol
+except ImportError:
+    mysql = None
+
+POOL_SIZE = 2 # Connections kept open for interactive queries
+# Errors that mean the connection is gone and should be replaced
+CONNECTION_ERRORS = (pymysql.err.OperationalError, pymysql.err.InterfaceError)
+if mysql is not None:
+    CONNECTION_ERRORS += (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError)
+
+
+def connect_prepared(fallback, **params):
+    """
+    Opens a mysql-connector connection (autocommit) when it is installed, so the pool can prepare
+    statements on the server; otherwise returns fallback(), a pymysql connection.
+    """
+    if mysql is None:
+        return fallback()
+    return mysql.connector.connect(autocommit=True, **params)
+
+
+class CompiledQuery:
+    """
+    A compiled SELECT: sql uses ? placeholders (what MySQL prepares, also valid SQLite), mysql_sql
+    the %s form pymysql expects.
+    """
+    __slots__ = ("sql", "mysql_sql", "param_count")
+
+    def __init__(self, sql):
+        self.sql = sql
+        self.mysql_sql = sql.replace("%", "%%").replace("?", "%s")
+        self.param_count = sql.count("?")
+
+
+class QueryBuilder:
+    """Compiles each (table, columns, conditions, order) combination to SQL once and hands out the cached result."""
+
+    def __init__(self):
+        self.compiled = {}
+
+    def select(self, table, columns, where=(), order_by=None, limit=None):
+        """where is a tuple of SQL fragments using ? placeholders, joined with AND."""
+        key = (table, tuple(columns), tuple(where), order_by, limit)
+        query = self.compiled.get(key)
+        if query is None:
+            sql = f"SELECT {', '.join(columns)} FROM {table}"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            if order_by:
+                sql += f" ORDER BY {order_by}"
+            if limit is not None:
+                sql += f" LIMIT {int(limit)}"
+            query = CompiledQuery(sql)
+            self.compiled[key] = query
+        return query
+
+
+class PooledConnection:
+    """
+    A pooled connection in autocommit mode. On mysql-connector, statements holds one prepared
+    cursor per CompiledQuery run on it; on pymysql it is None.
+    """
+    __slots__ = ("con", "statements")
+
+    def __init__(self, con):
+        self.con = con
+        self.statements = {} if hasattr(con, "cmd_stmt_prepare") else None
+        if self.statements is None:
+            con.autocommit(True) # Each read sees the latest commits instead of one long-lived snapshot
+
+    def close(self):
+        try:
+            self.con.close()
+        except Exception:
+            pass
+
+
+class StatementPool:
+    """
+    Small pool of long-lived connections that runs CompiledQuery objects. Keeping the
+    connections open saves the connect and login round trips a fresh connection per search
+    would cost.
+
+    On mysql-connector connections (see connect_prepared) each query is prepared on the server
+    the first time a connection runs it, on a cursor kept for that query; later runs only reset
+    and execute the statement with binary parameters, so MySQL does not parse the SQL again.
+    On pymysql, which has no prepared statements, each run is a single parameterized text query.
+    """
+
+    def __init__(self, connect, size=POOL_SIZE):
+        self.connect = connect
+        self.idle = queue.LifoQueue()
+        self.slots = queue.Queue()
+        for _ in range(size):
+            self.slots.put(None) # A free slot; the connection is opened on first use
+
+    def acquire(self):
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        self.slots.get() # Blocks while every connection is in use
+        try:
+            return PooledConnection(self.connect())
+        except Exception:
+            self.slots.put(None)
+            raise
+
+    def release(self, pooled, broken=False):
+        if broken:
+            pooled.close()
+            self.slots.put(None)
+        else:
+            self.idle.put(pooled)
+
+    @contextlib.contextmanager
+    def connection(self):
+        """Borrows a pooled connection for ad-hoc queries."""
+        pooled = self.acquire()
+        broken = False
+        try:
+            yield pooled.con
+        except CONNECTION_ERRORS:
+            broken = True
+            raise
+        finally:
+            self.release(pooled, broken)
+
+    def close(self):
+        """Closes the idle connections; call it once no query is running any more."""
+        while True:
+            try:
+                pooled = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            pooled.close()
+            self.slots.put(None)
+
+    def execute(self, query, params=()):
+        """Runs a CompiledQuery and returns all rows; a dropped connection is replaced and retried once."""
+        for attempt in range(2):
+            pooled = self.acquire()
+            try:
+                rows = self.run(pooled, query, params)
+            except CONNECTION_ERRORS:
+                self.release(pooled, broken=True)
+                if attempt:
+                    raise
+                continue
+            except Exception:
+                self.release(pooled)
+                raise
+            self.release(pooled)
+            return rows
+
+    def run(self, pooled, query, params):
+        if len(params) != query.param_count:
+            raise ValueError(f"Query takes {query.param_count} parameter(s), got {len(params)}: {query.sql}")
+        if pooled.statements is None:
+            cur = pooled.con.cursor()
+            cur.execute(query.mysql_sql, tuple(params))
+            return cur.fetchall()
+        cur = pooled.statements.get(query)
+        if cur is None:
+            cur = pooled.statements[query] = pooled.con.cursor(prepared=True)
+        # The cursor re-prepares only when handed a different SQL string object, and query.sql never changes
+        cur.execute(query.sql, tuple(params))
+        return cur.fetchall()
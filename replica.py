@@ -0,0 +1,202 @@
+import datetime
+import decimal
+import queue
+import sqlite3
+import threading
+import time
+
+import pymysql
+
+from change_log import TAIL_BATCH, ChangeFeed, ensure_change_log, latest_seq
+from customers import CUSTOMER_FIELDS, CUSTOMERS_TABLE, LOOKUP_BATCH, CustomerCache
+from invoice8 import (DATETIME_FORMAT, INVOICE_TABLE_COLUMNS, NUMBERS_TABLE, PAYMENTS_TABLE, SORT_COLUMNS, TABLE_NAME,
+                      ensure_invoice_numbers, ensure_payments_table)
+
+SYNC_INTERVAL = 2.0 # Seconds between pulls from the change log
+SNAPSHOT_CHUNK = 2000 # Rows copied per round trip on the first sync
+
+
+def local_value(value):
+    """SQLite has no DATETIME or DECIMAL; they are stored as sortable text and floats."""
+    if isinstance(value, datetime.datetime):
+        return value.strftime(DATETIME_FORMAT)
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    return value
+
+
+class InvoiceReplica:
+    """
+    On-disk SQLite copy of the invoice, customer, payment and invoice number tables for desks on a
+    slow or flaky link.
+
+    The first sync copies the tables; after that a background thread applies the change log
+    from the last sequence number it stored, so each sync only moves what changed. The tables
+    keep their MySQL names and the queries QueryBuilder compiles are also valid SQLite, so
+    execute() is a drop-in for StatementPool.execute(). poll() hands the applied changes to the
+    UI like ChangeFeed.poll() does.
+    """
+
+    def __init__(self, path, connect):
+        self.path = path
+        self.connect = connect
+        self.changes = queue.Queue()
+        self.feed = None
+        self.error = None # Last sync error, None while the link is up
+        self.con = self.open() # UI thread only; the sync thread opens its own connection
+
+    def open(self):
+        con = sqlite3.connect(self.path, timeout=30)
+        con.execute("PRAGMA journal_mode=WAL") # Readers are never blocked by the sync thread's writes
+        columns = ", ".join(f"{col} PRIMARY KEY" if col == "invoice_no" else col for col in INVOICE_TABLE_COLUMNS)
+        con.execute(f"CREATE TABLE IF NOT EXISTS {TABLE_NAME} ({columns})")
+        for col in SORT_COLUMNS:
+            if col != "invoice_no":
+                con.execute(f"CREATE INDEX IF NOT EXISTS idx_sort_{col} ON {TABLE_NAME} ({col}, invoice_no)")
+        con.execute(f"CREATE TABLE IF NOT EXISTS {CUSTOMERS_TABLE} (c_id PRIMARY KEY, {', '.join(CUSTOMER_FIELDS)})")
+        con.execute(f"CREATE TABLE IF NOT EXISTS {PAYMENTS_TABLE} (invoice_no PRIMARY KEY)")
+        con.execute(f"CREATE TABLE IF NOT EXISTS {NUMBERS_TABLE} (invoice_no PRIMARY KEY)")
+        con.execute("CREATE TABLE IF NOT EXISTS replica_meta (key PRIMARY KEY, value)")
+        con.commit()
+        return con
+
+    def meta(self, con, key):
+        row = con.execute("SELECT value FROM replica_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, con, key, value):
+        con.execute("INSERT OR REPLACE INTO replica_meta (key, value) VALUES (?, ?)", (key, value))
+
+    # ========== Reads (UI thread) ==========
+    def execute(self, query, params=()):
+        """Runs a CompiledQuery against the local copy and returns all rows."""
+        return self.con.execute(query.sql, tuple(params)).fetchall()
+
+    def load_customers(self, c_ids):
+        loaded = {}
+        c_ids = list(c_ids)
+        for i in range(0, len(c_ids), LOOKUP_BATCH):
+            chunk = c_ids[i:i + LOOKUP_BATCH]
+            placeholders = ", ".join(["?"] * len(chunk))
+            rows = self.con.execute(
+                f"SELECT c_id, {', '.join(CUSTOMER_FIELDS)} FROM {CUSTOMERS_TABLE} WHERE c_id IN ({placeholders})", chunk
+            )
+            loaded.update((c_id, tuple(record)) for c_id, *record in rows)
+        return loaded
+
+    def poll(self):
+        """Returns [(seq, op, invoice_no, row)] applied since the last call; op 'reload' follows a full copy."""
+        received = []
+        while True:
+            try:
+                received.append(self.changes.get_nowait())
+            except queue.Empty:
+                return received
+
+    def staleness(self):
+        """Seconds since the last successful sync, or None if the replica has never synced."""
+        synced_at = self.meta(self.con, "synced_at")
+        return time.time() - float(synced_at) if synced_at is not None else None
+
+    # ========== Sync Thread ==========
+    def start(self):
+        threading.Thread(target=self.run, daemon=True).start()
+        return self
+
+    def run(self):
+        con = self.open()
+        while True:
+            try:
+                self.sync(con)
+                self.error = None
+            except Exception as e:
+                self.error = e # Keep serving the local copy; retried on the next interval
+                self.drop_feed()
+            time.sleep(SYNC_INTERVAL)
+
+    def drop_feed(self):
+        if self.feed is not None and self.feed.con is not None:
+            try:
+                self.feed.con.close()
+            except Exception:
+                pass
+        self.feed = None
+
+    def sync(self, con):
+        last_seq = self.meta(con, "last_seq")
+        if last_seq is None:
+            self.snapshot(con)
+            return
+        if self.feed is None:
+            self.feed = ChangeFeed(self.connect, int(last_seq))
+        while True:
+            changes = self.feed.read()
+            with con: # One SQLite transaction per batch, together with the new position
+                for seq, op, invoice_no, row in changes:
+                    self.apply(con, op, invoice_no, row)
+                self.set_meta(con, "last_seq", self.feed.last_seq)
+                self.set_meta(con, "synced_at", time.time())
+            for change in changes:
+                self.changes.put(change)
+            if len(changes) < TAIL_BATCH:
+                return
+
+    def apply(self, con, op, invoice_no, row):
+        if op in ("insert", "update"):
+            placeholders = ", ".join(["?"] * len(INVOICE_TABLE_COLUMNS))
+            con.execute(f"INSERT OR REPLACE INTO {TABLE_NAME} ({', '.join(INVOICE_TABLE_COLUMNS)}) VALUES ({placeholders})",
+                        [local_value(row[col]) for col in INVOICE_TABLE_COLUMNS])
+            if CUSTOMER_FIELDS[0] in row:
+                con.execute(f"INSERT OR REPLACE INTO {CUSTOMERS_TABLE} (c_id, {', '.join(CUSTOMER_FIELDS)}) VALUES (?, ?, ?, ?)",
+                            [row["c_id"]] + [row[col] for col in CUSTOMER_FIELDS])
+            con.execute(f"INSERT OR IGNORE INTO {NUMBERS_TABLE} (invoice_no) VALUES (?)", (invoice_no,))
+        elif op in ("delete", "archive"):
+            con.execute(f"DELETE FROM {TABLE_NAME} WHERE invoice_no = ?", (invoice_no,)) # The number stays claimed
+        elif op == "paid":
+            con.execute(f"INSERT OR IGNORE INTO {PAYMENTS_TABLE} (invoice_no) VALUES (?)", (invoice_no,))
+
+    def snapshot(self, con):
+        """First sync: copies the tables and remembers the change-log position they correspond to."""
+        upstream = self.connect()
+        try:
+            cur = upstream.cursor()
+            ensure_change_log(cur)
+            ensure_payments_table(cur)
+            ensure_invoice_numbers(cur)
+            upstream.commit()
+            # Changes logged after this point are applied by the next sync; applying one twice is harmless
+            seq = latest_seq(cur)
+            copies = [
+                (TABLE_NAME, INVOICE_TABLE_COLUMNS),
+                (CUSTOMERS_TABLE, ("c_id",) + CUSTOMER_FIELDS),
+                (PAYMENTS_TABLE, ("invoice_no",)),
+                (NUMBERS_TABLE, ("invoice_no",)),
+            ]
+            with con:
+                for table, columns in copies:
+                    con.execute(f"DELETE FROM {table}")
+                    cur = upstream.cursor(pymysql.cursors.SSCursor) # Unbuffered: copied as it streams in
+                    cur.execute(f"SELECT {', '.join(columns)} FROM {table}")
+                    insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(['?'] * len(columns))})"
+                    while True:
+                        chunk = cur.fetchmany(SNAPSHOT_CHUNK)
+                        if not chunk:
+                            break
+                        con.executemany(insert, [[local_value(value) for value in db_row] for db_row in chunk])
+                    cur.close()
+                self.set_meta(con, "last_seq", seq)
+                self.set_meta(con, "synced_at", time.time())
+        finally:
+            upstream.close()
+        self.changes.put((seq, "reload", None, None))
+
+
+class ReplicaCustomerCache(CustomerCache):
+    """CustomerCache that loads misses from the replica instead of MySQL."""
+
+    def __init__(self, replica):
+        super().__init__(None)
+        self.replica = replica
+
+    def load(self, c_ids, con=None):
+        return self.replica.load_customers(c_ids)
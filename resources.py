@@ -0,0 +1,115 @@
+from collections import defaultdict
+from datetime import date
+
+# Used when calendar_config.json has no "resources" section. Each resource lists the therapies
+# that need it and may add "closed" windows per weekday and "turnaround_slots" (slots the
+# resource stays blocked after a session, e.g. for cleaning). By default the pool and the speech
+# room each take one session at a time, and the physical, occupational and behavioral therapists
+# share one therapy room.
+DEFAULT_RESOURCES = {
+    "Pool": {"therapies": ["AQUATIC THERAPY"]},
+    "Therapy Room": {"therapies": ["PHYSICAL THERAPY", "OCCUPATIONAL THERAPY", "BEHAVIORAL THERAPY"]},
+    "Speech Room": {"therapies": ["SPEECH AND LANGUAGE THERAPY"]},
+}
+WEEKDAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+
+class ResourceEngine:
+    """
+    Closed windows and turnaround holds of rooms and equipment on the booking grid.
+
+    Bookings are keyed per session (slot and therapy), so departments run side by side in the
+    same slot and contend only for the resources they share: a session holds each resource its
+    therapy needs for its slot plus the turnaround, and no other therapy needing that resource
+    can start there meanwhile.
+
+    Every resource has an occupancy bitmap per day (bit i = the day's i-th slot) and an
+    availability bitmap per weekday built from its closed windows. For each therapy and day
+    the bitmaps of all resources it needs are OR-ed into one "blocked" mask, cached until a
+    booking on that day changes. A check is then a single bit test, however many resources
+    there are.
+    """
+
+    def __init__(self, resources, slot_starts):
+        self.resources = resources
+        self.slot_starts = slot_starts # day -> tuple of "HH:MM" slot starts, or None when closed
+        self.needs = defaultdict(list) # therapy -> resource names
+        for name, spec in resources.items():
+            for therapy in spec.get("therapies", ()):
+                self.needs[therapy].append(name)
+        self.occupied = defaultdict(dict) # resource -> day -> bitmap of held slots
+        self.closed_masks = {} # (resource, weekday, starts) -> bitmap of closed slots
+        self.blocked_masks = defaultdict(dict) # day -> therapy -> bitmap of slots the therapy cannot start in
+
+    # ========== Bitmaps ==========
+    def closed_mask(self, resource, day, starts):
+        key = (resource, day.weekday(), starts)
+        mask = self.closed_masks.get(key)
+        if mask is None:
+            mask = 0
+            windows = self.resources[resource].get("closed", {}).get(WEEKDAY_NAMES[day.weekday()], ())
+            for i, start in enumerate(starts):
+                if any(first <= start < end for first, end in windows):
+                    mask |= 1 << i
+            self.closed_masks[key] = mask
+        return mask
+
+    def resource_blocked(self, resource, day, starts):
+        """Slots where a session on the resource cannot start: it, or its turnaround, would hit a busy slot."""
+        busy = self.occupied[resource].get(day, 0) | self.closed_mask(resource, day, starts)
+        mask = 0
+        for k in range(self.resources[resource].get("turnaround_slots", 0) + 1):
+            mask |= busy >> k
+        return mask
+
+    def blocked(self, therapy, day):
+        """Bitmap of the day's slots the therapy cannot start in, over all the resources it needs."""
+        day_masks = self.blocked_masks[day]
+        mask = day_masks.get(therapy)
+        if mask is None:
+            mask = 0
+            starts = self.slot_starts(day) or ()
+            for resource in self.needs.get(therapy, ()):
+                mask |= self.resource_blocked(resource, day, starts)
+            day_masks[therapy] = mask
+        return mask
+
+    # ========== Checks ==========
+    def split_key(self, slot_key):
+        """(day, slot index) of a slot or session key, or (day, None) when the time is not a slot that day."""
+        day = date.fromisoformat(slot_key[:10])
+        starts = self.slot_starts(day) or ()
+        start = slot_key[11:16] # Session keys carry the therapy after the time
+        return day, starts.index(start) if start in starts else None
+
+    def available(self, therapy, slot_key):
+        day, index = self.split_key(slot_key)
+        return index is not None and not (self.blocked(therapy, day) >> index) & 1
+
+    def conflicts(self, therapy, slot_key):
+        """Names of the resources that keep the therapy out of a slot (for messages; slower than available())."""
+        day, index = self.split_key(slot_key)
+        if index is None:
+            return []
+        starts = self.slot_starts(day) or ()
+        return [resource for resource in self.needs.get(therapy, ())
+                if (self.resource_blocked(resource, day, starts) >> index) & 1]
+
+    # ========== Occupancy ==========
+    def rebuild_day(self, bookings, day):
+        """Recomputes the day's occupancy bitmaps from its sessions (a handful per slot at most) after a change."""
+        starts = self.slot_starts(day) or ()
+        index = {start: i for i, start in enumerate(starts)}
+        for resource in self.resources:
+            self.occupied[resource].pop(day, None)
+        keys, lo, hi = bookings.key_range(bookings.sorted_keys, day, day)
+        for slot_key in keys[lo:hi]:
+            i = index.get(slot_key[11:16])
+            if i is None:
+                continue
+            therapy = bookings[slot_key]['therapy']
+            for resource in self.needs.get(therapy, ()):
+                hold = self.resources[resource].get("turnaround_slots", 0)
+                bits = ((1 << (hold + 1)) - 1) << i # The session's slot plus its turnaround
+                self.occupied[resource][day] = self.occupied[resource].get(day, 0) | bits
+        self.blocked_masks.pop(day, None)
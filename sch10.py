@@ -1,15 +1,25 @@
 import tkinter as tk
 from tkinter import messagebox, simpledialog, ttk, filedialog
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from collections.abc import MutableMapping
 import csv
+import queue
+import sys
+import threading
+
+from perf_stats import PerfStats, instrumented
+from tk_watchdog import EventLoopWatchdog, watchdog_threshold
+from waitlist import WINDOW_NAMES, Waitlist
+from utilization import UtilizationReport
+from resources import ResourceEngine
+from clinic_calendar import CALENDAR, WEEKDAY_NAMES, session_key, slot_of
 
 # Constants
-APPOINTMENT_DURATION = timedelta(minutes=20)
-BREAK_DURATION = timedelta(minutes=5)
-START_TIME = datetime.strptime("09:00", "%H:%M").time()
-END_TIME = datetime.strptime("17:00", "%H:%M").time()
-LUNCH_START = datetime.strptime("12:30", "%H:%M").time()
-LUNCH_END = datetime.strptime("13:00", "%H:%M").time()
+ROLL_CHECK_MS = 60 * 1000 # How often to check whether the horizon needs to roll forward
+STATS_REFRESH_MS = 1000
+JOURNEY_POLL_MS = 1000 # How often invoice changes are pulled into the patient journey index
 THERAPY_TYPES = [
     "PHYSICAL THERAPY",
     "OCCUPATIONAL THERAPY",
@@ -17,14 +27,243 @@ THERAPY_TYPES = [
     "BEHAVIORAL THERAPY",
     "AQUATIC THERAPY"
 ]
+DATE_RANGES = ["All", "Today", "This Week", "Upcoming"]
+ALTERNATIVE_SEARCH_DAYS = 7 # How far ahead to look for a free slot when a series occurrence clashes
+
+def to_minutes(time_str):
+    hours, minutes = time_str.split(":")
+    return int(hours) * 60 + int(minutes)
+
+def nearest_free_slot(bookings, day_slots, day, start_time, taken, fits=None):
+    """Returns the free slot closest in time to start_time on `day`, then on the following days."""
+    target = to_minutes(start_time)
+    for offset in range(ALTERNATIVE_SEARCH_DAYS + 1):
+        candidate_day = day + timedelta(days=offset)
+        free = [s for s in day_slots.get(candidate_day, ())
+                if f"{candidate_day}_{s}" not in bookings and f"{candidate_day}_{s}" not in taken
+                and (fits is None or fits(f"{candidate_day}_{s}"))]
+        if free:
+            best = min(free, key=lambda s: abs(to_minutes(s) - target))
+            return f"{candidate_day}_{best}"
+    return None
+
+def plan_series(bookings, day_slots, start_date, weekdays, start_time, count, fits=None):
+    """
+    Plans `count` occurrences on the given weekdays (0=Mon) at start_time, from start_date on.
+    Returns [(requested_key, booked_key)] where booked_key is the requested slot when it is free,
+    otherwise the nearest free alternative, or None when nothing is free nearby.
+    fits(slot_key), when given, must also accept a slot (e.g. the therapy's resources are available).
+    """
+    plan = []
+    taken = set()
+    if not weekdays or not day_slots:
+        return plan
+    day = start_date
+    last_day = max(day_slots)
+    while len(plan) < count and day <= last_day:
+        if day.weekday() in weekdays and day in day_slots:
+            requested = f"{day}_{start_time}"
+            if (start_time in day_slots[day] and requested not in bookings and requested not in taken
+                    and (fits is None or fits(requested))):
+                booked = requested
+            else:
+                booked = nearest_free_slot(bookings, day_slots, day, start_time, taken, fits)
+            if booked:
+                taken.add(booked)
+            plan.append((requested, booked))
+        day += timedelta(days=1)
+    return plan
+
+def date_range_bounds(range_name, today=None):
+    """Returns (first_date, last_date) for a DATE_RANGES entry; None means unbounded."""
+    today = today or datetime.today().date()
+    if range_name == "Today":
+        return today, today
+    if range_name == "This Week":
+        monday = today - timedelta(days=today.weekday())
+        return monday, monday + timedelta(days=6)
+    if range_name == "Upcoming":
+        return today, None
+    return None, None
+
+class BookingStore(MutableMapping):
+    """
+    The scheduler's bookings (session key -> {'phone': ..., 'therapy': ...}) with the keys also
+    kept in chronological order overall, per therapy and per phone. Session keys
+    ("YYYY-MM-DD_HH:MM@THERAPY", see session_key) sort chronologically as strings, so the
+    indexes are plain sorted lists and a slot's concurrent sessions sit next to each other.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.sorted_keys = []
+        self.by_therapy = defaultdict(list)
+        self.by_phone = defaultdict(list)
+        self.listeners = [] # called with the slot_key after every change (once per day for update())
+        self.version = 0 # bumped on every change, so derived reports know when to rebuild
+        self.cancellations = [] # (slot_key, therapy) of every cancelled booking
+
+    def __getitem__(self, slot_key):
+        return self.data[slot_key]
+
+    def __setitem__(self, slot_key, info):
+        if slot_key in self.data:
+            self._unindex(slot_key, self.data[slot_key])
+        self.data[slot_key] = info
+        insort(self.sorted_keys, slot_key)
+        insort(self.by_therapy[info['therapy']], slot_key)
+        insort(self.by_phone[info['phone']], slot_key)
+        self._notify(slot_key)
+
+    def __delitem__(self, slot_key):
+        info = self.data.pop(slot_key)
+        self._unindex(slot_key, info)
+        self._notify(slot_key)
+
+    def __iter__(self):
+        return iter(self.sorted_keys)
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, slot_key):
+        return slot_key in self.data
+
+    def update(self, bookings=(), **kwargs):
+        """
+        Books many slots at once, e.g. a series. The sorted indexes are merged once instead of per
+        booking, and listeners are called once per affected day, with that day's first slot_key.
+        """
+        bookings = dict(bookings, **kwargs)
+        for slot_key, info in bookings.items():
+            if slot_key in self.data:
+                self._unindex(slot_key, self.data[slot_key])
+            self.data[slot_key] = info
+        added = sorted(bookings)
+        # Sorted in place, since the appointment lists hold on to these; two sorted runs merge in one pass
+        self.sorted_keys.extend(added)
+        self.sorted_keys.sort()
+        for name, index in (("therapy", self.by_therapy), ("phone", self.by_phone)):
+            for slot_key in added:
+                index[bookings[slot_key][name]].append(slot_key)
+            for value in {bookings[slot_key][name] for slot_key in added}:
+                index[value].sort()
+        days = {}
+        for slot_key in added:
+            days.setdefault(slot_key[:10], slot_key)
+        for slot_key in days.values():
+            self._notify(slot_key)
+
+    def _unindex(self, slot_key, info):
+        for keys in (self.sorted_keys, self.by_therapy[info['therapy']], self.by_phone[info['phone']]):
+            del keys[bisect_left(keys, slot_key)]
+
+    def sessions_at(self, slot_key):
+        """Keys of the sessions booked in one "YYYY-MM-DD_HH:MM" slot."""
+        lo = bisect_left(self.sorted_keys, f"{slot_key}@")
+        return self.sorted_keys[lo:bisect_left(self.sorted_keys, f"{slot_key}A", lo)] # 'A' sorts right after '@'
+
+    def slots_of(self, therapy):
+        """The slots the therapy's department already has a session in."""
+        return {slot_of(key) for key in self.by_therapy.get(therapy, ())}
+
+    def cancel(self, slot_key):
+        """Removes a booking and remembers the cancellation for the utilization report."""
+        self.cancellations.append((slot_key, self.data[slot_key]['therapy']))
+        del self[slot_key]
+
+    def _notify(self, slot_key):
+        self.version += 1
+        for listener in self.listeners:
+            listener(slot_key)
+
+    def key_range(self, keys, first_date=None, last_date=None):
+        """Returns (keys, lo, hi) so that keys[lo:hi] are the slots between the two dates (inclusive)."""
+        lo = bisect_left(keys, str(first_date)) if first_date else 0
+        hi = bisect_right(keys, f"{last_date}_~") if last_date else len(keys) # '~' sorts after any time
+        return keys, lo, hi
+
+class VirtualList(tk.Frame):
+    """
+    A Listbox that only renders the rows currently in view. Its source is a callable
+    returning (sorted_keys, lo, hi); keys[lo:hi] are the rows, formatted on demand.
+    """
+
+    def __init__(self, master, width, height):
+        super().__init__(master)
+        self.height = height
+        self.listbox = tk.Listbox(self, width=width, height=height, activestyle="none")
+        self.scrollbar = tk.Scrollbar(self, orient="vertical", command=self.on_scroll)
+        self.listbox.pack(side="left", fill="both", expand=True)
+        self.scrollbar.pack(side="right", fill="y")
+        self.listbox.bind("<MouseWheel>", lambda e: self.scroll_to(self.top - int(e.delta / 120) * 3))
+        self.listbox.bind("<Button-4>", lambda e: self.scroll_to(self.top - 3))
+        self.listbox.bind("<Button-5>", lambda e: self.scroll_to(self.top + 3))
+        self.source = lambda: ([], 0, 0)
+        self.formatter = str
+        self.top = 0
+        self.rendered = []
+
+    def set_source(self, source, formatter):
+        self.source = source
+        self.formatter = formatter
+        self.top = 0
+        self.refresh()
+
+    def clear(self):
+        self.set_source(lambda: ([], 0, 0), str)
+
+    def size(self):
+        _, lo, hi = self.source()
+        return hi - lo
+
+    def refresh(self):
+        """Re-renders the visible window; costs O(visible rows) regardless of the list length."""
+        keys, lo, hi = self.source()
+        total = hi - lo
+        self.top = max(0, min(self.top, total - self.height))
+        start = lo + self.top
+        visible = [self.formatter(k) for k in keys[start:min(hi, start + self.height)]]
+        if visible != self.rendered:
+            self.listbox.delete(0, tk.END)
+            if visible:
+                self.listbox.insert(tk.END, *visible)
+            self.rendered = visible
+        if total:
+            self.scrollbar.set(self.top / total, min(1.0, (self.top + self.height) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def scroll_to(self, top):
+        self.top = top
+        self.refresh()
+
+    def on_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * self.size()))
+        elif unit == "pages":
+            self.scroll_to(self.top + int(amount) * self.height)
+        else:
+            self.scroll_to(self.top + int(amount))
 
 class SchedulerApp(tk.Tk):
     def __init__(self):
         super().__init__()
         self.title("Sree Rehabilitation Center")
         self.geometry("1700x900")
-        self.bookings = {}  # slot_key -> {'phone': ..., 'therapy': ...}
+        self.stats = PerfStats()
+        self.bookings = BookingStore()  # slot_key -> {'phone': ..., 'therapy': ...}
+        self.bookings.listeners.append(self.on_booking_changed)
+        self.waitlist = Waitlist(THERAPY_TYPES)
+        self.resources = ResourceEngine(CALENDAR.resources, CALENDAR.slot_starts)
+        self.utilization = None # cached UtilizationReport
+        self.utilization_version = -1
+        self.journeys = None # JourneyIndex, built when the journey view is first opened
+        self.journey_feed = None
         self.slot_buttons = {}
+        self.day_slots = {} # date -> slot start times ("HH:MM") in order, the slot index
+        self.day_widgets = {} # date -> widgets of that day's column, so rolled-off days can be dropped
+        self.next_column = 0
 
         title = tk.Label(self, text="Sree Rehabilitation Center – Schedule Your Appointment!",
                          font=("Helvetica", 18, "bold"), fg="#2c3e50")
@@ -52,56 +291,87 @@ class SchedulerApp(tk.Tk):
         canvas.pack(fill="both", expand=True)
         scroll_x.pack(fill="x")
 
+        self.slot_frame = scrollable_frame
         today = datetime.today().date()
-        for col in range(365):
-            day_date = today + timedelta(days=col)
-            label = tk.Label(scrollable_frame, text=day_date.strftime("%a\n%d %b"), font=("Arial", 10, "bold"))
-
-            if day_date.weekday() == 6:
-                label.configure(fg="gray")
-                label.grid(row=0, column=col, padx=8, pady=5)
-                tk.Label(scrollable_frame, text="Closed", fg="gray").grid(row=1, column=col)
-            else:
-                label.grid(row=0, column=col, padx=8, pady=5)
-                self.render_slots_for_day(scrollable_frame, day_date, col)
+        for offset in range(CALENDAR.horizon_days):
+            self.add_day_column(today + timedelta(days=offset))
+        self.after(ROLL_CHECK_MS, self.roll_horizon)
 
-    def render_slots_for_day(self, frame, day_date, col):
-        current_time = datetime.combine(day_date, START_TIME)
-        end_of_day = datetime.combine(day_date, END_TIME)
-        lunch_start = datetime.combine(day_date, LUNCH_START)
-        lunch_end = datetime.combine(day_date, LUNCH_END)
-
-        row = 1
-        while current_time + APPOINTMENT_DURATION <= end_of_day:
-            if lunch_start <= current_time < lunch_end:
-                current_time = lunch_end
-                continue
+    def add_day_column(self, day_date):
+        """Adds one day's column at the right end of the grid from its precomputed slot template."""
+        col = self.next_column
+        self.next_column += 1
+        label = tk.Label(self.slot_frame, text=day_date.strftime("%a\n%d %b"), font=("Arial", 10, "bold"))
+        widgets = [label]
+
+        if CALENDAR.template(day_date) is None:
+            label.configure(fg="gray")
+            label.grid(row=0, column=col, padx=8, pady=5)
+            closed = tk.Label(self.slot_frame, text="Closed", fg="gray")
+            closed.grid(row=1, column=col)
+            widgets.append(closed)
+        else:
+            label.grid(row=0, column=col, padx=8, pady=5)
+            widgets.extend(self.render_slots_for_day(self.slot_frame, day_date, col))
+        self.day_widgets[day_date] = widgets
 
-            start_str = current_time.strftime("%H:%M")
-            end_str = (current_time + APPOINTMENT_DURATION).strftime("%H:%M")
+    def remove_day_column(self, day_date):
+        """Drops a day that has rolled out of the horizon; its bookings stay in the store."""
+        for widget in self.day_widgets.pop(day_date):
+            widget.destroy()
+        for start_str in self.day_slots.pop(day_date, None) or ():
+            self.slot_buttons.pop(f"{day_date}_{start_str}", None)
+
+    @instrumented("roll_horizon")
+    def roll_horizon(self):
+        """Drops days before today and appends new days so the grid always spans the horizon."""
+        today = datetime.today().date()
+        rolled_off = [d for d in self.day_widgets if d < today]
+        for day_date in rolled_off:
+            self.remove_day_column(day_date)
+        if rolled_off:
+            self.regrid_days()
+        next_day = max(self.day_widgets) + timedelta(days=1) if self.day_widgets else today
+        while next_day < today + timedelta(days=CALENDAR.horizon_days):
+            self.add_day_column(next_day)
+            next_day += timedelta(days=1)
+        self.after(ROLL_CHECK_MS, self.roll_horizon)
+
+    def regrid_days(self):
+        """Moves the remaining day columns left so the ones dropped leave no empty grid columns."""
+        for col, day_date in enumerate(sorted(self.day_widgets)):
+            for widget in self.day_widgets[day_date]:
+                widget.grid_configure(column=col)
+        self.next_column = len(self.day_widgets)
+
+    def render_slots_for_day(self, frame, day_date, col):
+        buttons = []
+        self.day_slots[day_date] = CALENDAR.slot_starts(day_date) # Shared per weekday, not re-derived
+        for row, (start_str, end_str) in enumerate(CALENDAR.template(day_date), start=1):
             slot_key = f"{day_date}_{start_str}"
 
             btn = tk.Button(frame, text=f"{start_str}-{end_str}", width=12,
                             bg="lightgreen", command=lambda k=slot_key, d=day_date, s=start_str, e=end_str: self.handle_slot(k, d, s, e))
             btn.grid(row=row, column=col, pady=2)
+            btn.bind("<Button-3>", lambda e, k=slot_key: self.open_slot_menu(e, k))
             self.slot_buttons[slot_key] = btn
+            buttons.append(btn)
+        return buttons
 
-            row += 1
-            current_time += APPOINTMENT_DURATION + BREAK_DURATION
-
+    @instrumented("handle_slot")
     def handle_slot(self, slot_key, day, start_time, end_time):
-        if slot_key in self.bookings:
-            phone = simpledialog.askstring("Cancel Slot", "This slot is already booked. Enter your mobile number to cancel:")
-            if phone and self.bookings[slot_key]['phone'] == phone:
-                # Directly reset the button color for the cancelled slot
-                self.slot_buttons[slot_key].configure(bg="lightgreen")
-                del self.bookings[slot_key]
-                self.update_therapist_schedule() # Re-evaluate colors for all slots
-                self.update_customer_schedule(phone)
-                messagebox.showinfo("Cancelled", "Your appointment has been cancelled.")
-            else:
-                messagebox.showwarning("Mismatch", "Mobile number does not match the booking.")
-            return
+        sessions = self.bookings.sessions_at(slot_key)
+        if sessions:
+            # Other departments may still have room in this slot, so booking stays possible
+            answer = messagebox.askyesnocancel(
+                "Booked Slot",
+                f"{len(sessions)} session(s) already booked at this time.\n\n"
+                "Yes: cancel your appointment\nNo: book another session\nCancel: close")
+            if answer is None:
+                return
+            if answer:
+                self.cancel_sessions(slot_key, sessions, day, start_time)
+                return
 
         top = tk.Toplevel(self)
         top.title("Book Appointment")
@@ -127,18 +397,242 @@ class SchedulerApp(tk.Tk):
             if therapy == "Select service":
                 messagebox.showwarning("Missing Info", "Please select a therapy type.")
                 return
+            if session_key(slot_key, therapy) in self.bookings:
+                messagebox.showwarning("Already Booked", f"{therapy} already has a session at this time.")
+                return
+            if not self.resources.available(therapy, slot_key):
+                messagebox.showwarning("Resource Unavailable",
+                                       f"{therapy} needs {', '.join(self.resources.conflicts(therapy, slot_key))}, "
+                                       "which is not available at this time.")
+                return
 
-            self.bookings[slot_key] = {'phone': phone, 'therapy': therapy}
-            # The button's color will be set by update_therapist_schedule/update_customer_schedule
-            # which is called right after this.
-            # self.slot_buttons[slot_key].configure(bg="red") # This line is no longer strictly needed here
-            self.update_therapist_schedule()
+            # on_booking_changed recolors the day
+            self.bookings[session_key(slot_key, therapy)] = {'phone': phone, 'therapy': therapy}
             self.update_customer_schedule(phone)
             messagebox.showinfo("Booked", f"Appointment booked for {therapy} on {day.strftime('%A')} at {start_time}.")
             top.destroy()
 
         tk.Button(top, text="✔ Book Slot", command=confirm).pack(pady=10)
 
+    def cancel_sessions(self, slot_key, sessions, day, start_time):
+        """Cancels the sessions a patient has in a slot, after checking their mobile number."""
+        phone = simpledialog.askstring("Cancel Slot", "Enter your mobile number to cancel:")
+        mine = [key for key in sessions if phone and self.bookings[key]['phone'] == phone]
+        if not mine:
+            messagebox.showwarning("Mismatch", "Mobile number does not match a booking at this time.")
+            return
+        for key in mine:
+            self.bookings.cancel(key) # on_booking_changed recolors that day's slots
+        self.update_customer_schedule(phone)
+        messagebox.showinfo("Cancelled", "Your appointment has been cancelled.")
+        self.offer_freed_slot(slot_key, day, start_time)
+
+    def open_slot_menu(self, event, slot_key):
+        """Right-click menu of a booked slot; sessions that have started can be marked as no-shows."""
+        sessions = self.bookings.sessions_at(slot_key)
+        if not sessions or slot_key >= datetime.now().strftime("%Y-%m-%d_%H:%M"):
+            return
+        menu = tk.Menu(self, tearoff=0)
+        for key in sessions:
+            info = self.bookings[key]
+            label = "Clear No-Show Mark" if info.get('no_show') else "Mark as No-Show"
+            menu.add_command(label=f"{label}: {info['therapy']} ({info['phone']})",
+                             command=lambda k=key: self.toggle_no_show(k))
+        menu.tk_popup(event.x_root, event.y_root)
+
+    def toggle_no_show(self, key):
+        info = self.bookings[key]
+        self.bookings[key] = {**info, 'no_show': not info.get('no_show')}
+
+    def offer_freed_slot(self, slot_key, day, start_time):
+        """Offers a slot freed by a cancellation to waiting patients, best candidate first, until one takes it."""
+        declined = []
+        while True:
+            taken = self.waitlist.take_best(start_time)
+            if taken is None:
+                break
+            request_id, request = taken
+            # Their department already has a session then, or a room it needs is taken, closed or in turnaround
+            if (session_key(slot_key, request['therapy']) in self.bookings
+                    or not self.resources.available(request['therapy'], slot_key)):
+                declined.append(taken)
+                continue
+            answer = messagebox.askyesnocancel(
+                "Offer Freed Slot",
+                f"{day.strftime('%A, %B %d')} at {start_time} is now free.\n\n"
+                f"Waiting: {request['phone']} for {request['therapy']} "
+                f"({request['window']}, priority {request['priority']}).\n\n"
+                "Yes: book it for them\nNo: offer it to the next patient\nCancel: leave the slot free"
+            )
+            if answer:
+                self.bookings[session_key(slot_key, request['therapy'])] = {'phone': request['phone'],
+                                                                           'therapy': request['therapy']}
+                self.update_customer_schedule(request['phone'])
+                break
+            declined.append(taken) # Keeps their place in line for the next freed slot
+            if answer is None:
+                break
+        for request_id, request in declined:
+            self.waitlist.restore(request_id, request)
+
+    def open_waitlist(self):
+        """Join/leave the waitlist for a therapy and time of day; cancellations are offered in priority order."""
+        top = tk.Toplevel(self)
+        top.title("Waitlist")
+
+        tk.Label(top, text="📱 Mobile Number:").grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        phone_entry = tk.Entry(top)
+        phone_entry.insert(0, self.customer_entry.get())
+        phone_entry.grid(row=0, column=1, sticky="ew", padx=5, pady=2)
+
+        tk.Label(top, text="💆 Therapy Type:").grid(row=1, column=0, sticky="w", padx=5, pady=2)
+        therapy = tk.StringVar(value="Select service")
+        ttk.Combobox(top, values=["Select service"] + THERAPY_TYPES, textvariable=therapy,
+                     state="readonly").grid(row=1, column=1, sticky="ew", padx=5, pady=2)
+
+        tk.Label(top, text="🕒 Time of Day:").grid(row=2, column=0, sticky="w", padx=5, pady=2)
+        window = tk.StringVar(value=WINDOW_NAMES[0])
+        ttk.Combobox(top, values=WINDOW_NAMES, textvariable=window,
+                     state="readonly").grid(row=2, column=1, sticky="ew", padx=5, pady=2)
+
+        tk.Label(top, text="Priority (1-5, 5 = most urgent):").grid(row=3, column=0, sticky="w", padx=5, pady=2)
+        priority_spin = tk.Spinbox(top, from_=1, to=5, width=5)
+        priority_spin.grid(row=3, column=1, sticky="w", padx=5, pady=2)
+
+        waiting_list = tk.Listbox(top, width=70, height=12)
+        waiting_list.grid(row=5, column=0, columnspan=2, padx=5, pady=5)
+        shown = []
+
+        def refresh():
+            shown.clear()
+            waiting_list.delete(0, tk.END)
+            for request_id, request in self.waitlist.pending():
+                shown.append(request_id)
+                waiting_list.insert(tk.END, f"{request['therapy']} | {request['window']} | "
+                                            f"priority {request['priority']} | {request['phone']}")
+
+        def join():
+            phone = phone_entry.get()
+            if not phone:
+                messagebox.showwarning("Missing Info", "Mobile number required!", parent=top)
+                return
+            if therapy.get() == "Select service":
+                messagebox.showwarning("Missing Info", "Please select a therapy type.", parent=top)
+                return
+            try:
+                priority = int(priority_spin.get())
+            except ValueError:
+                messagebox.showwarning("Invalid Input", "Priority must be a number from 1 to 5.", parent=top)
+                return
+            self.waitlist.join(phone, therapy.get(), window.get(), priority)
+            refresh()
+
+        def leave():
+            selection = waiting_list.curselection()
+            if selection:
+                self.waitlist.leave(shown[selection[0]])
+                refresh()
+
+        btns = tk.Frame(top)
+        btns.grid(row=4, column=0, columnspan=2, pady=5)
+        tk.Button(btns, text="➕ Join Waitlist", command=join).pack(side="left", padx=5)
+        tk.Button(btns, text="➖ Remove Selected", command=leave).pack(side="left", padx=5)
+        refresh()
+
+    def open_series_booking(self):
+        """Books a recurring weekly series (e.g. Mon/Wed/Fri at 10:00 for 12 sessions) in one go."""
+        top = tk.Toplevel(self)
+        top.title("Book Appointment Series")
+
+        tk.Label(top, text="📱 Mobile Number:").grid(row=0, column=0, sticky="w", padx=5, pady=2)
+        phone_entry = tk.Entry(top)
+        phone_entry.insert(0, self.customer_entry.get())
+        phone_entry.grid(row=0, column=1, columnspan=6, sticky="ew", padx=5, pady=2)
+
+        tk.Label(top, text="💆 Therapy Type:").grid(row=1, column=0, sticky="w", padx=5, pady=2)
+        therapy = tk.StringVar(value="Select service")
+        ttk.Combobox(top, values=["Select service"] + THERAPY_TYPES, textvariable=therapy,
+                     state="readonly").grid(row=1, column=1, columnspan=6, sticky="ew", padx=5, pady=2)
+
+        tk.Label(top, text="📆 Days:").grid(row=2, column=0, sticky="w", padx=5, pady=2)
+        day_vars = []
+        for i, name in enumerate(WEEKDAY_NAMES[:6]): # Sunday is closed
+            var = tk.BooleanVar(value=i in (0, 2, 4))
+            tk.Checkbutton(top, text=name, variable=var).grid(row=2, column=i + 1, sticky="w")
+            day_vars.append(var)
+
+        all_times = sorted({t for times in self.day_slots.values() for t in times}, key=to_minutes)
+        tk.Label(top, text="🕒 Time:").grid(row=3, column=0, sticky="w", padx=5, pady=2)
+        start_time = tk.StringVar(value=all_times[0] if all_times else "")
+        ttk.Combobox(top, values=all_times, textvariable=start_time, state="readonly",
+                     width=8).grid(row=3, column=1, columnspan=2, sticky="w", padx=5, pady=2)
+
+        tk.Label(top, text="Start Date (YYYY-MM-DD):").grid(row=4, column=0, sticky="w", padx=5, pady=2)
+        start_entry = tk.Entry(top, width=12)
+        start_entry.insert(0, datetime.today().strftime("%Y-%m-%d"))
+        start_entry.grid(row=4, column=1, columnspan=2, sticky="w", padx=5, pady=2)
+
+        tk.Label(top, text="Sessions:").grid(row=5, column=0, sticky="w", padx=5, pady=2)
+        count_spin = tk.Spinbox(top, from_=1, to=100, width=5)
+        count_spin.delete(0, tk.END)
+        count_spin.insert(0, "12")
+        count_spin.grid(row=5, column=1, sticky="w", padx=5, pady=2)
+
+        plan_list = tk.Listbox(top, width=60, height=12)
+        plan_list.grid(row=7, column=0, columnspan=7, padx=5, pady=5)
+        plan = []
+
+        def check():
+            plan.clear()
+            plan_list.delete(0, tk.END)
+            try:
+                start_date = datetime.strptime(start_entry.get(), "%Y-%m-%d").date()
+                count = int(count_spin.get())
+            except ValueError:
+                messagebox.showwarning("Invalid Input", "Enter a valid start date and number of sessions.", parent=top)
+                return False
+            weekdays = {i for i, var in enumerate(day_vars) if var.get()}
+            fits = lambda key: self.resources.available(therapy.get(), key)
+            plan.extend(plan_series(self.bookings.slots_of(therapy.get()), self.day_slots, start_date, weekdays,
+                                    start_time.get(), count, fits))
+            for requested, booked in plan:
+                label = requested.replace("_", " at ")
+                if booked == requested:
+                    plan_list.insert(tk.END, f"✔ {label}")
+                elif booked:
+                    plan_list.insert(tk.END, f"⚠ {label} is taken → {booked.replace('_', ' at ')}")
+                else:
+                    plan_list.insert(tk.END, f"✖ {label} is taken, no free slot nearby")
+            if len(plan) < count:
+                plan_list.insert(tk.END, f"Only {len(plan)} of {count} sessions fit in the calendar.")
+            return True
+
+        def confirm():
+            phone = phone_entry.get()
+            if not phone:
+                messagebox.showwarning("Missing Info", "Mobile number required!", parent=top)
+                return
+            if therapy.get() == "Select service":
+                messagebox.showwarning("Missing Info", "Please select a therapy type.", parent=top)
+                return
+            if not check():
+                return
+            keys = [booked for _, booked in plan if booked]
+            # Re-check right before committing; all sessions are booked together or none are
+            if not keys or any(session_key(k, therapy.get()) in self.bookings
+                               or not self.resources.available(therapy.get(), k) for k in keys):
+                messagebox.showwarning("Not Booked", "Some slots are no longer free. Please check again.", parent=top)
+                return
+            self.bookings.update({session_key(k, therapy.get()): {'phone': phone, 'therapy': therapy.get()} for k in keys})
+            self.update_customer_schedule(phone)
+            messagebox.showinfo("Booked", f"{len(keys)} {therapy.get()} sessions booked.", parent=top)
+            top.destroy()
+
+        btns = tk.Frame(top)
+        btns.grid(row=6, column=0, columnspan=7, pady=5)
+        tk.Button(btns, text="🔍 Check Availability", command=check).pack(side="left", padx=5)
+        tk.Button(btns, text="✔ Book Series", command=confirm).pack(side="left", padx=5)
+
     def render_therapist_panel(self):
         frame = tk.Frame(self.main_frame, relief="ridge", bd=2, width=300)
         frame.pack(side="right", fill="y", padx=10)
@@ -151,56 +645,310 @@ class SchedulerApp(tk.Tk):
         dropdown.pack(pady=5)
         dropdown.bind("<<ComboboxSelected>>", lambda e: self.update_therapist_schedule())
 
-        self.schedule_list = tk.Listbox(frame, width=45, height=30)
-        self.schedule_list.pack(pady=10)
+        self.therapist_range = tk.StringVar(value="All")
+        range_dropdown = ttk.Combobox(frame, values=DATE_RANGES, textvariable=self.therapist_range, state="readonly", width=12)
+        range_dropdown.pack(pady=5)
+        range_dropdown.bind("<<ComboboxSelected>>", lambda e: self.update_therapist_list())
 
-        scrollbar = tk.Scrollbar(frame, orient="vertical", command=self.schedule_list.yview)
-        scrollbar.pack(side="right", fill="y")
-        self.schedule_list.configure(yscrollcommand=scrollbar.set)
+        self.schedule_list = VirtualList(frame, width=45, height=30)
+        self.schedule_list.pack(pady=10)
 
         export_btn = tk.Button(frame, text="📤 Export to CSV", command=self.export_csv)
         export_btn.pack(pady=10)
 
+        stats_btn = tk.Button(frame, text="⏱ Performance", command=self.open_stats_window)
+        stats_btn.pack(pady=5)
+
+        utilization_btn = tk.Button(frame, text="📊 Utilization", command=self.open_utilization_window)
+        utilization_btn.pack(pady=5)
+
         # Call update schedule initially to reflect the "Select Department" state
         self.update_therapist_schedule()
 
+    @instrumented("repaint")
     def update_therapist_schedule(self):
         selected_type = self.therapist_type.get()
-        self.schedule_list.delete(0, tk.END)
+        if selected_type != getattr(self, "listed_department", None):
+            self.update_therapist_list()
+        for day_date in self.day_slots: # A new department or customer can change any slot's color
+            self.recolor_day(day_date)
+
+    def recolor_day(self, day_date):
+        """Colors one day's slot buttons by its sessions, the customer and the selected department."""
+        selected_type = self.therapist_type.get()
         # Check if customer_entry exists before trying to get its value
         current_customer_phone = self.customer_entry.get() if hasattr(self, 'customer_entry') else ""
+        starts = self.day_slots.get(day_date) or ()
+        booked = defaultdict(list) # "HH:MM" -> sessions in that slot
+        keys, lo, hi = self.bookings.key_range(self.bookings.sorted_keys, day_date, day_date)
+        for key in keys[lo:hi]:
+            booked[key[11:16]].append(self.bookings[key])
+        # One cached bitmap per day (bit i = the day's i-th slot) instead of a resource check per slot
+        blocked = self.resources.blocked(selected_type, day_date) if selected_type in THERAPY_TYPES else 0
 
-        # Iterate through all slot buttons to apply correct coloring
-        for slot, btn in self.slot_buttons.items():
-            if slot in self.bookings:
-                # If the slot is booked by the current customer and a phone is entered, make it yellow
-                if self.bookings[slot]['phone'] == current_customer_phone and current_customer_phone:
-                    btn.configure(bg="yellow")
-                # If "Select Department" is chosen, all booked slots that are not yellow should be red
-                elif selected_type == "Select Department":
-                    btn.configure(bg="red")
-                # If a specific therapy type is selected and the slot's therapy matches, make it purple
-                elif self.bookings[slot]['therapy'] == selected_type:
-                    btn.configure(bg="purple")
-                # Otherwise, it's booked by someone else (not the current customer being viewed, and not the selected therapy type)
-                else:
-                    btn.configure(bg="red")
+        for i, start_str in enumerate(starts):
+            btn = self.slot_buttons[f"{day_date}_{start_str}"]
+            sessions = booked.get(start_str, ())
+            # If the current customer has a session in the slot and a phone is entered, make it yellow
+            if current_customer_phone and any(info['phone'] == current_customer_phone for info in sessions):
+                btn.configure(bg="yellow")
+            # If "Select Department" is chosen, all booked slots that are not yellow should be red
+            elif selected_type == "Select Department":
+                btn.configure(bg="red" if sessions else "lightgreen")
+            # If a specific therapy type is selected and it has a session in the slot, make it purple
+            elif any(info['therapy'] == selected_type for info in sessions):
+                btn.configure(bg="purple")
+            elif (blocked >> i) & 1:
+                # A room or piece of equipment the selected therapy needs is taken by another
+                # department's session (red), or closed or in turnaround (lightgray)
+                btn.configure(bg="red" if sessions else "lightgray")
             else:
-                # If the slot is not booked at all, make it lightgreen
+                # Free for the selected department, even if other departments have sessions then
                 btn.configure(bg="lightgreen")
+        self.stats.count("widgets_configured", len(starts))
 
-        # Populate the therapist's schedule list based on selected type
+    def update_therapist_list(self):
+        """Points the therapist list at the sorted bookings of the selected department and date range."""
+        selected_type = self.therapist_type.get()
+        self.listed_department = selected_type
+        first, last = date_range_bounds(self.therapist_range.get())
         if selected_type != "Select Department":
-            for slot, info in self.bookings.items():
-                if info['therapy'] == selected_type:
-                    date_str, time_str = slot.split("_")
-                    self.schedule_list.insert(tk.END, f"{date_str} at {time_str}")
+            keys = self.bookings.by_therapy[selected_type]
+            formatter = lambda key: slot_of(key).replace("_", " at ")
         else:
             # When "Select Department" is chosen, show all booked appointments in the list
-            for slot, info in self.bookings.items():
-                date_str, time_str = slot.split("_")
-                self.schedule_list.insert(tk.END, f"{date_str} at {time_str} ({info['therapy']}) - {info['phone']}")
+            keys = self.bookings.sorted_keys
+            formatter = lambda key: f"{slot_of(key).replace('_', ' at ')} ({self.bookings[key]['therapy']}) - {self.bookings[key]['phone']}"
+        self.schedule_list.set_source(lambda: self.bookings.key_range(keys, first, last), formatter)
+
+    def on_booking_changed(self, slot_key):
+        """Keeps both appointment lists, the day's resource bitmaps and its slot colors current."""
+        day_date = date.fromisoformat(slot_key[:10])
+        self.resources.rebuild_day(self.bookings, day_date)
+        if hasattr(self, "therapist_type"):
+            self.recolor_day(day_date)
+        if hasattr(self, "schedule_list"):
+            self.schedule_list.refresh()
+        if hasattr(self, "customer_list"):
+            self.customer_list.refresh()
+
+    def open_stats_window(self):
+        """Live callback timings, widget and memory counts, with stats/cProfile dumps to a file."""
+        top = tk.Toplevel(self)
+        top.title("Scheduler Performance")
+        text = tk.Text(top, width=80, height=25, font=("Courier", 9))
+        text.pack(fill="both", expand=True, padx=5, pady=5)
+
+        def refresh():
+            if not top.winfo_exists():
+                return
+            snap = self.stats.snapshot(self)
+            lines = [f"Widgets: {snap['widgets']}    GC objects: {snap['gc_objects']}"
+                     + (f"    Max RSS: {snap['max_rss_kb'] / 1024:.1f} MB" if "max_rss_kb" in snap else ""), ""]
+            lines.append(f"{'Callback':<22}{'Calls':>7}{'Avg ms':>10}{'Max ms':>10}{'Total ms':>11}")
+            for name, t in sorted(snap["timings"].items(), key=lambda i: -i[1]["total_ms"]):
+                lines.append(f"{name:<22}{t['calls']:>7}{t['avg_ms']:>10.2f}{t['max_ms']:>10.2f}{t['total_ms']:>11.1f}")
+            lines.append("")
+            for name, counters in sorted(snap["counters"].items()):
+                for counter, value in sorted(counters.items()):
+                    lines.append(f"{name} / {counter}: {value}")
+            text.config(state="normal")
+            text.delete(1.0, tk.END)
+            text.insert(tk.END, "\n".join(lines))
+            text.config(state="disabled")
+            top.after(STATS_REFRESH_MS, refresh)
+
+        def dump_stats():
+            path = filedialog.asksaveasfilename(parent=top, defaultextension=".json", filetypes=[["JSON Files", "*.json"]],
+                                                initialfile="scheduler_stats.json")
+            if path:
+                self.stats.dump(path, self)
+                messagebox.showinfo("Saved", f"Stats saved to {path}", parent=top)
+
+        def toggle_profile():
+            if not self.stats.profiling():
+                self.stats.start_profile()
+                profile_btn.config(text="⏹ Stop cProfile & Save")
+                return
+            path = filedialog.asksaveasfilename(parent=top, defaultextension=".prof", filetypes=[["Profile Files", "*.prof"]],
+                                                initialfile="scheduler.prof")
+            if path:
+                self.stats.stop_profile(path)
+                profile_btn.config(text="▶ Start cProfile")
+                messagebox.showinfo("Saved", f"Profile saved to {path}", parent=top)
+
+        btns = tk.Frame(top)
+        btns.pack(pady=5)
+        tk.Button(btns, text="💾 Dump Stats", command=dump_stats).pack(side="left", padx=5)
+        profile_btn = tk.Button(btns, text="⏹ Stop cProfile & Save" if self.stats.profiling() else "▶ Start cProfile",
+                                command=toggle_profile)
+        profile_btn.pack(side="left", padx=5)
+        refresh()
+
+    def utilization_report(self):
+        """The utilization report, rebuilt only when bookings changed since it was last built."""
+        if self.utilization is None or self.utilization_version != self.bookings.version:
+            with self.stats.timed("utilization"):
+                self.utilization = UtilizationReport(self.bookings, CALENDAR.slot_starts, THERAPY_TYPES,
+                                                     self.bookings.cancellations)
+            self.utilization_version = self.bookings.version
+        return self.utilization
+
+    def open_utilization_window(self):
+        """Live heatmap of slot occupancy per weekday and time, with the weekly trend and cancellation/no-show rates."""
+        top = tk.Toplevel(self)
+        top.title("Clinic Utilization")
+        therapy = tk.StringVar(value="All Departments")
+        ttk.Combobox(top, values=["All Departments"] + THERAPY_TYPES, textvariable=therapy,
+                     state="readonly", width=30).pack(pady=5)
+        canvas = tk.Canvas(top, width=900, height=200, bg="white")
+        canvas.pack(padx=5, pady=5)
+        rates_label = tk.Label(top, font=("Arial", 10, "bold"))
+        rates_label.pack()
+        trend = tk.Text(top, width=70, height=12, font=("Courier", 9))
+        trend.pack(fill="both", expand=True, padx=5, pady=5)
+        shown = {}
+
+        def percent(rate):
+            return f"{rate * 100:.1f}%" if rate is not None else "n/a"
+
+        def refresh(event=None):
+            if not top.winfo_exists():
+                return
+            report = self.utilization_report()
+            selected = None if therapy.get() == "All Departments" else therapy.get()
+            if shown.get("key") != (report, selected): # Cached report: only redraw when something changed
+                shown["key"] = (report, selected)
+                canvas.delete("all")
+                cell_w = max(24, min(60, 820 // max(1, len(report.times))))
+                for t, time_str in enumerate(report.times):
+                    canvas.create_text(60 + t * cell_w + cell_w / 2, 10, text=time_str, font=("Arial", 7))
+                for weekday, row in enumerate(report.occupancy(selected)):
+                    y = 20 + weekday * 24
+                    canvas.create_text(30, y + 12, text=WEEKDAY_NAMES[weekday], font=("Arial", 9, "bold"))
+                    for t, (booked, open_slots) in enumerate(row):
+                        x = 60 + t * cell_w
+                        if open_slots:
+                            level = int(255 * (1 - booked / open_slots))
+                            color = f"#ff{level:02x}{level:02x}" # White (empty) to red (full)
+                            label = f"{booked * 100 // open_slots}%"
+                        else:
+                            color, label = "lightgray", ""
+                        canvas.create_rectangle(x, y, x + cell_w, y + 24, fill=color, outline="white")
+                        canvas.create_text(x + cell_w / 2, y + 12, text=label, font=("Arial", 7))
+                cancel_rate, no_show_rate = report.rates(selected)
+                rates_label.config(text=f"Cancellation rate: {percent(cancel_rate)}    No-show rate: {percent(no_show_rate)}")
+                lines = [f"{'Week of':<14}{'Booked':>8}{'Open':>8}{'Occupancy':>12}"]
+                for week_start, booked, open_slots in report.weekly_trend(selected):
+                    lines.append(f"{week_start.strftime('%Y-%m-%d'):<14}{booked:>8}{open_slots:>8}"
+                                 f"{percent(booked / open_slots if open_slots else None):>12}")
+                trend.config(state="normal")
+                trend.delete(1.0, tk.END)
+                trend.insert(tk.END, "\n".join(lines))
+                trend.config(state="disabled")
+            top.after(STATS_REFRESH_MS, refresh)
 
+        therapy.trace_add("write", lambda *args: shown.clear())
+        refresh()
+
+    # ========== Patient Journey ==========
+    def start_journeys(self):
+        """Builds the journey index: bookings right away, invoices from MySQL on a loader thread."""
+        from journey import JourneyIndex # Pulls in MySQL and the invoice app, so only when first needed
+        self.journeys = JourneyIndex(self.bookings)
+        self.journey_queue = queue.Queue()
+        threading.Thread(target=self.journey_load_worker, daemon=True).start()
+        self.after(JOURNEY_POLL_MS, self.poll_journeys)
+
+    def journey_load_worker(self):
+        """Runs on the loader thread; only talks to MySQL and the queue, never to Tk."""
+        from invoice8 import connect_db
+        from journey import load_journey_data
+        try:
+            con = connect_db()
+            try:
+                self.journey_queue.put(("loaded", load_journey_data(con)))
+            finally:
+                con.close()
+        except Exception as e:
+            self.journey_queue.put(("error", e))
+
+    def poll_journeys(self):
+        """Moves the initial load, then invoice changes from the change feed, into the index."""
+        try:
+            kind, payload = self.journey_queue.get_nowait()
+        except queue.Empty:
+            kind = None
+        if kind == "loaded":
+            from change_log import ChangeFeed
+            from invoice8 import connect_db
+            feed_seq, *data = payload
+            self.journeys.load(*data)
+            # Changes logged after the load started are replayed; applying one twice is harmless
+            self.journey_feed = ChangeFeed(connect_db, feed_seq).start()
+        elif kind == "error":
+            print(f"Error loading invoices for patient journeys: {payload}") # Bookings still show
+        if self.journey_feed is not None:
+            for seq, op, invoice_no, data in self.journey_feed.poll():
+                self.journeys.apply_change(op, invoice_no, data)
+        self.after(JOURNEY_POLL_MS, self.poll_journeys)
+
+    @instrumented("journey")
+    def render_journey(self, query, text, summary_label):
+        entries = self.journeys.timeline(query)
+        totals = self.journeys.summary(entries)
+        summary_label.config(text=(
+            f"Upcoming: {totals['booked']}   Attended: {totals['attended']}   No-shows: {totals['no-show']}   "
+            f"Billed sessions: {totals['billed']}   Invoiced: ₹ {totals['invoiced']:,.2f}   "
+            f"Outstanding: ₹ {totals['outstanding']:,.2f}"
+            + ("" if self.journeys.loaded else "   (loading invoices...)")))
+        lines = []
+        for when, kind, details in entries:
+            if kind == "booking":
+                billed = f"billed on #{details['invoice_no']}" if details['invoice_no'] is not None else ""
+                lines.append(f"{when:<20}{'Session':<10}{details['therapy']:<30}{details['status']:<10}{billed}")
+            else:
+                lines.append(f"{when:<20}{'Invoice':<10}{'#' + str(details['invoice_no']) + ' ' + details['service_name']:<30}"
+                             f"{'paid' if details['paid'] else 'unpaid':<10}₹ {details['total']:,.2f} "
+                             f"({details['no_of_sessions']} session(s))")
+        text.config(state="normal")
+        text.delete(1.0, tk.END)
+        text.insert(tk.END, "\n".join(lines) or "No bookings or invoices for this patient.")
+        text.config(state="disabled")
+
+    def open_journey_window(self):
+        """One patient's sessions and invoices on a single timeline, by mobile number or customer ID."""
+        if self.journeys is None:
+            self.start_journeys()
+        top = tk.Toplevel(self)
+        top.title("Patient Journey")
+        search = tk.Frame(top)
+        search.pack(pady=5)
+        tk.Label(search, text="📱 Mobile No. or Customer ID:").pack(side="left", padx=5)
+        query = tk.StringVar(value=self.customer_entry.get().strip())
+        entry = tk.Entry(search, textvariable=query)
+        entry.pack(side="left", padx=5)
+        summary_label = tk.Label(top, font=("Arial", 10, "bold"))
+        summary_label.pack()
+        text = tk.Text(top, width=110, height=25, font=("Courier", 9))
+        text.pack(fill="both", expand=True, padx=5, pady=5)
+        shown = {}
+
+        def draw(event=None):
+            key = (query.get().strip(), self.journeys.version)
+            if key[0] and shown.get("key") != key: # Only redraw when the patient or the index changed
+                shown["key"] = key
+                self.render_journey(key[0], text, summary_label)
+
+        def refresh():
+            if not top.winfo_exists():
+                return
+            draw()
+            top.after(STATS_REFRESH_MS, refresh)
+
+        tk.Button(search, text="Show", command=draw).pack(side="left", padx=5)
+        entry.bind("<Return>", draw)
+        refresh()
 
     def render_customer_view(self):
         frame = tk.Frame(self.main_frame, relief="ridge", bd=2)
@@ -222,32 +970,45 @@ class SchedulerApp(tk.Tk):
         btn_clear = tk.Button(btn_frame, text="Clear My Slots", command=self.clear_customer_display)
         btn_clear.pack(side="left", padx=5)
 
-        self.customer_list = tk.Listbox(frame, height=5, width=100)
-        self.customer_list.pack(pady=5)
+        btn_series = tk.Button(btn_frame, text="📅 Book Series", command=self.open_series_booking)
+        btn_series.pack(side="left", padx=5)
 
-        scroll = tk.Scrollbar(frame, orient="vertical", command=self.customer_list.yview)
-        scroll.pack(side="right", fill="y")
-        self.customer_list.config(yscrollcommand=scroll.set)
+        btn_waitlist = tk.Button(btn_frame, text="⏳ Waitlist", command=self.open_waitlist)
+        btn_waitlist.pack(side="left", padx=5)
+
+        btn_journey = tk.Button(btn_frame, text="🧭 Journey", command=self.open_journey_window)
+        btn_journey.pack(side="left", padx=5)
+
+        self.customer_range = tk.StringVar(value="All")
+        range_dropdown = ttk.Combobox(btn_frame, values=DATE_RANGES, textvariable=self.customer_range, state="readonly", width=12)
+        range_dropdown.pack(side="left", padx=5)
+        range_dropdown.bind("<<ComboboxSelected>>", lambda e: self.show_customer_slots())
+
+        self.customer_list = VirtualList(frame, width=100, height=5)
+        self.customer_list.pack(pady=5)
 
         self.yellow_note = tk.Label(frame, text="🔹 Yellow color indicates your booked slots.", font=("Arial", 9, "italic"), fg="darkgoldenrod")
         self.yellow_note.pack(pady=2)
 
+    @instrumented("show_customer_slots")
     def show_customer_slots(self):
         phone = self.customer_entry.get()
-        self.customer_list.delete(0, tk.END)
         
         # Update therapist schedule to apply yellow highlights for the entered phone number
         self.update_therapist_schedule()
+        self.list_customer_slots(phone)
 
-        # Populate customer's listbox
-        for slot, info in self.bookings.items():
-            if info['phone'] == phone:
-                self.customer_list.insert(tk.END, f"{slot.replace('_', ' at ')} | {info['therapy']}")
+    def list_customer_slots(self, phone):
+        # Point the customer's list at their sorted bookings
+        keys = self.bookings.by_phone[phone]
+        first, last = date_range_bounds(self.customer_range.get())
+        self.customer_list.set_source(lambda: self.bookings.key_range(keys, first, last),
+                                      lambda key: f"{slot_of(key).replace('_', ' at ')} | {self.bookings[key]['therapy']}")
 
     def clear_customer_display(self):
         """Clears the customer mobile number entry and list, and resets slot colors."""
         self.customer_entry.delete(0, tk.END)
-        self.customer_list.delete(0, tk.END)
+        self.customer_list.clear()
         # Call update_therapist_schedule to re-evaluate all colors based on the now empty customer phone
         self.update_therapist_schedule()
         messagebox.showinfo("Cleared", "Customer view cleared and yellow highlights reset.")
@@ -256,7 +1017,7 @@ class SchedulerApp(tk.Tk):
         # This function is called after a booking/cancellation.
         # If the customer_entry matches the phone of the action, refresh their view.
         if self.customer_entry.get() == phone:
-            self.show_customer_slots()
+            self.list_customer_slots(phone) # Their slots were recolored with the day
         else:
             # If the phone in customer_entry doesn't match the action,
             # we should still ensure the general color scheme is updated.
@@ -264,6 +1025,7 @@ class SchedulerApp(tk.Tk):
             pass
 
 
+    @instrumented("export_csv")
     def export_csv(self):
         selected_type = self.therapist_type.get()
         filepath = filedialog.asksaveasfilename(defaultextension=".csv", filetypes=[["CSV Files", "*.csv"]])
@@ -272,7 +1034,7 @@ class SchedulerApp(tk.Tk):
 
         with open(filepath, mode='w', newline='') as file:
             writer = csv.writer(file)
-            writer.writerow(["Date", "Time", "Therapy Type", "Customer Mobile"])
+            writer.writerow(["Date", "Time", "Therapy Type", "Customer Mobile", "No-Show"])
             
             # Export all bookings if "Select Department" is chosen, otherwise filter by selected type
             bookings_to_export = []
@@ -281,12 +1043,15 @@ class SchedulerApp(tk.Tk):
             else:
                 bookings_to_export = [(s, i) for s, i in self.bookings.items() if i['therapy'] == selected_type]
 
-            for slot, info in bookings_to_export:
-                date_str, time_str = slot.split("_")
-                writer.writerow([date_str, time_str, info['therapy'], info['phone']])
+            for key, info in bookings_to_export:
+                date_str, time_str = slot_of(key).split("_")
+                writer.writerow([date_str, time_str, info['therapy'], info['phone'], "yes" if info.get('no_show') else ""])
 
         messagebox.showinfo("Exported", f"Schedule exported to {filepath}")
 
 if __name__ == "__main__":
+    threshold_ms = watchdog_threshold(sys.argv[1:])
+    if threshold_ms is not None:
+        EventLoopWatchdog(threshold_ms).install() # python sch10.py --watchdog[=MS]
     app = SchedulerApp()
     app.mainloop()
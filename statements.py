@@ -0,0 +1,195 @@
+"""
+Customer statements: every invoice of one customer in a paginated PDF.
+
+  python statements.py <c_id> <output.pdf>
+
+Invoices are streamed from MySQL through a server-side cursor and drawn straight
+onto the page canvas, one row at a time, with running totals carried from page
+to page. Nothing is collected per invoice, so memory stays flat however long the
+statement gets.
+"""
+import datetime
+import functools
+import sys
+
+import pymysql
+
+from customers import CUSTOMERS_TABLE
+from invoice8 import PAYMENTS_TABLE, TABLE_NAME, connect_db, format_datetime
+
+ROW_HEIGHT = 14
+FETCH_ROWS = 500 # Rows pulled from the server-side cursor per round trip
+
+
+@functools.lru_cache(maxsize=None)
+def statement_style():
+    """Fonts, page geometry and column layout; built once per process on first use."""
+    from reportlab.lib.pagesizes import A4
+    width, height = A4
+    margin = 36
+    return {
+        "page_size": A4,
+        "width": width,
+        "height": height,
+        "margin": margin,
+        "font": ("Helvetica", 8),
+        "bold": ("Helvetica-Bold", 8),
+        "title": ("Helvetica-Bold", 18),
+        "heading": ("Helvetica-Bold", 11),
+        # (heading, x, alignment); right-aligned columns are anchored at their right edge
+        "columns": [
+            ("Invoice No", margin, "left"),
+            ("Date", margin + 54, "left"),
+            ("Due", margin + 114, "left"),
+            ("Service", margin + 174, "left"),
+            ("Sessions", margin + 334, "right"),
+            ("Amount", margin + 394, "right"),
+            ("Status", margin + 404, "left"),
+            ("Balance", width - margin, "right"),
+        ],
+        "service_chars": 30,
+    }
+
+
+def fetch_customer(con, c_id):
+    """(c_name_first, c_name_last, customer_mobile_number) or None."""
+    cur = con.cursor()
+    cur.execute(
+        f"SELECT c_name_first, c_name_last, customer_mobile_number FROM {CUSTOMERS_TABLE} WHERE c_id = %s", (c_id,)
+    )
+    return cur.fetchone()
+
+
+def stream_invoices(con, c_id):
+    """Yields (invoice_no, date_time, due_date_time, service_name, no_of_sessions, total, paid), oldest first."""
+    cur = con.cursor(pymysql.cursors.SSCursor) # Unbuffered: rows are drawn as they arrive
+    cur.execute(f"""
+    SELECT i.invoice_no, i.date_time, i.due_date_time, i.service_name, i.no_of_sessions, i.total,
+           p.invoice_no IS NOT NULL
+    FROM {TABLE_NAME} i LEFT JOIN {PAYMENTS_TABLE} p ON p.invoice_no = i.invoice_no
+    WHERE i.c_id = %s ORDER BY i.date_time, i.invoice_no
+    """, (c_id,))
+    try:
+        while True:
+            chunk = cur.fetchmany(FETCH_ROWS)
+            if not chunk:
+                return
+            yield from chunk
+    finally:
+        cur.close()
+
+
+class StatementWriter:
+    """Draws statement rows onto a ReportLab canvas, starting new pages as they fill up."""
+
+    def __init__(self, file_path, c_id, customer):
+        from reportlab.pdfgen import canvas
+        self.style = statement_style()
+        self.canvas = canvas.Canvas(file_path, pagesize=self.style["page_size"])
+        self.c_id = c_id
+        self.customer = customer
+        self.page = 0
+        self.y = 0
+        self.invoiced = 0.0 # Running totals, carried across pages
+        self.outstanding = 0.0
+        self.count = 0
+        self.start_page()
+
+    def text(self, x, text, font, align="left"):
+        self.canvas.setFont(*font)
+        if align == "right":
+            self.canvas.drawRightString(x, self.y, text)
+        else:
+            self.canvas.drawString(x, self.y, text)
+
+    def start_page(self):
+        style = self.style
+        self.page += 1
+        self.y = style["height"] - style["margin"]
+        if self.page == 1:
+            self.y -= 18
+            self.canvas.setFont(*style["title"])
+            self.canvas.drawCentredString(style["width"] / 2, self.y, "Sree Rehabilitation Center")
+            self.y -= 28
+            self.text(style["margin"], "Customer Statement", style["heading"])
+            self.y -= 18
+            first, last, mobile = self.customer or ("", "", "")
+            name = f"{first} {last or ''}".strip()
+            self.text(style["margin"], f"Customer ID: {self.c_id}    Name: {name}    Mobile No.: {mobile or 'N/A'}",
+                      style["font"])
+            self.y -= ROW_HEIGHT
+            self.text(style["margin"], f"Statement date: {format_datetime(datetime.datetime.now())}", style["font"])
+            self.y -= 2 * ROW_HEIGHT
+        else:
+            self.text(style["margin"], f"Customer {self.c_id} - statement continued", style["bold"])
+            self.y -= ROW_HEIGHT
+            self.text(style["margin"], "Brought forward", style["font"])
+            self.text(style["width"] - style["margin"], f"{self.outstanding:,.2f}", style["font"], "right")
+            self.y -= ROW_HEIGHT
+        for heading, x, align in style["columns"]:
+            self.text(x, heading, style["bold"], align)
+        self.y -= 4
+        self.canvas.line(style["margin"], self.y, style["width"] - style["margin"], self.y)
+        self.y -= ROW_HEIGHT
+
+    def end_page(self, last=False):
+        style = self.style
+        if not last:
+            self.text(style["margin"], "Carried forward", style["font"])
+            self.text(style["width"] - style["margin"], f"{self.outstanding:,.2f}", style["font"], "right")
+        self.canvas.setFont(*style["font"])
+        self.canvas.drawCentredString(style["width"] / 2, style["margin"] / 2, f"Page {self.page}")
+        self.canvas.showPage()
+
+    def add(self, invoice_no, date_time, due_date_time, service_name, no_of_sessions, total, paid):
+        style = self.style
+        if self.y < style["margin"] + 2 * ROW_HEIGHT: # Keep room for the carried-forward line
+            self.end_page()
+            self.start_page()
+        total = float(total)
+        self.count += 1
+        self.invoiced += total
+        if not paid:
+            self.outstanding += total
+        values = [
+            str(invoice_no), format_datetime(date_time)[:10], format_datetime(due_date_time)[:10],
+            str(service_name)[:style["service_chars"]], str(no_of_sessions), f"{total:,.2f}",
+            "Paid" if paid else "Unpaid", f"{self.outstanding:,.2f}"
+        ]
+        for value, (_, x, align) in zip(values, style["columns"]):
+            self.text(x, value, style["font"], align)
+        self.y -= ROW_HEIGHT
+
+    def finish(self):
+        """Writes the summary and the file; returns (invoice_count, invoiced, outstanding)."""
+        style = self.style
+        if self.y < style["margin"] + 5 * ROW_HEIGHT:
+            self.end_page()
+            self.start_page()
+        self.y -= ROW_HEIGHT
+        for label, amount in (("Total invoiced", self.invoiced), ("Paid", self.invoiced - self.outstanding),
+                              ("Outstanding", self.outstanding)):
+            self.text(style["width"] - style["margin"] - 120, label, style["bold"])
+            self.text(style["width"] - style["margin"], f"{amount:,.2f}", style["bold"], "right")
+            self.y -= ROW_HEIGHT
+        self.end_page(last=True)
+        self.canvas.save()
+        return self.count, self.invoiced, self.outstanding
+
+
+def write_statement(con, c_id, file_path):
+    """Writes the statement PDF of one customer; returns (invoice_count, invoiced, outstanding)."""
+    writer = StatementWriter(file_path, c_id, fetch_customer(con, c_id))
+    for invoice in stream_invoices(con, c_id):
+        writer.add(*invoice)
+    return writer.finish()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print(__doc__)
+        sys.exit(1)
+    con = connect_db()
+    count, invoiced, outstanding = write_statement(con, int(sys.argv[1]), sys.argv[2])
+    con.close()
+    print(f"{count} invoice(s), {invoiced:,.2f} invoiced, {outstanding:,.2f} outstanding -> {sys.argv[2]}")
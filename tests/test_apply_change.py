@@ -0,0 +1,111 @@
+from customer_index import CustomerIndex
+from due_scanner import DueScanner
+from invoice8 import InvoiceApp
+
+
+class FakeTree:
+    def __init__(self):
+        self.items = {} # iid -> options
+
+    def exists(self, item):
+        return item in self.items
+
+    def item(self, item, option=None, **options):
+        if option is not None:
+            return self.items[item].get(option, ())
+        self.items[item].update(options)
+
+    def insert(self, parent, index, iid, **options):
+        self.items[iid] = options
+
+    def delete(self, item):
+        del self.items[item]
+
+
+class FakeCustomers:
+    def __init__(self):
+        self.cache = {}
+
+    def put(self, c_id, customer):
+        self.cache[c_id] = customer
+
+
+class Feed:
+    """The change-feed half of InvoiceApp, without the window or MySQL."""
+    apply_change = InvoiceApp.apply_change
+    apply_customer = InvoiceApp.apply_customer
+    track_due = InvoiceApp.track_due
+    edit_index = InvoiceApp.edit_index
+    remember_undo = InvoiceApp.remember_undo
+    undo_write = InvoiceApp.undo_write
+
+    def __init__(self, showing_all):
+        self.tree = FakeTree()
+        self.rows = {}
+        self.showing_all = showing_all
+        self.customers = FakeCustomers()
+        self.archived_invoice_nos = set()
+        self.customer_index = CustomerIndex()
+        self.customer_index.build([(1, 7, "Asha", "Rao", "98480")])
+        self.due_scanner = DueScanner()
+        self.due_scanner.upsert(1, "2024-01-10 10:00:00", 7, 100.0)
+        self.load_edits = {}
+        self.undo = {}
+
+    def update_due_status(self):
+        pass
+
+
+def invoice(invoice_no, c_id, first, last, mobile):
+    return {"invoice_no": invoice_no, "date_time": "2024-01-01 10:00:00", "due_date_time": "2024-01-10 10:00:00",
+            "c_id": c_id, "c_name_first": first, "c_name_last": last, "service_name": "SPEECH",
+            "no_of_sessions": 1, "per_session": 100.0, "total": 100.0, "customer_mobile_number": mobile}
+
+
+def test_changes_to_invoices_not_loaded_reach_the_indexes():
+    feed = Feed(showing_all=False) # A filtered view that does not show invoice 1
+
+    feed.apply_change("update", 1, invoice(1, 8, "Ravi", "Kumar", "99000"))
+
+    assert feed.customer_index.invoice_counts == {8: 1}
+    assert feed.customer_index.search("ravi")[0][0] == 8
+    assert feed.due_scanner.invoices[1][1] == 8
+    assert feed.rows == {} and feed.tree.items == {}
+
+    feed.apply_change("archive", 1, None)
+
+    assert feed.customer_index.invoice_counts == {}
+    assert feed.due_scanner.invoices == {}
+
+
+def test_replayed_insert_is_counted_once():
+    feed = Feed(showing_all=True) # The index copy already has invoice 1; the feed replays its insert
+
+    feed.apply_change("insert", 1, invoice(1, 7, "Asha", "Rao", "98480"))
+    feed.apply_change("insert", 2, invoice(2, 7, "Asha", "Rao", "98480"))
+
+    assert feed.customer_index.invoice_counts == {7: 2}
+    assert sorted(feed.rows) == [1, 2] and "2" in feed.tree.items
+
+    feed.apply_change("delete", 1, None)
+
+    assert feed.customer_index.invoice_counts == {7: 1}
+    assert sorted(feed.rows) == [2]
+
+
+def test_rejected_writes_put_the_index_entries_back():
+    feed = Feed(showing_all=True)
+    before = (dict(feed.customer_index.invoices), dict(feed.customer_index.customers), dict(feed.due_scanner.invoices))
+
+    feed.remember_undo("m1", 1) # An update moving invoice 1 to another customer, later rejected
+    feed.customer_index.add_invoice(1, 8, "Ravi", "Kumar", "99000")
+    feed.due_scanner.upsert(1, "2024-02-01 10:00:00", 8, 150.0)
+    feed.remember_undo("m2", 2) # An insert, later rejected
+    feed.customer_index.add_invoice(2, 9, "Gita", "Menon", "90000")
+    feed.due_scanner.upsert(2, "2024-02-01 10:00:00", 9, 100.0)
+    feed.undo_write(*feed.undo.pop("m2"))
+    feed.undo_write(*feed.undo.pop("m1"))
+
+    assert (feed.customer_index.invoices, feed.due_scanner.invoices) == (before[0], before[2])
+    assert {c_id: feed.customer_index.customers[c_id] for c_id in before[1]} == before[1]
+    assert 8 not in feed.customer_index.customers and 9 not in feed.customer_index.customers
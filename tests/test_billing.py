@@ -0,0 +1,85 @@
+import csv
+import datetime
+
+from billing import billable_groups, booking_key, completed_bookings, group_sessions, load_bookings_csv
+
+NOW = datetime.datetime(2024, 3, 6, 12, 0)
+MARCH = (datetime.date(2024, 3, 1), datetime.date(2024, 3, 31))
+
+
+def test_completed_bookings_skips_no_shows():
+    bookings = {
+        "2024-03-04_10:00": {'phone': "9848012345", 'therapy': "SPEECH AND LANGUAGE THERAPY"},
+        "2024-03-04_11:00": {'phone': "9848012345", 'therapy': "SPEECH AND LANGUAGE THERAPY", 'no_show': True},
+        "2024-03-05_10:00": {'phone': "9848012345", 'therapy': "SPEECH AND LANGUAGE THERAPY", 'no_show': False},
+    }
+    assert [slot_key for slot_key, _ in completed_bookings(bookings, *MARCH, NOW)] == [
+        "2024-03-04_10:00", "2024-03-05_10:00"]
+
+
+def test_completed_bookings_only_finished_sessions_in_period():
+    bookings = {
+        "2024-02-28_10:00": {'phone': "1", 'therapy': "PHYSICAL THERAPY"}, # Before the period
+        "2024-03-06_11:59": {'phone': "1", 'therapy': "PHYSICAL THERAPY"}, # Still running
+        "2024-03-07_10:00": {'phone': "1", 'therapy': "PHYSICAL THERAPY"}, # In the future
+        "2024-03-01_09:00": {'phone': "1", 'therapy': "PHYSICAL THERAPY"},
+    }
+    assert [slot_key for slot_key, _ in completed_bookings(bookings, *MARCH, NOW)] == ["2024-03-01_09:00"]
+
+
+def test_group_sessions_by_phone_and_therapy():
+    speech = {'phone': "1", 'therapy': "SPEECH AND LANGUAGE THERAPY"}
+    physio = {'phone': "1", 'therapy': "PHYSICAL THERAPY"}
+    groups = group_sessions([("2024-03-01_09:00", speech), ("2024-03-02_09:00", speech), ("2024-03-02_10:00", physio)])
+    assert groups == {
+        ("1", "SPEECH AND LANGUAGE THERAPY"): [booking_key("2024-03-01_09:00", speech), booking_key("2024-03-02_09:00", speech)],
+        ("1", "PHYSICAL THERAPY"): [booking_key("2024-03-02_10:00", physio)],
+    }
+
+
+def test_load_bookings_csv_reads_no_show_column(tmp_path):
+    path = tmp_path / "schedule.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Time", "Therapy Type", "Customer Mobile", "No-Show"])
+        writer.writerow(["2024-03-04", "10:00", "PHYSICAL THERAPY", "9848012345", ""])
+        writer.writerow(["2024-03-04", "11:00", "PHYSICAL THERAPY", "9848012345", "yes"])
+
+    bookings = load_bookings_csv(path)
+
+    assert not bookings["2024-03-04_10:00@PHYSICAL THERAPY"].get('no_show')
+    assert bookings["2024-03-04_11:00@PHYSICAL THERAPY"]['no_show'] is True
+    assert [slot_key for slot_key, _ in completed_bookings(bookings, *MARCH, NOW)] == ["2024-03-04_10:00"]
+
+
+def test_load_bookings_csv_without_no_show_column(tmp_path):
+    path = tmp_path / "schedule.csv"
+    path.write_text("Date,Time,Therapy Type,Customer Mobile\n2024-03-04,10:00,PHYSICAL THERAPY,9848012345\n")
+    assert load_bookings_csv(path) == {
+        "2024-03-04_10:00@PHYSICAL THERAPY": {'phone': "9848012345", 'therapy': "PHYSICAL THERAPY"}}
+
+
+def test_load_bookings_csv_keeps_concurrent_sessions(tmp_path):
+    path = tmp_path / "schedule.csv"
+    path.write_text("Date,Time,Therapy Type,Customer Mobile\n"
+                    "2024-03-04,10:00,PHYSICAL THERAPY,9848012345\n"
+                    "2024-03-04,10:00,AQUATIC THERAPY,9000000001\n")
+    sessions = list(completed_bookings(load_bookings_csv(path), *MARCH, NOW))
+    assert sorted(info['therapy'] for _, info in sessions) == ["AQUATIC THERAPY", "PHYSICAL THERAPY"]
+    assert {slot_key for slot_key, _ in sessions} == {"2024-03-04_10:00"}
+
+
+def test_billable_groups_skips_billed_unknown_and_unpriced():
+    speech = {'phone': "1", 'therapy': "SPEECH AND LANGUAGE THERAPY"}
+    music = {'phone': "1", 'therapy': "MUSIC THERAPY"}
+    stranger = {'phone': "2", 'therapy': "PHYSICAL THERAPY"}
+    groups = group_sessions([("2024-03-01_09:00", speech), ("2024-03-02_09:00", speech),
+                             ("2024-03-02_10:00", music), ("2024-03-03_10:00", stranger)])
+    billed = {booking_key("2024-03-01_09:00", speech)}
+    customers = {"1": (7, "Asha", "Rao")}
+
+    pending, unknown_phones, unpriced = billable_groups(groups, billed, customers)
+
+    assert pending == [("1", "SPEECH AND LANGUAGE THERAPY", [booking_key("2024-03-02_09:00", speech)])]
+    assert unknown_phones == ["2"]
+    assert unpriced == [("1", "MUSIC THERAPY")]
@@ -0,0 +1,73 @@
+import json
+
+import change_log
+from change_log import ChangeFeed
+
+
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+
+    def execute(self, sql, params):
+        self.after_seq, self.limit = params
+
+    def fetchall(self):
+        rows = sorted(row for row in self.log if row[0] > self.after_seq)
+        return rows[:self.limit]
+
+
+class FakeConnection:
+    """The committed part of the change log: (seq, op, invoice_no, row_json) rows."""
+
+    def __init__(self):
+        self.log = []
+
+    def autocommit(self, value):
+        pass
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+    def commit_change(self, seq, invoice_no=1, row=None):
+        self.log.append((seq, "update", invoice_no, json.dumps(row) if row is not None else None))
+
+
+def feed(con, after_seq=0):
+    return ChangeFeed(lambda: con, after_seq)
+
+
+def seqs(changes):
+    return [seq for seq, *_ in changes]
+
+
+def test_later_commit_of_a_lower_seq_is_not_skipped():
+    con = FakeConnection()
+    tail = feed(con)
+    for seq in (1, 2, 4): # 3 is still in flight
+        con.commit_change(seq)
+    assert seqs(tail.read()) == [1, 2]
+    assert seqs(tail.read()) == [] # Still waiting for 3
+
+    con.commit_change(3, row={'total': 10})
+    changes = tail.read()
+    assert seqs(changes) == [3, 4]
+    assert changes[0] == (3, "update", 1, {'total': 10})
+
+
+def test_gap_left_by_a_rolled_back_write_is_passed_after_the_timeout(monkeypatch):
+    con = FakeConnection()
+    tail = feed(con, after_seq=5)
+    con.commit_change(7) # 6 was rolled back and never shows up
+    assert tail.read() == []
+    assert tail.gap_since is not None
+
+    monkeypatch.setattr(change_log, "GAP_TIMEOUT", 0)
+    assert seqs(tail.read()) == [7]
+    assert tail.gap_since is None and tail.last_seq == 7
+
+
+def test_reads_resume_after_the_starting_seq():
+    con = FakeConnection()
+    for seq in (1, 2, 3):
+        con.commit_change(seq)
+    assert seqs(feed(con, after_seq=2).read()) == [3]
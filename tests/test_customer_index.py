@@ -0,0 +1,93 @@
+import pytest
+
+import customer_index
+from customer_index import CustomerIndex, TokenList
+
+CUSTOMERS = [
+    (1, "Ravi", "Kumar", "9848012345"),
+    (2, "Ravi", "Das", "9123456789"),
+    (3, "Rani", "Kumar", "9812345678"),
+    (4, "Ramesh", "Rao", "8848012345"),
+    (5, "Sita", "Rao", "9848099999"),
+]
+
+
+@pytest.fixture
+def index():
+    index = CustomerIndex()
+    index.build((customer[0], *customer) for customer in CUSTOMERS) # One invoice per customer, numbered alike
+    return index
+
+
+def c_ids(results):
+    return [result[0] for result in results]
+
+
+def test_exact_name_ranks_first(index):
+    assert c_ids(index.search("ravi kumar"))[0] == 1
+    assert c_ids(index.search("sita rao"))[0] == 5
+
+
+def test_typo_still_matches(index):
+    assert set(c_ids(index.search("kumr"))[:2]) == {1, 3}
+
+
+def test_short_words_match_prefixes_in_token_order(index):
+    assert c_ids(index.search("98")) == [3, 1, 5]
+    assert c_ids(index.search("r")) == [4, 3, 5, 1, 2] # 'ramesh', 'rani', 'rao', 'rao', 'ravi', 'ravi'
+    assert index.search("zz") == []
+
+
+def test_short_words_must_match_alongside_long_ones(index):
+    results = c_ids(index.search("ravi 98"))
+    assert results[0] == 1 and 2 not in results # Ravi Das' mobile starts with 91
+    assert c_ids(index.search("ra 98")) == [3, 1, 5] # Both short: every customer with both prefixes
+
+
+def test_common_trigrams_are_capped_without_losing_exact_matches(monkeypatch):
+    monkeypatch.setattr(customer_index, "MAX_POSTINGS", 3)
+    monkeypatch.setattr(customer_index, "COMMON_SAMPLE", 1)
+    index = CustomerIndex()
+    index.build([(c_id, c_id, "Ravi", f"Name{c_id}", None) for c_id in range(100, 140)] + [(7, 7, "Ravi", "Kumar", None)])
+
+    assert c_ids(index.search("ravi kumar"))[0] == 7
+
+
+def test_incremental_updates_match_a_fresh_build(index):
+    index.add_invoice(6, 6, "Gita", "Menon", "9000000000")
+    index.add_invoice(2, 2, "Ravi", "Dass", "9123456789")
+    index.add_invoice(10, 3, "Rani", "Kumar", "9812345678") # Second invoice of the same customer
+    index.remove_invoice(3)
+    index.remove_invoice(4)
+
+    fresh = CustomerIndex()
+    fresh.build([(c_id, c_id, *customer) for c_id, customer in index.customers.items()])
+    assert list(index.tokens) == list(fresh.tokens)
+    assert c_ids(index.search("dass")) == [2]
+    assert 4 not in c_ids(index.search("ramesh"))
+    assert c_ids(index.search("ra")) == [3, 5, 1, 2] # Customer 3 still has an invoice
+
+
+def test_token_list_stays_sorted_across_chunks(monkeypatch):
+    monkeypatch.setattr(customer_index, "CHUNK_SIZE", 2)
+    tokens = TokenList([("rao", 5), ("ravi", 1)])
+    for pair in [("rani", 3), ("das", 2), ("ramesh", 4), ("ravi", 2), ("sita", 5), ("kumar", 1)]:
+        tokens.add(pair)
+    tokens.remove(("ramesh", 4))
+    tokens.remove(("das", 2))
+
+    assert list(tokens) == [("kumar", 1), ("rani", 3), ("rao", 5), ("ravi", 1), ("ravi", 2), ("sita", 5)]
+    assert all(len(chunk) <= 4 for chunk in tokens.chunks)
+    assert list(tokens.irange("ra", "ra\U0010ffff")) == [3, 5, 1, 2]
+    assert tokens.count("ra", "ra\U0010ffff") == 4
+    assert tokens.count("x", "x\U0010ffff") == 0
+
+
+def test_replayed_invoices_are_counted_once(index):
+    index.add_invoice(1, 1, "Ravi", "Kumar", "9848012345") # The change feed replays an insert the build had
+    index.add_invoice(2, 5, "Sita", "Rao", "9848099999") # Moved to another customer
+    index.remove_invoice(2)
+    index.remove_invoice(99) # Never indexed
+
+    assert index.invoice_counts == {1: 1, 3: 1, 4: 1, 5: 1}
+    assert 2 not in index.customers
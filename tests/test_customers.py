@@ -0,0 +1,82 @@
+import pytest
+
+from customers import MigrationError, migrate_customers
+
+
+class FakeCursor:
+    """Answers the migration's queries from a few numbers and logs every statement."""
+
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def execute(self, sql, params=()):
+        self.db.log.append(" ".join(sql.split()))
+        if "information_schema.COLUMNS" in sql:
+            self.result = [("invoice_no",), ("c_id",), ("c_name_first",)]
+        elif "information_schema.PARTITIONS" in sql:
+            self.result = []
+        elif "COUNT(DISTINCT i.c_id)" in sql:
+            self.result = [(self.db.invoiced, self.db.copied)]
+        elif "_customer_backup), (SELECT COUNT(*)" in sql:
+            self.result = [(self.db.invoices, self.db.invoices)]
+        elif "HAVING COUNT(DISTINCT" in sql:
+            self.result = [(c_id,) for c_id in self.db.conflicts]
+        elif "SELECT COUNT(*) FROM customers" in sql:
+            self.result = [(self.db.copied,)]
+        else:
+            self.result = []
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeDatabase:
+    def __init__(self, invoiced=3, copied=3, conflicts=()):
+        self.invoices = 10
+        self.invoiced = invoiced
+        self.copied = copied
+        self.conflicts = list(conflicts)
+        self.log = []
+        self.rolled_back = False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def altered(self):
+        return any(sql.startswith("ALTER TABLE") for sql in self.log)
+
+
+def test_columns_are_dropped_after_backup_and_checks():
+    db = FakeDatabase()
+    assert migrate_customers(db, "invoice3") == 3
+    backup = next(i for i, sql in enumerate(db.log) if sql.startswith("CREATE TABLE invoice3_customer_backup"))
+    alter = next(i for i, sql in enumerate(db.log) if sql.startswith("ALTER TABLE"))
+    assert backup < alter
+    assert "DROP COLUMN c_name_first" in db.log[alter]
+
+
+def test_incomplete_copy_drops_nothing():
+    db = FakeDatabase(invoiced=3, copied=2)
+    with pytest.raises(MigrationError, match="Only 2 of 3"):
+        migrate_customers(db, "invoice3")
+    assert db.rolled_back and not db.altered()
+
+
+def test_conflicting_invoices_need_latest_wins():
+    db = FakeDatabase(conflicts=[4, 9])
+    with pytest.raises(MigrationError, match="c_id 4, 9"):
+        migrate_customers(db, "invoice3")
+    assert not db.altered()
+
+    assert migrate_customers(db, "invoice3", latest_wins=True) == 3
+    assert db.altered()
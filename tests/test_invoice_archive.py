@@ -0,0 +1,47 @@
+import pytest
+
+from invoice8 import INVOICE_COLUMNS
+from invoice_archive import (InvoiceArchive, merge_archive_rows, partition_bounds, partition_end, read_archive_file,
+                             write_archive_file)
+
+
+def invoice(invoice_no, c_id=7, total=100.0):
+    values = {"invoice_no": invoice_no, "date_time": "2023-02-01 10:00:00", "due_date_time": None, "c_id": c_id,
+              "c_name_first": "Ravi", "c_name_last": "Rao", "service_name": "Speech Therapy", "no_of_sessions": 1,
+              "per_session": total, "total": total, "customer_mobile_number": "9848012345"}
+    return tuple(values[col] for col in INVOICE_COLUMNS)
+
+
+def empty():
+    return {col: [] for col in INVOICE_COLUMNS}
+
+
+def test_merge_orders_rows_by_invoice_no():
+    data = merge_archive_rows(empty(), [invoice(3), invoice(1), invoice(2)])
+    assert data["invoice_no"] == [1, 2, 3]
+    assert set(data) == set(INVOICE_COLUMNS)
+
+
+def test_merge_replaces_rows_already_archived():
+    data = merge_archive_rows(empty(), [invoice(1), invoice(2, total=50.0)])
+    data = merge_archive_rows(data, [invoice(2, total=60.0), invoice(3)]) # Rerun after an interrupted archive
+    assert data["invoice_no"] == [1, 2, 3]
+    assert data["total"] == [100.0, 60.0, 100.0]
+
+
+def test_rerun_does_not_double_count_totals(tmp_path):
+    path = str(tmp_path / "invoice3_p2023q1.json.gz")
+    rows = [invoice(1), invoice(2), invoice(3, c_id=8)]
+    for _ in range(2):
+        existing = read_archive_file(path) if (tmp_path / "invoice3_p2023q1.json.gz").exists() else empty()
+        write_archive_file(path, merge_archive_rows(existing, rows))
+
+    archive = InvoiceArchive(str(tmp_path))
+    assert archive.sum_total(7) == pytest.approx(200.0)
+    assert [row[0] for row in archive.search(c_id=7)] == [2, 1]
+
+
+def test_partition_bounds_and_ends_agree():
+    for name, end in partition_bounds(2023, 2024) + partition_bounds(2023, 2024, "year"):
+        assert partition_end(name) == end
+    assert partition_end("p_future") is None
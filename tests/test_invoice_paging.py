@@ -0,0 +1,122 @@
+import sqlite3
+
+import pytest
+
+import invoice8
+from invoice8 import INVOICE_TABLE_COLUMNS, TABLE_NAME, InvoiceApp
+from query_cache import QueryBuilder
+
+
+class SQLiteReader:
+    """Runs compiled queries against SQLite, as the local replica does."""
+
+    def __init__(self, rows):
+        self.con = sqlite3.connect(":memory:")
+        self.con.execute(f"CREATE TABLE {TABLE_NAME} ({', '.join(INVOICE_TABLE_COLUMNS)})")
+        self.con.executemany(f"INSERT INTO {TABLE_NAME} VALUES ({', '.join(['?'] * len(INVOICE_TABLE_COLUMNS))})", rows)
+
+    def execute(self, query, params=()):
+        return self.con.execute(query.sql, tuple(params)).fetchall()
+
+
+class Pager:
+    """The paging half of InvoiceApp, without the window."""
+    fetch_page = InvoiceApp.fetch_page
+    order_key = InvoiceApp.order_key
+
+    def __init__(self, rows, sort):
+        self.queries = QueryBuilder()
+        self.reader = SQLiteReader(rows)
+        self.sort = sort
+        self.page_request = (None, None, {})
+
+    def all_pages(self):
+        position = INVOICE_TABLE_COLUMNS.index(self.sort[0])
+        pages = [self.fetch_page()]
+        while len(pages[-1]) == invoice8.PAGE_ROWS:
+            last = pages[-1][-1]
+            pages.append(self.fetch_page((last[position], last[0])))
+        return pages
+
+
+def invoice(invoice_no, service_name):
+    values = {"invoice_no": invoice_no, "date_time": f"2024-01-{invoice_no:02d} 10:00:00", "due_date_time": None,
+              "c_id": invoice_no % 3, "service_name": service_name, "no_of_sessions": 1,
+              "per_session": 100.0, "total": 100.0}
+    return tuple(values[col] for col in INVOICE_TABLE_COLUMNS)
+
+
+SERVICE = INVOICE_TABLE_COLUMNS.index("service_name")
+ROWS = [invoice(1, "SPEECH"), invoice(2, None), invoice(3, "OCCUPATIONAL"), invoice(4, "SPEECH"), invoice(5, None),
+        invoice(6, "AQUATIC"), invoice(7, None), invoice(8, "PHYSICAL")]
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_pages_cover_every_row_with_nulls_last(monkeypatch, descending):
+    monkeypatch.setattr(invoice8, "PAGE_ROWS", 3)
+    pager = Pager(ROWS, ("service_name", descending))
+
+    pages = pager.all_pages()
+
+    shown = [row[0] for page in pages for row in page]
+    non_null = sorted((row for row in ROWS if row[SERVICE] is not None), key=lambda row: (row[SERVICE], row[0]), reverse=descending)
+    nulls = sorted((row for row in ROWS if row[SERVICE] is None), key=lambda row: row[0], reverse=descending)
+    assert shown == [row[0] for row in non_null + nulls]
+    assert all(len(page) == 3 for page in pages[:-1])
+
+
+def test_default_order_pages_by_invoice_no(monkeypatch):
+    monkeypatch.setattr(invoice8, "PAGE_ROWS", 3)
+    pager = Pager(ROWS, invoice8.DEFAULT_SORT)
+    assert [row[0] for page in pager.all_pages() for row in page] == [8, 7, 6, 5, 4, 3, 2, 1]
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_order_key_matches_paging_order(descending):
+    pager = Pager([], ("service_name", descending))
+    keyed = sorted(ROWS, key=lambda row: pager.order_key(row[SERVICE], row[0]), reverse=descending)
+    nulls_last = [row for row in keyed if row[SERVICE] is not None] + [row for row in keyed if row[SERVICE] is None]
+    assert keyed == nulls_last
+    assert [row[0] for row in keyed if row[SERVICE] is None] == sorted([2, 5, 7], reverse=descending)
+
+
+class FakeTree:
+    def __init__(self):
+        self.items = [] # (iid, tags) in display order
+
+    def insert(self, parent, index, iid, values, tags=()):
+        assert iid not in [item for item, _ in self.items]
+        self.items.append((iid, tags))
+
+    def delete(self, *iids):
+        self.items = [(item, tags) for item, tags in self.items if item not in iids]
+
+
+class FakeCustomers:
+    def get_many(self, c_ids):
+        return {}
+
+
+@pytest.mark.parametrize("descending", [True, False])
+def test_archived_rows_are_merged_into_the_pages_in_order(monkeypatch, descending):
+    monkeypatch.setattr(invoice8, "PAGE_ROWS", 3)
+    pager = Pager(ROWS, ("service_name", descending))
+    pager.tree, pager.customers, pager.rows, pager.archived_invoice_nos = FakeTree(), FakeCustomers(), {}, set()
+    pager.show_page = InvoiceApp.show_page.__get__(pager)
+    archived = []
+    for invoice_no, service_name in [(20, "BEHAVIORAL"), (21, None), (22, "ZUMBA"), (3, "OCCUPATIONAL")]:
+        values = dict(zip(INVOICE_TABLE_COLUMNS, invoice(invoice_no, service_name)))
+        archived.append(tuple(values.get(col, "") for col in invoice8.INVOICE_COLUMNS))
+    position = invoice8.INVOICE_COLUMNS.index("service_name")
+    pager.archived_rows = sorted(archived, reverse=not descending,
+                                 key=lambda row: pager.order_key(row[position], row[0]))
+
+    pager.show_page(pager.fetch_page())
+    while pager.page_after is not None:
+        pager.show_page(pager.fetch_page(pager.page_after))
+
+    shown = [pager.rows[int(item)] for item, _ in pager.tree.items]
+    assert [row.invoice_no for row in shown] == [row.invoice_no for row in sorted(
+        shown, key=lambda row: pager.order_key(row.service_name, row.invoice_no), reverse=descending)]
+    assert len(shown) == len(ROWS) + 3 # Invoice 3 is in both places and shown once, from MySQL
+    assert pager.archived_invoice_nos == {20, 21, 22}
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+from clinic_calendar import booking_key, session_key
+from journey import JourneyIndex
+from sch10 import BookingStore
+
+NOW = datetime(2024, 3, 6, 12, 0)
+PHYSIO = "PHYSICAL THERAPY"
+
+
+def book(bookings, slot_key, phone, therapy=PHYSIO, **extra):
+    info = {'phone': phone, 'therapy': therapy, **extra}
+    bookings[session_key(slot_key, therapy)] = info
+    return slot_key, info
+
+
+def loaded_index():
+    bookings = BookingStore()
+    attended = book(bookings, "2024-03-04_10:00", "+91 98480 12345")
+    book(bookings, "2024-03-05_10:00", "9848012345", no_show=True)
+    book(bookings, "2024-03-08_10:00", "9848012345")
+    book(bookings, "2024-03-04_10:00", "9000000001", "AQUATIC THERAPY") # Another patient
+    journeys = JourneyIndex(bookings)
+    journeys.load([(7, "098480 12345")], [(100, 7, datetime(2024, 3, 4, 11, 0), PHYSIO, 2, 200.0, 1)],
+                  [(booking_key(*attended), 100)])
+    return bookings, journeys
+
+
+def test_timeline_merges_sessions_and_invoices_of_one_patient():
+    _, journeys = loaded_index()
+    entries = journeys.timeline("7", NOW)
+    assert [(when, kind) for when, kind, _ in entries] == [
+        ("2024-03-04 10:00", "booking"), ("2024-03-04 11:00:00", "invoice"),
+        ("2024-03-05 10:00", "booking"), ("2024-03-08 10:00", "booking")]
+    assert [details['status'] for _, kind, details in entries if kind == "booking"] == ["attended", "no-show", "booked"]
+    assert entries[0][2]['invoice_no'] == 100
+    assert journeys.timeline("9848012345", NOW) == entries # The mobile number finds the same patient
+
+    totals = journeys.summary(entries)
+    assert (totals['attended'], totals['no-show'], totals['booked'], totals['billed']) == (1, 1, 1, 1)
+    assert totals['invoiced'] == 200.0 and totals['outstanding'] == 0.0
+
+
+def test_every_session_of_a_batch_shows_up():
+    bookings, journeys = loaded_index()
+    # One notification for the day; the second number is typed differently and must still be picked up
+    bookings.update({session_key("2024-03-11_09:00", PHYSIO): {'phone': "98480-12345", 'therapy': PHYSIO},
+                     session_key("2024-03-11_10:00", PHYSIO): {'phone': "98480 12345", 'therapy': PHYSIO}})
+    slots = [when for when, kind, _ in journeys.timeline("7", NOW) if kind == "booking"]
+    assert slots[-2:] == ["2024-03-11 09:00", "2024-03-11 10:00"]
+
+
+def test_changes_without_customer_details_keep_the_phone_link():
+    _, journeys = loaded_index()
+    journeys.apply_change("update", 100, {'c_id': 7, 'date_time': "2024-03-04 11:00:00", 'service_name': PHYSIO,
+                                          'no_of_sessions': 2, 'total': 250.0})
+    entries = journeys.timeline("9848012345", NOW)
+    assert [details['total'] for _, kind, details in entries if kind == "invoice"] == [250.0]
+    assert entries[1][2]['paid'] # An update keeps the payment state
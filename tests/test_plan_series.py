@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+
+import sch10
+from sch10 import BookingStore, plan_series
+
+MONDAY = date(2024, 3, 4)
+STARTS = ["09:00", "10:00", "11:00", "12:00"]
+WEEK = {MONDAY + timedelta(days=i): STARTS for i in range(5)} # Mon-Fri
+BOOKED = {'phone': "1", 'therapy': "PHYSICAL THERAPY"}
+
+
+def test_free_slots_are_booked_as_requested():
+    plan = plan_series({}, WEEK, MONDAY, {0, 2, 4}, "10:00", 3)
+    assert plan == [(key, key) for key in ("2024-03-04_10:00", "2024-03-06_10:00", "2024-03-08_10:00")]
+
+
+def test_clash_moves_to_the_nearest_free_time():
+    bookings = {"2024-03-04_10:00": BOOKED, "2024-03-04_09:00": BOOKED}
+    assert plan_series(bookings, WEEK, MONDAY, {0}, "10:00", 1) == [("2024-03-04_10:00", "2024-03-04_11:00")]
+
+
+def test_full_day_moves_to_a_later_day_without_reusing_it():
+    bookings = {f"2024-03-04_{start}": BOOKED for start in STARTS}
+    plan = plan_series(bookings, WEEK, MONDAY, {0, 1}, "10:00", 2)
+    # Monday's alternative takes Tuesday 10:00, so Tuesday's own occurrence gets the next best time
+    assert plan == [("2024-03-04_10:00", "2024-03-05_10:00"), ("2024-03-05_10:00", "2024-03-05_09:00")]
+
+
+def test_fits_rejects_slots():
+    plan = plan_series({}, WEEK, MONDAY, {0}, "10:00", 1, fits=lambda key: not key.endswith("10:00"))
+    assert plan == [("2024-03-04_10:00", "2024-03-04_09:00")]
+
+
+def test_nothing_free_nearby(monkeypatch):
+    monkeypatch.setattr(sch10, "ALTERNATIVE_SEARCH_DAYS", 1)
+    bookings = {f"{day}_{start}": BOOKED for day in list(WEEK)[:2] for start in STARTS}
+    assert plan_series(bookings, WEEK, MONDAY, {0}, "10:00", 1) == [("2024-03-04_10:00", None)]
+
+
+def test_stops_at_the_last_day_with_slots():
+    plan = plan_series({}, WEEK, MONDAY, {2}, "10:00", 5)
+    assert plan == [("2024-03-06_10:00", "2024-03-06_10:00")]
+    assert plan_series({}, WEEK, MONDAY, set(), "10:00", 5) == []
+
+
+def test_series_is_stored_with_one_notification_per_day():
+    bookings = BookingStore()
+    bookings["2024-03-04_11:00"] = {'phone': "2", 'therapy': "SPEECH THERAPY"}
+    notified = []
+    bookings.listeners.append(notified.append)
+    listed = bookings.by_therapy["PHYSICAL THERAPY"] # What the therapist list is showing
+
+    keys = ["2024-03-06_10:00", "2024-03-04_10:00", "2024-03-04_09:00", "2024-03-08_10:00"]
+    bookings.update({key: BOOKED for key in keys})
+
+    assert notified == ["2024-03-04_09:00", "2024-03-06_10:00", "2024-03-08_10:00"]
+    assert list(bookings) == sorted(keys + ["2024-03-04_11:00"])
+    assert listed is bookings.by_therapy["PHYSICAL THERAPY"] and listed == sorted(keys)
+    assert bookings.by_phone["2"] == ["2024-03-04_11:00"]
@@ -0,0 +1,108 @@
+import pytest
+
+from query_cache import QueryBuilder, StatementPool
+
+
+class FakeCursor:
+    def __init__(self, log):
+        self.log = log
+
+    def execute(self, sql, params=()):
+        self.log.append((sql, params))
+
+    def fetchall(self):
+        return [(1,)]
+
+
+class FakeConnection:
+    def __init__(self, log):
+        self.log = log
+
+    def autocommit(self, value):
+        pass
+
+    def cursor(self):
+        return FakeCursor(self.log)
+
+
+class FakePreparedConnection:
+    """Stands in for a mysql-connector connection; each prepared cursor logs what it prepares and runs."""
+
+    def __init__(self, log):
+        self.log = log
+        self.autocommit = True
+
+    def cmd_stmt_prepare(self, sql):
+        pass
+
+    def cursor(self, prepared=False):
+        assert prepared
+        return FakePreparedCursor(self.log)
+
+
+class FakePreparedCursor(FakeCursor):
+    def execute(self, sql, params=()):
+        self.log.append(("EXECUTE", sql, params))
+
+
+def test_select_is_compiled_once():
+    queries = QueryBuilder()
+    query = queries.select("invoice3", ["invoice_no"], ("c_id = ?", "service_name LIKE ?"), "invoice_no DESC", 500)
+    assert query.sql == "SELECT invoice_no FROM invoice3 WHERE c_id = ? AND service_name LIKE ? ORDER BY invoice_no DESC LIMIT 500"
+    assert query.mysql_sql == "SELECT invoice_no FROM invoice3 WHERE c_id = %s AND service_name LIKE %s ORDER BY invoice_no DESC LIMIT 500"
+    assert query.param_count == 2
+    assert queries.select("invoice3", ("invoice_no",), ["c_id = ?", "service_name LIKE ?"], "invoice_no DESC", 500) is query
+
+
+def test_literal_percent_is_escaped_for_pymysql():
+    query = QueryBuilder().select("invoice3", ["invoice_no"], ("service_name LIKE 'SPEECH%'", "c_id = ?"))
+    assert query.mysql_sql.endswith("LIKE 'SPEECH%%' AND c_id = %s")
+
+
+def test_each_query_is_one_round_trip():
+    log = []
+    connections = []
+    pool = StatementPool(lambda: connections.append(1) or FakeConnection(log))
+    query = QueryBuilder().select("invoice3", ["SUM(total)"], ("c_id = ?",))
+
+    assert pool.execute(query, (7,)) == [(1,)]
+    assert pool.execute(query, (8,)) == [(1,)]
+
+    assert log == [(query.mysql_sql, (7,)), (query.mysql_sql, (8,))]
+    assert len(connections) == 1 # The connection is reused
+
+
+def test_parameter_count_is_checked():
+    pool = StatementPool(lambda: FakeConnection([]))
+    with pytest.raises(ValueError):
+        pool.execute(QueryBuilder().select("invoice3", ["SUM(total)"], ("c_id = ?",)), ())
+
+
+def test_close_releases_idle_connections():
+    closed = []
+    pool = StatementPool(lambda: FakeConnection([]))
+    query = QueryBuilder().select("invoice3", ["MAX(invoice_no)"])
+    pool.execute(query)
+    pooled = pool.idle.queue[0]
+    pooled.con.close = lambda: closed.append(pooled)
+
+    pool.close()
+
+    assert closed == [pooled]
+    assert pool.idle.empty()
+
+
+def test_mysql_connector_runs_one_prepared_cursor_per_query():
+    log = []
+    pool = StatementPool(lambda: FakePreparedConnection(log))
+    queries = QueryBuilder()
+    by_customer = queries.select("invoice3", ["SUM(total)"], ("c_id = ?",))
+    latest = queries.select("invoice3", ["MAX(invoice_no)"])
+
+    pool.execute(by_customer, (7,))
+    pool.execute(latest)
+    pool.execute(by_customer, (8,))
+
+    statements = pool.idle.queue[0].statements
+    assert list(statements) == [by_customer, latest] # Prepared once each on the connection
+    assert log == [("EXECUTE", by_customer.sql, (7,)), ("EXECUTE", latest.sql, ()), ("EXECUTE", by_customer.sql, (8,))]
@@ -0,0 +1,118 @@
+import datetime
+import decimal
+import json
+
+from invoice8 import INVOICE_TABLE_COLUMNS, PAYMENTS_TABLE, TABLE_NAME
+from query_cache import QueryBuilder
+from replica import InvoiceReplica
+
+
+def invoice(invoice_no, c_id, total):
+    return {'invoice_no': invoice_no, 'date_time': datetime.datetime(2024, 3, invoice_no, 10, 0), 'due_date_time': None,
+            'c_id': c_id, 'service_name': "PHYSICAL THERAPY", 'no_of_sessions': 1,
+            'per_session': decimal.Decimal(total), 'total': decimal.Decimal(total)}
+
+
+class FakeCursor:
+    def __init__(self, upstream):
+        self.upstream = upstream
+        self.rows = []
+
+    def execute(self, sql, params=()):
+        if sql.startswith("SELECT MAX(seq)"):
+            self.rows = [(max((seq for seq, *_ in self.upstream.log), default=None),)]
+        elif "information_schema" in sql:
+            self.rows = [(1,)] # The invoice number trigger exists
+        elif sql.startswith("SELECT seq"): # The change feed
+            after_seq, limit = params
+            self.rows = [row for row in self.upstream.log if row[0] > after_seq][:limit]
+        elif sql.startswith("SELECT"):
+            self.upstream.copies += 1
+            table = sql.split(" FROM ")[1]
+            self.rows = list(self.upstream.tables.get(table, ()))
+        else:
+            self.rows = [] # CREATE TABLE IF NOT EXISTS ...
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchmany(self, size):
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+    def close(self):
+        pass
+
+
+class FakeUpstream:
+    """MySQL as the replica sees it: table rows to copy and the change log to tail."""
+
+    def __init__(self):
+        self.tables = {TABLE_NAME: [tuple(invoice(n, n, "100.00")[col] for col in INVOICE_TABLE_COLUMNS) for n in (1, 2)]}
+        self.log = [(1, "insert", 1, None), (2, "insert", 2, None)] # Already in the copied tables
+        self.copies = 0
+
+    def log_change(self, op, invoice_no, row=None):
+        if row is not None:
+            # As the writer logs them: numbers as floats, datetimes as text
+            row = {col: float(value) if isinstance(value, decimal.Decimal) else
+                   str(value) if isinstance(value, datetime.datetime) else value for col, value in row.items()}
+        self.log.append((len(self.log) + 1, op, invoice_no, json.dumps(row) if row is not None else None))
+
+    def connect(self):
+        return self
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor(self)
+
+    def autocommit(self, value):
+        pass
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def local_invoices(replica):
+    query = QueryBuilder().select(TABLE_NAME, ["invoice_no", "total"], order_by="invoice_no")
+    return replica.execute(query)
+
+
+def test_changes_after_the_snapshot_are_applied_on_later_syncs(tmp_path):
+    upstream = FakeUpstream()
+    replica = InvoiceReplica(str(tmp_path / "replica.sqlite3"), upstream.connect)
+    replica.sync(replica.con) # First sync: copies the tables at seq 2
+    assert local_invoices(replica) == [(1, 100.0), (2, 100.0)]
+    assert replica.poll() == [(2, "reload", None, None)]
+
+    upstream.log_change("update", 2, invoice(2, 2, "150.00"))
+    upstream.log_change("insert", 3, invoice(3, 3, "80.00"))
+    upstream.log_change("delete", 1)
+    upstream.log_change("paid", 3)
+    replica.sync(replica.con)
+
+    assert local_invoices(replica) == [(2, 150.0), (3, 80.0)]
+    assert replica.con.execute(f"SELECT invoice_no FROM {PAYMENTS_TABLE}").fetchall() == [(3,)]
+    assert [seq for seq, *_ in replica.poll()] == [3, 4, 5, 6]
+    assert replica.meta(replica.con, "last_seq") == 6
+    assert upstream.copies == 4 # Only the first sync copied tables
+
+
+def test_reopened_replica_catches_up_from_its_stored_position(tmp_path):
+    path = str(tmp_path / "replica.sqlite3")
+    upstream = FakeUpstream()
+    first = InvoiceReplica(path, upstream.connect)
+    first.sync(first.con)
+    first.con.close()
+
+    upstream.log_change("update", 1, invoice(1, 1, "120.00")) # Logged while the desk was closed
+    replica = InvoiceReplica(path, upstream.connect)
+    replica.sync(replica.con)
+
+    assert local_invoices(replica) == [(1, 120.0), (2, 100.0)]
+    assert upstream.copies == 4 # No second snapshot
@@ -0,0 +1,65 @@
+from datetime import date
+
+from clinic_calendar import session_key
+from resources import DEFAULT_RESOURCES, ResourceEngine
+from sch10 import BookingStore
+
+DAY = date(2024, 3, 5) # A Tuesday
+STARTS = ("09:00", "10:00", "11:00", "12:00")
+RESOURCES = {
+    "Pool": {"therapies": ["AQUATIC THERAPY"], "turnaround_slots": 1, "closed": {"Tue": [["12:00", "13:00"]]}},
+    "Speech Room": {"therapies": ["SPEECH AND LANGUAGE THERAPY"]},
+}
+
+
+def engine(resources=RESOURCES):
+    return ResourceEngine(resources, lambda day: STARTS)
+
+
+def test_therapies_sharing_a_room_contend_for_the_slot():
+    resources = engine(DEFAULT_RESOURCES)
+    bookings = BookingStore()
+    bookings[session_key("2024-03-05_09:00", "PHYSICAL THERAPY")] = {'phone': "1", 'therapy': "PHYSICAL THERAPY"}
+    resources.rebuild_day(bookings, DAY)
+    assert not resources.available("OCCUPATIONAL THERAPY", "2024-03-05_09:00") # Same therapy room
+    assert resources.conflicts("OCCUPATIONAL THERAPY", "2024-03-05_09:00") == ["Therapy Room"]
+    assert resources.available("AQUATIC THERAPY", "2024-03-05_09:00") # The pool runs alongside
+    assert resources.available("OCCUPATIONAL THERAPY", "2024-03-05_10:00")
+
+
+def test_sessions_at_lists_a_slots_concurrent_sessions():
+    bookings = BookingStore()
+    for key, therapy in [("2024-03-05_09:00", "PHYSICAL THERAPY"), ("2024-03-05_09:00", "AQUATIC THERAPY"),
+                         ("2024-03-05_10:00", "AQUATIC THERAPY")]:
+        bookings[session_key(key, therapy)] = {'phone': "1", 'therapy': therapy}
+    assert bookings.sessions_at("2024-03-05_09:00") == ["2024-03-05_09:00@AQUATIC THERAPY",
+                                                       "2024-03-05_09:00@PHYSICAL THERAPY"]
+    assert bookings.sessions_at("2024-03-05_11:00") == []
+    assert bookings.slots_of("AQUATIC THERAPY") == {"2024-03-05_09:00", "2024-03-05_10:00"}
+    assert list(bookings) == sorted(bookings) # Still chronological
+
+
+def test_closed_window_blocks_slots():
+    resources = engine()
+    assert resources.available("AQUATIC THERAPY", "2024-03-05_09:00")
+    assert not resources.available("AQUATIC THERAPY", "2024-03-05_12:00")
+    assert not resources.available("AQUATIC THERAPY", "2024-03-05_11:00") # Its turnaround would run into the closure
+    assert resources.conflicts("AQUATIC THERAPY", "2024-03-05_12:00") == ["Pool"]
+    assert resources.available("AQUATIC THERAPY", "2024-03-12_09:00") # Closed windows are per weekday
+
+
+def test_turnaround_holds_the_following_slot():
+    resources = engine()
+    bookings = BookingStore()
+    bookings[session_key("2024-03-05_09:00", "AQUATIC THERAPY")] = {'phone': "1", 'therapy': "AQUATIC THERAPY"}
+    resources.rebuild_day(bookings, DAY)
+    assert not resources.available("AQUATIC THERAPY", "2024-03-05_10:00") # Pool still being cleaned
+    assert resources.available("SPEECH AND LANGUAGE THERAPY", "2024-03-05_10:00") # Other rooms are unaffected
+
+    bookings.cancel(session_key("2024-03-05_09:00", "AQUATIC THERAPY"))
+    resources.rebuild_day(bookings, DAY)
+    assert resources.available("AQUATIC THERAPY", "2024-03-05_10:00")
+
+
+def test_times_that_are_not_slots_are_unavailable():
+    assert not engine().available("SPEECH AND LANGUAGE THERAPY", "2024-03-05_09:30")
@@ -0,0 +1,95 @@
+import threading
+
+from customer_index import CustomerIndex
+from due_scanner import DueScanner
+from invoice8 import InvoiceApp
+
+
+class FakeWriter:
+    def __init__(self):
+        self.journal_lock = threading.Lock()
+        self.outstanding = {}
+
+
+class Loader:
+    """The startup-load half of InvoiceApp, without the window or MySQL."""
+    load_copy = InvoiceApp.load_copy
+    adopt_copy = InvoiceApp.adopt_copy
+    edit_index = InvoiceApp.edit_index
+
+    def __init__(self):
+        self.writer = FakeWriter()
+        self.customer_index = CustomerIndex()
+        self.due_scanner = DueScanner()
+        self.load_edits = {"index": [], "due": []}
+
+
+def loaded_scanner():
+    scanner = DueScanner()
+    scanner.upsert(1, "2024-01-10 10:00:00", 7, 100.0)
+    scanner.upsert(2, "2024-01-11 10:00:00", 7, 50.0)
+    return scanner
+
+
+def test_edits_after_the_copy_started_are_replayed():
+    loader = Loader()
+    payload = loader.load_copy("due", loaded_scanner)
+    loader.edit_index("due", lambda scanner: scanner.remove(1)) # Paid while the copy was loading
+    loader.edit_index("due", lambda scanner: scanner.upsert(2, "2024-02-01 10:00:00", 7, 50.0), "m1")
+
+    loader.adopt_copy("due", *payload)
+
+    assert list(loader.due_scanner.invoices) == [2]
+    assert str(loader.due_scanner.invoices[2][0]) == "2024-02-01 10:00:00"
+    assert "due" not in loader.load_edits
+
+
+def test_committed_edits_are_not_applied_twice():
+    loader = Loader()
+    loader.edit_index("index", lambda index: index.add_invoice(70, 7, "Asha", "Rao", "98480"), "m1")
+    loader.edit_index("index", lambda index: index.add_invoice(80, 8, "Ravi", "Kumar", "99000"), "m2")
+    loader.writer.outstanding["m2"] = object() # m1 is committed, so the copy already has it
+
+    def build():
+        index = CustomerIndex()
+        index.add_invoice(70, 7, "Asha", "Rao", "98480")
+        return index
+
+    loader.adopt_copy("index", *loader.load_copy("index", build))
+
+    assert loader.customer_index.invoice_counts == {7: 1, 8: 1}
+
+
+def test_edits_after_adoption_are_not_kept():
+    loader = Loader()
+    loader.adopt_copy("due", *loader.load_copy("due", loaded_scanner))
+    loader.edit_index("due", lambda scanner: scanner.remove(2))
+
+    assert list(loader.due_scanner.invoices) == [1]
+    assert "due" not in loader.load_edits
+
+
+def test_edit_while_the_loader_thread_is_building():
+    loader = Loader()
+    reading = threading.Event()
+    edited = threading.Event()
+
+    def build():
+        reading.set()
+        edited.wait(5) # The desk saves an invoice while the loader is still reading
+        index = CustomerIndex()
+        index.add_invoice(70, 7, "Asha", "Rao", "98480")
+        return index
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(loader.load_copy("index", build)))
+    thread.start()
+    assert reading.wait(5)
+    loader.edit_index("index", lambda index: index.add_invoice(80, 8, "Ravi", "Kumar", "99000"), "m1")
+    edited.set()
+    thread.join(5)
+
+    loader.adopt_copy("index", *results[0])
+
+    assert loader.customer_index.search("ravi")[0][0] == 8
+    assert loader.customer_index.invoice_counts == {7: 1, 8: 1}
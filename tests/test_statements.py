@@ -0,0 +1,55 @@
+import pytest
+
+import statements
+from statements import stream_invoices, write_statement
+
+
+class FakeCursor:
+    def __init__(self, con):
+        self.con = con
+        self.rows = []
+        self.closed = False
+
+    def execute(self, sql, params=()):
+        self.rows = list(self.con.invoices) if "i.c_id = %s" in sql else [self.con.customer]
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def fetchmany(self, size):
+        self.con.fetches += 1
+        chunk, self.rows = self.rows[:size], self.rows[size:]
+        return chunk
+
+    def close(self):
+        self.closed = True
+
+
+class FakeConnection:
+    def __init__(self, invoice_count):
+        self.customer = ("Ravi", "Kumar", "9848012345")
+        self.invoices = [(n, f"2024-03-{n % 28 + 1:02d} 10:00:00", None, "PHYSICAL THERAPY", 1, 100.0, n % 2 == 0)
+                         for n in range(1, invoice_count + 1)]
+        self.cursors = []
+        self.fetches = 0
+
+    def cursor(self, cursor_class=None):
+        cursor = FakeCursor(self)
+        self.cursors.append(cursor)
+        return cursor
+
+
+def test_invoices_are_streamed_in_chunks(monkeypatch):
+    monkeypatch.setattr(statements, "FETCH_ROWS", 2)
+    con = FakeConnection(5)
+    assert [row[0] for row in stream_invoices(con, 7)] == [1, 2, 3, 4, 5]
+    assert con.fetches == 4 # Three chunks and the empty one that ends the stream
+    assert con.cursors[0].closed
+
+
+def test_totals_carry_across_pages(tmp_path):
+    pytest.importorskip("reportlab")
+    con = FakeConnection(120) # More rows than fit on one page
+    path = tmp_path / "statement.pdf"
+    assert write_statement(con, 7, str(path)) == (120, 12000.0, 6000.0)
+    assert path.read_bytes().startswith(b"%PDF")
@@ -0,0 +1,20 @@
+import pytest
+
+from tk_watchdog import DEFAULT_THRESHOLD_MS, watchdog_threshold
+
+
+@pytest.mark.parametrize("argv, expected", [
+    ([], None),
+    (["--other"], None),
+    (["--watchdog"], DEFAULT_THRESHOLD_MS),
+    (["--watchdog=50"], 50.0),
+    (["--watchdog=12.5"], 12.5),
+])
+def test_threshold_from_flag(argv, expected):
+    assert watchdog_threshold(argv) == expected
+
+
+@pytest.mark.parametrize("value", ["abc", "", "0", "-5", "nan", "inf"])
+def test_bad_value_disables_the_watchdog_with_a_warning(capsys, value):
+    assert watchdog_threshold([f"--watchdog={value}"]) is None
+    assert f"Ignoring --watchdog={value}" in capsys.readouterr().err
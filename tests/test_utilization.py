@@ -0,0 +1,48 @@
+from datetime import date, datetime
+
+from clinic_calendar import session_key
+from utilization import UtilizationReport
+
+STARTS = ("09:00", "10:00")
+NOW = datetime(2024, 3, 6, 12, 0) # A Wednesday
+PHYSIO = "PHYSICAL THERAPY"
+SPEECH = "SPEECH AND LANGUAGE THERAPY"
+
+
+def slot_starts(day):
+    return STARTS if day.weekday() < 5 else None # Closed at the weekend
+
+
+def session(slot_key, therapy, no_show=False):
+    info = {'phone': "1", 'therapy': therapy}
+    if no_show:
+        info['no_show'] = True
+    return session_key(slot_key, therapy), info
+
+
+def report(sessions, cancellations=()):
+    return UtilizationReport(dict(sessions), slot_starts, [PHYSIO, SPEECH], cancellations, NOW)
+
+
+def test_rates_count_cancellations_and_past_no_shows():
+    utilization = report([
+        session("2024-03-04_09:00", PHYSIO),
+        session("2024-03-04_10:00", PHYSIO, no_show=True),
+        session("2024-03-05_09:00", SPEECH),
+        session("2024-03-08_09:00", PHYSIO, no_show=True), # Still ahead; not a no-show yet
+    ], cancellations=[("2024-03-05_10:00@" + PHYSIO, PHYSIO)])
+
+    assert utilization.rates(PHYSIO) == (1 / 4, 1 / 2) # 1 cancelled of 4 booked, 1 of 2 past sessions missed
+    assert utilization.rates(SPEECH) == (0.0, 0.0)
+    assert utilization.rates() == (1 / 5, 1 / 3)
+
+
+def test_rates_without_data_are_none():
+    assert report([]).rates(PHYSIO) == (None, None)
+
+
+def test_concurrent_sessions_fill_one_slot():
+    utilization = report([session("2024-03-04_09:00", PHYSIO), session("2024-03-04_09:00", SPEECH)])
+    assert utilization.occupancy()[0][0] == (1, 1) # Mondays at 09:00: booked, open
+    assert utilization.occupancy(PHYSIO)[0][0] == (1, 1)
+    assert utilization.weekly_trend() == [(date(2024, 3, 4), 1, 10)]
@@ -0,0 +1,79 @@
+import random
+
+import pytest
+
+from waitlist import IndexedPriorityQueue, Waitlist, window_of
+
+THERAPIES = ["PHYSICAL THERAPY", "SPEECH AND LANGUAGE THERAPY"]
+
+
+@pytest.mark.parametrize("start_time, window", [
+    ("09:00", "Morning"), ("11:59", "Morning"), ("12:00", "Afternoon"), ("14:30", "Afternoon"),
+    ("15:00", "Late Afternoon"), ("17:30", "Late Afternoon"),
+])
+def test_window_of(start_time, window):
+    assert window_of(start_time) == window
+
+
+def test_priority_queue_pops_in_order_after_removals_and_reprioritising():
+    rng = random.Random(3)
+    queue = IndexedPriorityQueue()
+    keys = {item_id: rng.random() for item_id in range(200)}
+    for item_id, key in keys.items():
+        queue.push(item_id, key)
+    for item_id in range(0, 200, 3):
+        queue.remove(item_id)
+        del keys[item_id]
+    for item_id in range(1, 200, 7):
+        keys[item_id] = rng.random()
+        queue.push(item_id, keys[item_id])
+
+    popped = [queue.pop() for _ in range(len(queue))]
+
+    assert popped == sorted((key, item_id) for item_id, key in keys.items())
+    assert queue.positions == {}
+
+
+def test_higher_priority_first_then_join_order():
+    waitlist = Waitlist(THERAPIES)
+    first = waitlist.join("1", "PHYSICAL THERAPY", "Morning", 0)
+    second = waitlist.join("2", "PHYSICAL THERAPY", "Morning", 0)
+    urgent = waitlist.join("3", "SPEECH AND LANGUAGE THERAPY", "Morning", 2)
+    waitlist.join("4", "PHYSICAL THERAPY", "Afternoon", 5) # Other window
+
+    assert [waitlist.take_best("09:00")[0] for _ in range(3)] == [urgent, first, second]
+    assert waitlist.take_best("10:00") is None
+
+
+def test_rejoining_reprioritises_the_same_request():
+    waitlist = Waitlist(THERAPIES)
+    first = waitlist.join("1", "PHYSICAL THERAPY", "Morning", 0)
+    second = waitlist.join("2", "PHYSICAL THERAPY", "Morning", 0)
+
+    assert waitlist.join("2", "PHYSICAL THERAPY", "Morning", 1) == second
+    assert len(waitlist) == 2
+    assert waitlist.best_for("09:00") == second
+    waitlist.leave(second)
+    assert waitlist.best_for("09:00") == first
+
+
+def test_restore_keeps_the_place_in_line():
+    waitlist = Waitlist(THERAPIES)
+    first = waitlist.join("1", "PHYSICAL THERAPY", "Morning", 0)
+    waitlist.join("2", "PHYSICAL THERAPY", "Morning", 0)
+
+    request_id, request = waitlist.take_best("09:00")
+    waitlist.restore(request_id, request) # e.g. the offered slot was declined
+
+    assert request_id == first
+    assert waitlist.best_for("09:00") == first
+
+
+def test_pending_lists_service_order_per_therapy_and_window():
+    waitlist = Waitlist(THERAPIES)
+    a = waitlist.join("1", "SPEECH AND LANGUAGE THERAPY", "Afternoon", 0)
+    b = waitlist.join("2", "SPEECH AND LANGUAGE THERAPY", "Morning", 0)
+    c = waitlist.join("3", "PHYSICAL THERAPY", "Morning", 0)
+    d = waitlist.join("4", "SPEECH AND LANGUAGE THERAPY", "Morning", 1)
+
+    assert [request_id for request_id, _ in waitlist.pending()] == [c, d, b, a]
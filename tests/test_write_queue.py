@@ -0,0 +1,207 @@
+import datetime
+import decimal
+import json
+import threading
+
+import pymysql
+import pytest
+
+import write_queue
+from write_queue import InvoiceWriter, Mutation, retryable
+
+COLUMNS = ["invoice_no", "due_date_time", "total"]
+
+
+class FakeCursor:
+    def __init__(self, con):
+        self.con = con
+
+    def execute(self, sql, params=()):
+        error = self.con.fail(sql, params)
+        if error is not None:
+            raise error
+        self.con.uncommitted.append((sql.split()[0], list(params)))
+
+    def fetchone(self):
+        return self.con.current_row
+
+
+class FakeConnection:
+    """Records statements; fail(sql, params) returns an exception to raise, or None."""
+
+    def __init__(self, fail=None, current_row=None):
+        self.fail = fail or (lambda sql, params: None)
+        self.current_row = current_row
+        self.uncommitted = []
+        self.committed = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed.extend(self.uncommitted)
+        self.uncommitted = []
+
+    def rollback(self):
+        self.uncommitted = []
+
+    def close(self):
+        pass
+
+
+def make_writer(tmp_path, con):
+    return InvoiceWriter(lambda: con, "invoices", COLUMNS, str(tmp_path / "journal.jsonl"))
+
+
+def queue_mutation(writer, op, row, base=None):
+    """Registers a mutation like submit() does, without handing it to the writer thread."""
+    mutation = Mutation(op, row, base=base)
+    writer.outstanding[mutation.id] = mutation
+    return mutation
+
+
+@pytest.mark.parametrize("error, expected", [
+    (pymysql.err.OperationalError(2003, "Can't connect"), True),
+    (pymysql.err.OperationalError(2006, "MySQL server has gone away"), True),
+    (pymysql.err.OperationalError(2013, "Lost connection"), True),
+    (pymysql.err.OperationalError(1205, "Lock wait timeout exceeded"), True),
+    (pymysql.err.OperationalError(1213, "Deadlock found"), True),
+    (pymysql.err.InterfaceError(0, ""), True),
+    (pymysql.err.OperationalError(1292, "Incorrect datetime value"), False),
+    (pymysql.err.OperationalError(), False),
+    (pymysql.err.IntegrityError(1062, "Duplicate entry"), False),
+    (ValueError("Unknown mutation type"), False),
+])
+def test_retryable(error, expected):
+    assert retryable(error) is expected
+
+
+def test_data_error_rejects_only_that_mutation(tmp_path):
+    def fail(sql, params):
+        if "bad" in params:
+            return pymysql.err.OperationalError(1292, "Incorrect datetime value: 'bad'")
+    con = FakeConnection(fail)
+    writer = make_writer(tmp_path, con)
+    bad = queue_mutation(writer, "insert", {"invoice_no": 1, "due_date_time": "bad", "total": 10})
+    good = queue_mutation(writer, "insert", {"invoice_no": 2, "due_date_time": "2024-01-01 00:00:00", "total": 20})
+
+    writer.commit_batch([bad, good])
+
+    assert con.committed == [("INSERT", [2, "2024-01-01 00:00:00", 20])]
+    results = writer.poll_results()
+    assert [(mutation.row["invoice_no"], type(error)) for mutation, error in results] == [
+        (1, pymysql.err.OperationalError), (2, type(None))]
+    assert writer.pending_count() == 0
+    assert (tmp_path / "journal.jsonl").read_text() == "" # Nothing left to replay on the next start
+
+
+@pytest.mark.parametrize("code", [2013, 1213])
+def test_retryable_error_retries_the_batch(tmp_path, monkeypatch, code):
+    monkeypatch.setattr(write_queue, "RETRY_DELAY", 0)
+    monkeypatch.setattr(write_queue, "LOCK_RETRY_DELAY", 0)
+    attempts = []
+
+    def fail(sql, params):
+        attempts.append(sql)
+        if len(attempts) == 1:
+            return pymysql.err.OperationalError(code, "transient")
+    con = FakeConnection(fail)
+    writer = make_writer(tmp_path, con)
+    mutation = queue_mutation(writer, "insert", {"invoice_no": 1, "due_date_time": None, "total": 10})
+
+    writer.commit_batch([mutation])
+
+    assert con.committed == [("INSERT", [1, None, 10])]
+    assert [error for _, error in writer.poll_results()] == [None]
+
+
+def test_replay_skips_mutations_marked_done(tmp_path):
+    journal = tmp_path / "journal.jsonl"
+    entries = [
+        {"id": "a", "op": "insert", "row": {"invoice_no": 1}, "base": None},
+        {"id": "b", "op": "update", "row": {"invoice_no": 2}, "base": {"invoice_no": 2}},
+        {"done": "a"},
+    ]
+    journal.write_text("".join(json.dumps(e) + "\n" for e in entries) + '{"id": "c", "op"') # Torn last line
+
+    # The writer thread never gets a connection, so the replayed mutation stays queued
+    writer = InvoiceWriter(threading.Event().wait, "invoices", COLUMNS, str(journal))
+
+    assert list(writer.outstanding) == ["b"]
+    replayed = writer.outstanding["b"]
+    assert replayed.replayed and replayed.base == {"invoice_no": 2}
+
+
+def test_close_commits_queued_mutations_and_stops(tmp_path):
+    con = FakeConnection()
+    writer = make_writer(tmp_path, con)
+    writer.submit("insert", {"invoice_no": 1, "due_date_time": None, "total": 10})
+
+    writer.close(timeout=5)
+
+    assert not writer.thread.is_alive()
+    assert con.committed == [("INSERT", [1, None, 10])]
+    assert writer.pending_count() == 0
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ("", None),
+    (datetime.datetime(2024, 1, 5, 9, 30), "2024-01-05 09:30:00"),
+    ("2024-01-05 09:30:00", "2024-01-05 09:30:00"),
+    (decimal.Decimal("100.00"), 100.0),
+    ("100.0", 100.0),
+    (7, 7.0),
+    ("SPEECH", "SPEECH"),
+])
+def test_comparable(value, expected):
+    assert write_queue.comparable(value) == expected
+
+
+def test_differing_ignores_mysql_versus_json_types(tmp_path):
+    writer = make_writer(tmp_path, FakeConnection())
+    current = (1, datetime.datetime(2024, 1, 5, 9, 30), decimal.Decimal("100.00"))
+
+    assert writer.differing(current, {"invoice_no": "1", "due_date_time": "2024-01-05 09:30:00", "total": 100}) == []
+    assert writer.differing(current, {"invoice_no": 1, "due_date_time": "2024-01-06 09:30:00", "total": 90}) == [
+        "due_date_time", "total"]
+
+
+BASE = {"invoice_no": 1, "due_date_time": "2024-01-05 09:30:00", "total": 100.0}
+EDITED = dict(BASE, total=150.0)
+
+
+def commit_one(tmp_path, current_row, mutation_args, replayed=False):
+    con = FakeConnection(current_row=current_row)
+    writer = make_writer(tmp_path, con)
+    mutation = queue_mutation(writer, *mutation_args)
+    mutation.replayed = replayed
+    writer.commit_batch([mutation])
+    [(_, error)] = writer.poll_results()
+    return [statement for statement, _ in con.committed], error
+
+
+def test_update_from_the_current_version_is_applied(tmp_path):
+    committed, error = commit_one(tmp_path, (1, "2024-01-05 09:30:00", 100.0), ("update", EDITED, BASE))
+    assert (committed, error) == (["SELECT", "UPDATE"], None)
+
+
+def test_update_of_a_changed_row_is_a_conflict(tmp_path):
+    committed, error = commit_one(tmp_path, (1, "2024-01-05 09:30:00", 120.0), ("update", EDITED, BASE))
+    assert committed == []
+    assert isinstance(error, write_queue.WriteConflict) and "(total)" in str(error)
+
+
+def test_update_of_a_deleted_row_is_a_conflict(tmp_path):
+    committed, error = commit_one(tmp_path, None, ("update", EDITED, BASE))
+    assert committed == []
+    assert isinstance(error, write_queue.WriteConflict) and "deleted" in str(error)
+
+
+@pytest.mark.parametrize("current_row, mutation_args", [
+    ((1, "2024-01-05 09:30:00", 150.0), ("update", EDITED, BASE)), # Update already committed
+    (None, ("delete", BASE, BASE)), # Delete already committed
+])
+def test_replayed_mutation_already_committed_is_skipped(tmp_path, current_row, mutation_args):
+    committed, error = commit_one(tmp_path, current_row, mutation_args, replayed=True)
+    assert (committed, error) == (["SELECT"], None)
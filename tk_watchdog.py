@@ -0,0 +1,153 @@
+import atexit
+import os
+import sys
+import threading
+import time
+import tkinter
+import traceback
+from collections import defaultdict
+
+DEFAULT_THRESHOLD_MS = 200 # Callbacks blocking the Tk thread longer than this get a stack sample
+STACK_FRAMES = 15 # Innermost frames kept per sample
+# Upper bounds (ms) of the latency histogram buckets; the summary's p95 is read from these
+BUCKET_BOUNDS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, float("inf"))
+
+
+def watchdog_threshold(argv):
+    """
+    Threshold in ms from a --watchdog[=MS] command-line flag, or None when the flag is absent. The
+    watchdog is optional, so a value that is not a positive number only disables it with a warning.
+    """
+    for arg in argv:
+        if arg == "--watchdog":
+            return DEFAULT_THRESHOLD_MS
+        if arg.startswith("--watchdog="):
+            value = arg.split("=", 1)[1]
+            try:
+                threshold_ms = float(value)
+            except ValueError:
+                threshold_ms = None
+            if threshold_ms is None or not 0 < threshold_ms < float("inf"): # Also rejects nan
+                print(f"Ignoring --watchdog={value}: expected a positive number of milliseconds", file=sys.stderr)
+                return None
+            return threshold_ms
+    return None
+
+
+def handler_name(func):
+    """Readable name of a Tk callback, e.g. 'InvoiceApp.apply_filters'."""
+    code = getattr(func, "__code__", None)
+    if code is not None and code.co_name == "callit" and func.__closure__:
+        # after()/after_idle() wrap the real callback in a closure named callit
+        cells = dict(zip(code.co_freevars, func.__closure__))
+        if "func" in cells:
+            func = cells["func"].cell_contents
+            code = getattr(func, "__code__", None)
+    name = getattr(func, "__qualname__", None) or type(func).__name__
+    if "<lambda>" in name and code is not None:
+        name += f" ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return name
+
+
+class EventLoopWatchdog:
+    """
+    Opt-in monitor of how long Tk callbacks block the event loop.
+
+    Every Python callback Tk runs (commands, bindings, after() timers, variable traces) goes
+    through tkinter.CallWrapper, which install() wraps to time each call per handler. A
+    sampler thread watches the callback currently running; once it has blocked for longer
+    than the threshold, the Tk thread's stack is captured there and then and logged with
+    the handler's name. A per-handler latency summary is printed at exit.
+
+    Handlers that open a modal dialog include the time the dialog was open.
+    """
+
+    def __init__(self, threshold_ms=DEFAULT_THRESHOLD_MS, stream=None):
+        self.threshold = threshold_ms / 1000
+        self.stream = stream or sys.stderr
+        self.thread_id = threading.get_ident() # The Tk thread: install() is called from it
+        self.running = [] # [handler, start, sampled] of callbacks in progress (nested for modal dialogs)
+        self.stats = defaultdict(lambda: {"calls": 0, "total": 0.0, "max": 0.0, "slow": 0,
+                                          "buckets": [0] * len(BUCKET_BOUNDS_MS)})
+        self.lock = threading.Lock()
+
+    def install(self):
+        original = tkinter.CallWrapper.__call__
+        watchdog = self
+
+        def __call__(wrapper, *args):
+            return watchdog.timed(wrapper.func, original, wrapper, args)
+
+        tkinter.CallWrapper.__call__ = __call__
+        threading.Thread(target=self.sample_loop, daemon=True).start()
+        atexit.register(self.report)
+        return self
+
+    def timed(self, func, original, wrapper, args):
+        entry = [handler_name(func), time.perf_counter(), False]
+        self.running.append(entry)
+        try:
+            return original(wrapper, *args)
+        finally:
+            self.running.pop()
+            self.record(entry[0], time.perf_counter() - entry[1])
+
+    def record(self, handler, elapsed):
+        elapsed_ms = elapsed * 1000
+        with self.lock:
+            stats = self.stats[handler]
+            stats["calls"] += 1
+            stats["total"] += elapsed
+            stats["max"] = max(stats["max"], elapsed)
+            stats["buckets"][next(i for i, bound in enumerate(BUCKET_BOUNDS_MS) if elapsed_ms <= bound)] += 1
+            if elapsed > self.threshold:
+                stats["slow"] += 1
+        if elapsed > self.threshold:
+            self.log(f"[watchdog] {handler} blocked the UI for {elapsed_ms:.0f} ms")
+
+    # ========== Sampler Thread ==========
+    def sample_loop(self):
+        interval = max(self.threshold / 4, 0.005)
+        while True:
+            time.sleep(interval)
+            running = self.running[-1:] # Only the innermost callback is actually on the stack
+            if not running:
+                continue
+            entry = running[0]
+            blocked = time.perf_counter() - entry[1]
+            if entry[2] or blocked <= self.threshold:
+                continue
+            entry[2] = True # One sample per slow call
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = "".join(traceback.format_stack(frame, limit=STACK_FRAMES))
+            self.log(f"[watchdog] {entry[0]} still running after {blocked * 1000:.0f} ms; Tk thread stack:\n{stack}")
+
+    def log(self, message):
+        print(message, file=self.stream, flush=True)
+
+    # ========== Summary ==========
+    def percentile_bound(self, buckets, pct):
+        """Upper bound (ms) of the histogram bucket holding the pct-th percentile."""
+        target = sum(buckets) * pct / 100
+        seen = 0
+        for bound, count in zip(BUCKET_BOUNDS_MS, buckets):
+            seen += count
+            if seen >= target:
+                return bound
+        return BUCKET_BOUNDS_MS[-1]
+
+    def summary_lines(self):
+        with self.lock:
+            stats = sorted(self.stats.items(), key=lambda item: -item[1]["total"])
+            lines = [f"{'Handler':<60}{'Calls':>8}{'Avg ms':>9}{'p95 ms':>9}{'Max ms':>9}{'Slow':>6}"]
+            for handler, s in stats:
+                p95 = self.percentile_bound(s["buckets"], 95)
+                lines.append(f"{handler[:59]:<60}{s['calls']:>8}{s['total'] * 1000 / s['calls']:>9.1f}"
+                             f"{'<=' + format(p95, 'g'):>9}{s['max'] * 1000:>9.1f}{s['slow']:>6}")
+        return lines
+
+    def report(self):
+        self.log(f"[watchdog] Tk callback latency (slow = over {self.threshold * 1000:.0f} ms):")
+        self.log("\n".join(self.summary_lines()))
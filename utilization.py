@@ -0,0 +1,91 @@
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+
+class UtilizationReport:
+    """
+    Occupancy of the clinic's slots per therapy x weekday x time of day, the weekly trend,
+    and cancellation / no-show rates.
+
+    Bookings are laid out once in compact bytearrays indexed by (day, time): one per therapy,
+    one for all bookings and one marking the open slots. Every cell of the report is then a
+    strided slice count (e.g. all Mondays at 09:00), which runs in C instead of looping over
+    bookings per cell.
+    """
+
+    def __init__(self, bookings, slot_starts, therapies, cancellations=(), now=None):
+        now = now or datetime.now()
+        self.therapies = list(therapies)
+        days = sorted({date.fromisoformat(key[:10]) for key in bookings})
+        if not days:
+            days = [now.date()]
+        self.first_day = days[0] - timedelta(days=days[0].weekday()) # Whole weeks, starting on a Monday
+        last_day = days[-1] + timedelta(days=6 - days[-1].weekday())
+        self.day_count = (last_day - self.first_day).days + 1
+
+        times = set(key[11:16] for key in bookings) # Session keys: "YYYY-MM-DD_HH:MM@THERAPY"
+        for offset in range(self.day_count):
+            times.update(slot_starts(self.first_day + timedelta(days=offset)) or ())
+        self.times = sorted(times) # "HH:MM" sorts chronologically
+        time_index = {t: i for i, t in enumerate(self.times)}
+        width = len(self.times)
+
+        cells = self.day_count * width
+        self.open = bytearray(cells)
+        self.booked = {None: bytearray(cells)} # None: every therapy
+        self.booked.update((therapy, bytearray(cells)) for therapy in self.therapies)
+        for offset in range(self.day_count):
+            base = offset * width
+            for start in slot_starts(self.first_day + timedelta(days=offset)) or ():
+                self.open[base + time_index[start]] = 1
+
+        self.past_bookings = Counter()
+        self.no_shows = Counter()
+        now_key = now.strftime("%Y-%m-%d_%H:%M")
+        for slot_key, info in bookings.items():
+            day = date.fromisoformat(slot_key[:10])
+            cell = (day - self.first_day).days * width + time_index[slot_key[11:16]]
+            self.open[cell] = 1 # Booked before the hours changed still counts as an open slot
+            self.booked[None][cell] = 1
+            if info['therapy'] in self.booked:
+                self.booked[info['therapy']][cell] = 1
+            if slot_key < now_key:
+                self.past_bookings[info['therapy']] += 1
+                if info.get('no_show'):
+                    self.no_shows[info['therapy']] += 1
+        self.bookings = Counter(info['therapy'] for info in bookings.values())
+        self.cancellations = Counter(therapy for _, therapy in cancellations)
+
+    def occupancy(self, therapy=None):
+        """[weekday][time index] -> (booked, open) for one therapy, or all bookings when therapy is None."""
+        booked = self.booked[therapy]
+        width = len(self.times)
+        stride = 7 * width
+        grid = []
+        for weekday in range(7):
+            row = []
+            for t in range(width):
+                start = weekday * width + t # first_day is a Monday, so day index == weekday in week 0
+                row.append((booked[start::stride].count(1), self.open[start::stride].count(1)))
+            grid.append(row)
+        return grid
+
+    def weekly_trend(self, therapy=None):
+        """[(week_start_date, booked, open)] for each week in the report."""
+        booked = self.booked[therapy]
+        week = 7 * len(self.times)
+        return [
+            (self.first_day + timedelta(weeks=i), booked[i * week:(i + 1) * week].count(1),
+             self.open[i * week:(i + 1) * week].count(1))
+            for i in range(self.day_count // 7)
+        ]
+
+    def rates(self, therapy=None):
+        """(cancellation_rate, no_show_rate) for one therapy or the whole clinic; None when there is no data."""
+        therapies = [therapy] if therapy else list(self.bookings | self.cancellations)
+        cancelled = sum(self.cancellations[t] for t in therapies)
+        booked = sum(self.bookings[t] for t in therapies)
+        past = sum(self.past_bookings[t] for t in therapies)
+        no_shows = sum(self.no_shows[t] for t in therapies)
+        return (cancelled / (cancelled + booked) if cancelled + booked else None,
+                no_shows / past if past else None)
@@ -0,0 +1,148 @@
+import itertools
+from bisect import bisect_right
+
+# Time-of-day windows patients can wait for: (name, first minute, end minute)
+WAITLIST_WINDOWS = [
+    ("Morning", 0, 12 * 60),
+    ("Afternoon", 12 * 60, 15 * 60),
+    ("Late Afternoon", 15 * 60, 24 * 60),
+]
+WINDOW_NAMES = [name for name, _, _ in WAITLIST_WINDOWS]
+WINDOW_STARTS = [start for _, start, _ in WAITLIST_WINDOWS]
+
+
+def window_of(start_time):
+    """Name of the waitlist window a slot start ("HH:MM") falls into."""
+    hours, minutes = start_time.split(":")
+    return WAITLIST_WINDOWS[bisect_right(WINDOW_STARTS, int(hours) * 60 + int(minutes)) - 1][0]
+
+
+class IndexedPriorityQueue:
+    """
+    Binary min-heap of (sort_key, item_id) with a position index, so any item can be
+    removed or re-prioritised in O(log n), not just the top one.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.positions = {} # item_id -> index in heap
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, item_id):
+        return item_id in self.positions
+
+    def push(self, item_id, sort_key):
+        if item_id in self.positions:
+            self.remove(item_id)
+        self.heap.append((sort_key, item_id))
+        self.positions[item_id] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+
+    def peek(self):
+        """(sort_key, item_id) of the smallest entry, or None."""
+        return self.heap[0] if self.heap else None
+
+    def pop(self):
+        entry = self.heap[0]
+        self.remove(entry[1])
+        return entry
+
+    def remove(self, item_id):
+        i = self.positions.pop(item_id)
+        last = self.heap.pop()
+        if i < len(self.heap):
+            self.heap[i] = last
+            self.positions[last[1]] = i
+            self._sift_up(i)
+            self._sift_down(self.positions[last[1]])
+
+    def _swap(self, i, j):
+        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+        self.positions[self.heap[i][1]] = i
+        self.positions[self.heap[j][1]] = j
+
+    def _sift_up(self, i):
+        while i > 0:
+            parent = (i - 1) // 2
+            if self.heap[i][0] >= self.heap[parent][0]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i):
+        size = len(self.heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < size and self.heap[child][0] < self.heap[smallest][0]:
+                    smallest = child
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+
+class Waitlist:
+    """
+    Patients waiting for a slot, one IndexedPriorityQueue per (therapy, window).
+
+    Higher priority is served first, then whoever joined earlier. A freed slot only
+    looks at the head of each therapy's queue for the slot's window, so matching is
+    O(therapies + log n) however many people are waiting.
+    """
+
+    def __init__(self, therapies):
+        self.therapies = list(therapies)
+        self.queues = {} # (therapy, window) -> IndexedPriorityQueue of request ids
+        self.requests = {} # request id -> {'phone', 'therapy', 'window', 'priority'}
+        self.by_patient = {} # (phone, therapy, window) -> request id
+        self.sequence = itertools.count(1)
+
+    def join(self, phone, therapy, window, priority, request_id=None):
+        """Adds a request, or re-prioritises the patient's existing one. Returns the request id."""
+        key = (phone, therapy, window)
+        request_id = request_id or self.by_patient.get(key) or next(self.sequence)
+        self.by_patient[key] = request_id
+        self.requests[request_id] = {'phone': phone, 'therapy': therapy, 'window': window, 'priority': priority}
+        queue = self.queues.setdefault((therapy, window), IndexedPriorityQueue())
+        queue.push(request_id, (-priority, request_id)) # Ids grow with time, so they break ties by join order
+        return request_id
+
+    def leave(self, request_id):
+        request = self.requests.pop(request_id, None)
+        if request is None:
+            return None
+        del self.by_patient[(request['phone'], request['therapy'], request['window'])]
+        self.queues[(request['therapy'], request['window'])].remove(request_id)
+        return request
+
+    def best_for(self, start_time):
+        """Request id of the best waiting candidate for a slot starting at start_time, or None."""
+        window = window_of(start_time)
+        best = None
+        for therapy in self.therapies:
+            queue = self.queues.get((therapy, window))
+            if queue:
+                head = queue.peek()
+                if best is None or head < best:
+                    best = head
+        return best[1] if best else None
+
+    def take_best(self, start_time):
+        """Removes and returns (request_id, request) of the best candidate, or None."""
+        request_id = self.best_for(start_time)
+        return (request_id, self.leave(request_id)) if request_id else None
+
+    def restore(self, request_id, request):
+        """Puts back a request taken with take_best, keeping its place in line."""
+        self.join(request['phone'], request['therapy'], request['window'], request['priority'], request_id)
+
+    def pending(self):
+        """[(request_id, request)] in service order within each therapy and window."""
+        return sorted(self.requests.items(), key=lambda item: (
+            item[1]['therapy'], WINDOW_NAMES.index(item[1]['window']), -item[1]['priority'], item[0]))
+
+    def __len__(self):
+        return len(self.requests)
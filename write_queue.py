@@ -0,0 +1,322 @@
+import datetime
+import decimal
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+
+import pymysql
+
+from change_log import ensure_change_log, record_changes
+from customers import CUSTOMER_FIELDS, upsert_customer
+
+GROUP_MAX = 50 # Mutations committed together in one transaction
+GROUP_WINDOW = 0.05 # Seconds to wait for more mutations before committing a group
+RETRY_DELAY = 2.0 # Seconds between reconnect attempts while the database is unreachable
+LOCK_RETRY_DELAY = 0.2 # Seconds before re-running a group that hit a deadlock or lock wait timeout
+CONNECTION_ERRORS = {
+    2003, # Can't connect to MySQL server
+    2006, # MySQL server has gone away
+    2013, # Lost connection to MySQL server during query
+}
+LOCK_ERRORS = {
+    1205, # Lock wait timeout exceeded
+    1213, # Deadlock found when trying to get lock
+}
+
+
+class WriteConflict(Exception):
+    """The row changed upstream since the desk read the version it edited."""
+
+
+def comparable(value):
+    """Normalizes a MySQL value and its journaled (JSON) form so the two compare equal."""
+    if value is None or value == "":
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, (int, float, decimal.Decimal)):
+        return round(float(value), 2)
+    try:
+        return round(float(value), 2)
+    except ValueError:
+        return str(value)
+
+
+def retryable(error):
+    """
+    True when the mutations are still good and only need another attempt: the connection was
+    lost or the transaction lost a lock. pymysql raises OperationalError for data errors too
+    (e.g. 1292 Incorrect datetime value), so the error code decides, not the class.
+    """
+    if isinstance(error, pymysql.err.InterfaceError):
+        return True
+    return (isinstance(error, pymysql.err.OperationalError) and bool(error.args)
+            and error.args[0] in CONNECTION_ERRORS | LOCK_ERRORS)
+
+
+class Mutation:
+    """One queued insert/update/delete of an invoice row."""
+    __slots__ = ("id", "op", "row", "replayed", "base")
+
+    def __init__(self, op, row, mutation_id=None, replayed=False, base=None):
+        self.id = mutation_id or uuid.uuid4().hex
+        self.op = op
+        self.row = row
+        self.replayed = replayed
+        self.base = base # The row as the desk saw it before editing; None skips the conflict check
+
+
+class InvoiceWriter:
+    """
+    Write-behind queue for invoice mutations.
+
+    submit() journals a mutation to a local file and returns immediately; a background
+    thread group-commits queued mutations in small transactions. Results are collected
+    for the UI thread to pick up with poll_results(). Mutations still in the journal
+    when the app stops are replayed on the next start.
+    """
+
+    def __init__(self, connect, table_name, columns, journal_path, upsert_customers=False, log_changes=False):
+        self.connect = connect
+        self.table_name = table_name
+        self.columns = columns # Columns of table_name; rows may carry more (customer details)
+        self.upsert_customers = upsert_customers
+        self.log_changes = log_changes # Append each mutation to the change log in the same transaction
+        self.journal_path = journal_path
+        self.pending = queue.Queue()
+        self.results = queue.Queue()
+        self.journal_lock = threading.Lock()
+        self.outstanding = {} # id -> Mutation submitted but not yet committed or rejected
+        self.con = None
+
+        self.replay_journal()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    # ========== Journal ==========
+    def write_journal(self, entries):
+        """Appends entries durably; callers hold journal_lock."""
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def replay_journal(self):
+        """Re-queues mutations that were journaled but never marked done."""
+        if not os.path.exists(self.journal_path):
+            return
+        entries = {}
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue # A torn last line from a crash mid-write
+                if "done" in entry:
+                    entries.pop(entry["done"], None)
+                else:
+                    entries[entry["id"]] = entry
+        for entry in entries.values():
+            mutation = Mutation(entry["op"], entry["row"], entry["id"], replayed=True, base=entry.get("base"))
+            self.outstanding[mutation.id] = mutation
+            self.pending.put(mutation)
+
+    # ========== Public API (UI thread) ==========
+    def submit(self, op, row, base=None):
+        """
+        Queues an 'insert', 'update' or 'delete' of row (a dict keyed by column name). For updates
+        and deletes, base is the row the edit started from; the write is rejected with a
+        WriteConflict if the row has changed upstream since.
+        """
+        mutation = Mutation(op, row, base=base)
+        with self.journal_lock:
+            self.outstanding[mutation.id] = mutation
+            self.write_journal([{"id": mutation.id, "op": op, "row": row, "base": base}])
+        self.pending.put(mutation)
+        return mutation.id
+
+    def poll_results(self):
+        """Returns [(mutation, error)] for mutations finished since the last call; error is None on success."""
+        finished = []
+        while True:
+            try:
+                finished.append(self.results.get_nowait())
+            except queue.Empty:
+                return finished
+
+    def pending_count(self):
+        return len(self.outstanding)
+
+    def max_pending_invoice_no(self):
+        """Highest invoice number among queued inserts, so new numbers don't collide with them."""
+        numbers = [int(m.row["invoice_no"]) for m in list(self.outstanding.values()) if m.op == "insert"]
+        return max(numbers, default=0)
+
+    def close(self, timeout=None):
+        """Lets the writer commit what is already queued, then stops its thread and closes its connection."""
+        self.pending.put(None)
+        self.thread.join(timeout)
+
+    # ========== Writer Thread ==========
+    def run(self):
+        stopping = False
+        while not stopping:
+            mutation = self.pending.get()
+            if mutation is None:
+                break
+            batch = [mutation]
+            deadline = time.monotonic() + GROUP_WINDOW
+            while len(batch) < GROUP_MAX:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    mutation = self.pending.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if mutation is None: # close(): this is the last group
+                    stopping = True
+                    break
+                batch.append(mutation)
+            self.commit_batch(batch)
+        self.drop_connection()
+
+    def connection(self):
+        if self.con is None:
+            self.con = self.connect()
+            if self.log_changes:
+                ensure_change_log(self.con.cursor())
+                self.con.commit()
+        return self.con
+
+    def drop_connection(self):
+        try:
+            if self.con is not None:
+                self.con.close()
+        except Exception:
+            pass
+        self.con = None
+
+    def check_base(self, cur, mutation):
+        """
+        Locks the upstream row and compares it with the version the edit started from. Returns
+        False when a replayed mutation turns out to be committed already, so it can be skipped.
+        """
+        row = mutation.row
+        cur.execute(
+            f"SELECT {', '.join(self.columns)} FROM {self.table_name} WHERE invoice_no = %s FOR UPDATE",
+            (row["invoice_no"],)
+        )
+        current = cur.fetchone()
+        if mutation.replayed and (current is None if mutation.op == "delete" else
+                                  current is not None and self.differing(current, row) == []):
+            return False # Committed before a crash but not marked done in the journal
+        if current is None:
+            raise WriteConflict(f"Invoice No. {row['invoice_no']} was deleted by another desk")
+        changed = self.differing(current, mutation.base)
+        if changed:
+            raise WriteConflict(f"Invoice No. {row['invoice_no']} was changed by another desk ({', '.join(changed)})")
+        return True
+
+    def differing(self, current, expected):
+        return [col for col, value in zip(self.columns, current) if comparable(value) != comparable(expected.get(col))]
+
+    def apply(self, cur, mutation):
+        row = mutation.row
+        if mutation.base is not None and mutation.op in ("update", "delete") and not self.check_base(cur, mutation):
+            return
+        if self.upsert_customers and mutation.op in ("insert", "update"):
+            # Customer details live in the customers table, in the same transaction as the invoice
+            upsert_customer(cur, row["c_id"], *(row[f] for f in CUSTOMER_FIELDS))
+        if mutation.op == "insert":
+            placeholders = ", ".join(["%s"] * len(self.columns))
+            cur.execute(
+                f"INSERT INTO {self.table_name} ({', '.join(self.columns)}) VALUES ({placeholders})",
+                [row[c] for c in self.columns]
+            )
+        elif mutation.op == "update":
+            columns = [c for c in self.columns if c != "invoice_no"]
+            assignments = ", ".join(f"{c} = %s" for c in columns)
+            cur.execute(
+                f"UPDATE {self.table_name} SET {assignments} WHERE invoice_no = %s",
+                [row[c] for c in columns] + [row["invoice_no"]]
+            )
+        elif mutation.op == "delete":
+            cur.execute(f"DELETE FROM {self.table_name} WHERE invoice_no = %s", (row["invoice_no"],))
+        else:
+            raise ValueError(f"Unknown mutation type: {mutation.op}")
+        if self.log_changes:
+            record_changes(cur, [(mutation.op, row["invoice_no"], None if mutation.op == "delete" else row)])
+
+    def commit_batch(self, batch):
+        """
+        Commits the batch as one transaction, falling back to one transaction per mutation on errors.
+        Connection loss, deadlocks and lock wait timeouts retry what is left of the batch; any other
+        error rejects only the mutation that caused it.
+        """
+        while True:
+            try:
+                con = self.connection()
+                try:
+                    cur = con.cursor()
+                    for mutation in batch:
+                        self.apply(cur, mutation)
+                    con.commit()
+                    self.finish([(m, None) for m in batch])
+                    return
+                except Exception as e:
+                    if retryable(e):
+                        raise
+                    con.rollback()
+                # One mutation was rejected; isolate it so the others still get committed
+                results = []
+                for mutation in batch:
+                    cur = con.cursor()
+                    try:
+                        self.apply(cur, mutation)
+                        con.commit()
+                        results.append((mutation, None))
+                    except Exception as e:
+                        if retryable(e):
+                            raise
+                        con.rollback()
+                        if mutation.replayed and mutation.op == "insert" and "Duplicate entry" in str(e):
+                            # Committed before a crash but not marked done in the journal
+                            results.append((mutation, None))
+                        else:
+                            results.append((mutation, e))
+                    # Done markers are written as we go, so a reconnect only retries what is left
+                    self.finish(results[-1:])
+                return
+            except (pymysql.err.OperationalError, pymysql.err.InterfaceError) as e:
+                # Keep the batch (minus anything finished) and retry
+                batch = [m for m in batch if m.id in self.outstanding]
+                if e.args and e.args[0] in LOCK_ERRORS:
+                    # MySQL already rolled the transaction back; the connection is still good
+                    try:
+                        self.con.rollback()
+                    except Exception:
+                        self.drop_connection()
+                    delay = LOCK_RETRY_DELAY
+                else:
+                    # Database unreachable (or refusing the connection)
+                    self.drop_connection()
+                    delay = RETRY_DELAY
+                if not batch:
+                    return
+                time.sleep(delay)
+
+    def finish(self, results):
+        """Marks mutations done in the journal and hands their results to the UI."""
+        with self.journal_lock:
+            self.write_journal([{"done": m.id} for m, _ in results])
+            for mutation, error in results:
+                self.outstanding.pop(mutation.id, None)
+                self.results.put((mutation, error))
+            if not self.outstanding:
+                # Nothing left to replay, so start the next session with an empty journal
+                open(self.journal_path, "w").close()